@@ -0,0 +1,406 @@
+import datetime
+import json
+import keyword
+import re
+from dataclasses import make_dataclass
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
+
+import ijson
+
+# The property holding the value of each field type
+FIELD_VALUE_KEYS = {
+    "string": "valueString",
+    "date": "valueDate",
+    "time": "valueTime",
+    "number": "valueNumber",
+    "integer": "valueInteger",
+    "boolean": "valueBoolean",
+    "array": "valueArray",
+    "object": "valueObject",
+    "json": "valueJson",
+}
+
+# Python types of the record attributes, by field type
+FIELD_PYTHON_TYPES = {
+    "string": str,
+    "date": datetime.date,
+    "time": datetime.time,
+    "number": float,
+    "integer": int,
+    "boolean": bool,
+    "json": Any,
+}
+
+
+def _parse_date(value: Any) -> Any:
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        # Keep whatever the service returned rather than losing it
+        return value
+
+
+def _parse_time(value: Any) -> Any:
+    try:
+        return datetime.time.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+
+
+_SCALAR_PARSERS: Dict[str, Callable[[Any], Any]] = {
+    "date": _parse_date,
+    "time": _parse_time,
+}
+
+
+def get_field_value(field: Optional[Dict[str, Any]]) -> Any:
+    """
+    Get the value of a result field, whatever its type.
+
+    Arrays become lists and objects become dicts of their values, recursively.
+    Dates and times become datetime.date and datetime.time.
+
+    :param field: A field of a result content, e.g. {"type": "string", "valueString": "Contoso"}.
+    :return: The value, or None if the field is missing or has no value.
+    """
+    if not field:
+        return None
+
+    field_type = field.get("type")
+    if field_type == "array":
+        return [get_field_value(item) for item in field.get("valueArray") or ()]
+    if field_type == "object":
+        return {
+            name: get_field_value(value)
+            for name, value in (field.get("valueObject") or {}).items()
+        }
+
+    value_key = FIELD_VALUE_KEYS.get(field_type)
+    if value_key is None:
+        # A type this module does not know yet: take the first value* property
+        value_key = next((key for key in field if key.startswith("value")), None)
+        if value_key is None:
+            return None
+    value = field.get(value_key)
+    parse = _SCALAR_PARSERS.get(field_type)
+    return parse(value) if parse is not None and value is not None else value
+
+
+def get_fields(content: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the values of all fields of a result content, by field name.
+    """
+    return {name: get_field_value(field) for name, field in (content.get("fields") or {}).items()}
+
+
+def iter_contents(result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the contents of an analysis result.
+
+    :param result: Either the whole analyzerResults response or its "result" property,
+        or a StreamingAnalysisResult, whose contents are then parsed as they are read.
+    """
+    if isinstance(result, StreamingAnalysisResult):
+        yield from result.iter_contents()
+        return
+    inner = result.get("result", result)
+    yield from inner.get("contents") or ()
+
+
+def iter_fields(result: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """
+    Iterate over (field name, value) of every field of every content of a result.
+    """
+    for content in iter_contents(result):
+        for name, field in (content.get("fields") or {}).items():
+            yield name, get_field_value(field)
+
+
+_SCALAR_EVENTS = {"string", "number", "boolean", "null"}
+_START_EVENTS = {"start_map", "start_array"}
+_END_EVENTS = {"end_map", "end_array"}
+
+
+class StreamingAnalysisResult:
+    """
+    An analyzerResults response parsed incrementally from a stream.
+
+    Only the top-level properties (id, status, error, ...) and the properties of "result"
+    other than its contents are kept. The contents are parsed one at a time while they are
+    iterated, so memory use is that of the largest content rather than of the whole result.
+    The contents can be iterated once.
+
+    Usage:
+        with StreamingAnalysisResult.from_response(response) as result:
+            if result.get("status") == "Succeeded":
+                for content in result.iter_contents():
+                    ...
+    """
+
+    def __init__(self, stream: BinaryIO, close: Optional[Callable[[], None]] = None):
+        """
+        Reads the stream up to the "status" property.
+
+        :param stream: The response body.
+        :param close: Called when the result is closed; defaults to closing the stream.
+        """
+        self._events = ijson.parse(stream, use_float=True)
+        self._close = close or getattr(stream, "close", None)
+        self.properties: Dict[str, Any] = {}
+        self.metadata: Dict[str, Any] = {}
+        self._buffered_contents: List[Dict[str, Any]] = []
+        self._contents_iterated = False
+        self._scanner = self._scan()
+        for content in self._scanner:
+            if content is None:
+                break
+            # The service sent the contents before the status
+            self._buffered_contents.append(content)
+
+    @classmethod
+    def from_response(cls, response) -> "StreamingAnalysisResult":
+        """
+        :param response: A requests response fetched with stream=True.
+        """
+        # Let urllib3 undo any gzip/deflate transfer encoding
+        response.raw.decode_content = True
+        return cls(response.raw, response.close)
+
+    @property
+    def status(self) -> str:
+        return self.properties.get("status", "")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get a top-level property, like dict.get on a parsed response.
+        """
+        return self.properties.get(key, default)
+
+    def iter_contents(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the contents of the result, parsing each one as it is reached.
+        The stream is closed when the iteration ends.
+        """
+        if self._contents_iterated:
+            raise RuntimeError("The contents of a streamed result can only be iterated once.")
+        self._contents_iterated = True
+
+        try:
+            while self._buffered_contents:
+                yield self._buffered_contents.pop(0)
+            for content in self._scanner:
+                if content is not None:
+                    yield content
+        finally:
+            self.close()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Read the rest of the stream into a dict shaped like the parsed response.
+        """
+        contents = list(self.iter_contents())
+        return dict(self.properties, result=dict(self.metadata, contents=contents))
+
+    def close(self) -> None:
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _scan(self) -> Iterator[Optional[Dict[str, Any]]]:
+        # Yields each content, and None once the status has been read
+        for prefix, event, value in self._events:
+            if event == "map_key" or prefix in ("", "result"):
+                continue
+            if prefix == "result.contents":
+                # The start or end of the contents array
+                continue
+            if prefix == "result.contents.item":
+                yield self._build(event, value)
+                continue
+
+            if "." not in prefix:
+                target, key = self.properties, prefix
+            elif prefix.startswith("result.") and prefix.count(".") == 1:
+                target, key = self.metadata, prefix[len("result."):]
+            else:
+                continue
+            target[key] = self._build(event, value) if event in _START_EVENTS else value
+            if target is self.properties and key == "status":
+                yield None
+
+    def _build(self, event: str, value: Any) -> Any:
+        # Builds the value that starts with `event` from the events that follow
+        if event not in _START_EVENTS:
+            return value
+        builder = ijson.ObjectBuilder()
+        builder.event(event, value)
+        depth = 1
+        for _, event, value in self._events:
+            builder.event(event, value)
+            if event in _START_EVENTS:
+                depth += 1
+            elif event in _END_EVENTS:
+                depth -= 1
+                if depth == 0:
+                    return builder.value
+        raise ValueError("The result stream ended in the middle of a value.")
+
+
+def _to_attribute_name(name: str) -> str:
+    attribute = re.sub(r"\W", "_", name)
+    if not attribute or attribute[0].isdigit() or keyword.iskeyword(attribute):
+        attribute = f"f_{attribute}"
+    return attribute
+
+
+class ResultParser:
+    """
+    Maps the contents of analysis results onto typed records generated from an analyzer schema.
+
+    The schema is compiled once into a record class (a slotted dataclass per object, named after
+    the field) and a tree of extractor functions, so parsing a content only reads the fields the
+    schema declares, straight out of the dicts returned by the client, without any type dispatch
+    or serialization.
+
+    Usage:
+        parser = ResultParser.from_file("qm_video_schema_2.0.json")
+        for record in parser.iter_records(result):
+            print(record.ShoppingCart)
+    """
+
+    def __init__(self, analyzer: Dict[str, Any], record_name: str = "AnalysisRecord"):
+        """
+        :param analyzer: The analyzer definition, or just its fieldSchema.
+        :param record_name: The class name of the generated records.
+        """
+        field_schema = analyzer.get("fieldSchema", analyzer)
+        self._definitions: Dict[str, Dict[str, Any]] = field_schema.get("definitions") or {}
+        self._record_types: Dict[str, type] = {}
+        self._compiled_references: Dict[str, Tuple[Any, Callable[[Optional[Dict[str, Any]]], Any]]] = {}
+        self._compiling: Set[str] = set()
+        self.record_type, self._extract_fields = self._compile_object(
+            record_name, field_schema.get("fields") or {}
+        )
+
+    @classmethod
+    def from_file(cls, schema_file: str, record_name: str = "AnalysisRecord") -> "ResultParser":
+        with open(schema_file, "r", encoding="utf-8") as file:
+            return cls(json.load(file), record_name)
+
+    def parse_content(self, content: Dict[str, Any]) -> Any:
+        """
+        :return: A record with one attribute per schema field; fields missing from the content are None.
+        """
+        return self._extract_fields(content.get("fields") or {})
+
+    def iter_records(self, result: Dict[str, Any]) -> Iterator[Any]:
+        """
+        Parse every content of an analysis result.
+
+        :param result: Either the whole analyzerResults response or its "result" property.
+        """
+        extract_fields = self._extract_fields
+        for content in iter_contents(result):
+            yield extract_fields(content.get("fields") or {})
+
+    def parse_many(self, results: Iterable[Dict[str, Any]]) -> Iterator[Any]:
+        """
+        Parse every content of many analysis results, in order.
+        """
+        for result in results:
+            yield from self.iter_records(result)
+
+    def get_record_type(self, name: str) -> Type:
+        """
+        :return: The generated record class of the object field or definition `name`.
+        """
+        return self._record_types[name]
+
+    def _compile_object(
+        self, name: str, properties: Dict[str, Dict[str, Any]]
+    ) -> Tuple[type, Callable[[Dict[str, Any]], Any]]:
+        attributes = []
+        extractors = []
+        for field_name, field_schema in properties.items():
+            python_type, extract = self._compile_field(field_name, field_schema)
+            attributes.append((_to_attribute_name(field_name), Optional[python_type], None))
+            extractors.append((field_name, extract))
+
+        # Objects in different places may share a field name
+        class_name, suffix = name, 2
+        while class_name in self._record_types:
+            class_name, suffix = f"{name}{suffix}", suffix + 1
+        record_type = make_dataclass(class_name, attributes, slots=True)
+        self._record_types[class_name] = record_type
+
+        def extract_object(fields: Dict[str, Any]) -> Any:
+            get = fields.get
+            return record_type(*[extract(get(field_name)) for field_name, extract in extractors])
+
+        return record_type, extract_object
+
+    def _compile_field(
+        self, name: str, field_schema: Dict[str, Any]
+    ) -> Tuple[Any, Callable[[Optional[Dict[str, Any]]], Any]]:
+        reference = field_schema.get("$ref")
+        if reference:
+            # Definitions are compiled once, however many fields refer to them
+            if reference not in self._compiled_references:
+                definition_name = reference.rsplit("/", 1)[-1]
+                if definition_name not in self._definitions:
+                    raise ValueError(f"Unknown definition {reference} for field {name}")
+                if reference in self._compiling:
+                    raise ValueError(f"Recursive definitions are not supported: {reference}")
+                self._compiling.add(reference)
+                self._compiled_references[reference] = self._compile_field(
+                    definition_name, self._definitions[definition_name]
+                )
+                self._compiling.discard(reference)
+            return self._compiled_references[reference]
+
+        field_type = field_schema.get("type")
+        if field_type == "object":
+            record_type, extract_fields = self._compile_object(
+                _to_attribute_name(name), field_schema.get("properties") or {}
+            )
+
+            def extract_object(field: Optional[Dict[str, Any]]) -> Any:
+                if not field or field.get("valueObject") is None:
+                    return None
+                return extract_fields(field["valueObject"])
+
+            return record_type, extract_object
+
+        if field_type == "array":
+            item_type, extract_item = self._compile_field(f"{name}Item", field_schema.get("items") or {})
+
+            def extract_array(field: Optional[Dict[str, Any]]) -> Any:
+                if not field or field.get("valueArray") is None:
+                    return None
+                return [extract_item(item) for item in field["valueArray"]]
+
+            return List[item_type], extract_array
+
+        value_key = FIELD_VALUE_KEYS.get(field_type)
+        if value_key is None:
+            # Untyped or unknown: fall back to inspecting each field
+            return Any, get_field_value
+
+        parse = _SCALAR_PARSERS.get(field_type)
+        if parse is None:
+            def extract_value(field: Optional[Dict[str, Any]]) -> Any:
+                return field.get(value_key) if field else None
+        else:
+            def extract_value(field: Optional[Dict[str, Any]]) -> Any:
+                if not field:
+                    return None
+                value = field.get(value_key)
+                return None if value is None else parse(value)
+
+        return FIELD_PYTHON_TYPES.get(field_type, Any), extract_value
@@ -0,0 +1,144 @@
+import json
+import logging
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from AzureContentUnderstandingClient import (
+    AzureContentUnderstandingClient,
+    OperationFailedError,
+    PollingStrategy,
+)
+from OperationPoller import OperationPoller
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProvisionResult:
+    """
+    Outcome of provisioning one analyzer.
+    """
+    analyzer_id: str
+    action: str = ""
+    status: str = "pending"
+    error: str = ""
+    submit_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    def __str__(self) -> str:
+        line = (
+            f"{self.analyzer_id:<32} {self.action or '-':<10} {self.status:<10} "
+            f"submit {self.submit_seconds:6.2f}s  total {self.total_seconds:6.2f}s"
+        )
+        return f"{line}  {self.error}" if self.error else line
+
+
+def load_analyzer_definitions(source: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load analyzer definitions by analyzer id.
+
+    :param source: Either a directory, in which every *.json file with a fieldSchema is an analyzer
+        named after the file (qm_video_schema_2.0.json -> qm_video_schema_2.0), or a JSON manifest
+        mapping analyzer ids to schema files, relative to the manifest.
+    """
+    source_path = Path(source)
+    if source_path.is_dir():
+        definitions = {}
+        for schema_file in sorted(source_path.glob("*.json")):
+            with open(schema_file, "r") as file:
+                definition = json.load(file)
+            if isinstance(definition, dict) and "fieldSchema" in definition:
+                definitions[_to_analyzer_id(schema_file.stem)] = definition
+        return definitions
+
+    with open(source_path, "r") as file:
+        manifest = json.load(file)
+    definitions = {}
+    for analyzer_id, schema_file in manifest.items():
+        with open(source_path.parent / schema_file, "r") as file:
+            definitions[analyzer_id] = json.load(file)
+    return definitions
+
+
+def _to_analyzer_id(name: str) -> str:
+    # Analyzer ids allow letters, digits, '.', '_' and '-'
+    return re.sub(r"[^A-Za-z0-9._-]", "-", name)[:64]
+
+
+def provision_analyzers(
+    client: AzureContentUnderstandingClient,
+    definitions: Dict[str, Dict[str, Any]],
+    force: bool = False,
+    max_workers: int = 8,
+    timeout_seconds: int = 10 * 60,
+    polling_strategy: Optional[PollingStrategy] = None,
+) -> List[ProvisionResult]:
+    """
+    Create or update all analyzers concurrently and wait until they are ready.
+
+    Deployments are submitted in parallel; the creation operations are then polled together by
+    an OperationPoller, so bringing up N analyzers takes about as long as the slowest one.
+
+    :param client: The Content Understanding client. Its pool_maxsize should be at least max_workers.
+    :param definitions: Analyzer definitions by analyzer id, see load_analyzer_definitions.
+    :param force: Recreate analyzers even if they match their definition.
+    :param max_workers: The number of deployments submitted at once.
+    :param timeout_seconds: How long to wait for all analyzers to be ready.
+    :param polling_strategy: How to poll each creation operation.
+    :return: One result per analyzer, in the order of `definitions`.
+    """
+    results = {analyzer_id: ProvisionResult(analyzer_id) for analyzer_id in definitions}
+    start_time = time.time()
+
+    def submit(analyzer_id: str):
+        result = results[analyzer_id]
+        try:
+            result.action, response = client.begin_deploy_analyzer(
+                analyzer_id, definitions[analyzer_id], force
+            )
+        except Exception as e:
+            logger.error(f"Failed to deploy analyzer {analyzer_id}", exc_info=e)
+            result.status, result.error = "failed", str(e)
+            response = None
+        else:
+            if response is None:
+                result.status = "succeeded"
+        result.submit_seconds = result.total_seconds = time.time() - start_time
+        return response
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        responses = dict(zip(definitions, executor.map(submit, definitions)))
+
+    # Poll all creation operations from one scheduler, each on its own schedule
+    def finish(analyzer_id: str, future: Future) -> None:
+        result = results[analyzer_id]
+        try:
+            future.result()
+        except TimeoutError:
+            result.status = "timeout"
+        except OperationFailedError as e:
+            result.status, result.error = "failed", json.dumps(e.result.get("error", {}))
+        except Exception as e:
+            result.status, result.error = "failed", str(e)
+        else:
+            result.status = "succeeded"
+        result.total_seconds = time.time() - start_time
+
+    with OperationPoller(client, polling_strategy=polling_strategy, max_workers=max_workers) as poller:
+        futures = [
+            poller.submit(
+                response,
+                timeout_seconds=timeout_seconds - (time.time() - start_time),
+                callback=partial(finish, analyzer_id),
+            )
+            for analyzer_id, response in responses.items()
+            if response is not None
+        ]
+        wait(futures)
+
+    return list(results.values())
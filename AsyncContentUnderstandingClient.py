@@ -0,0 +1,308 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable
+from typing import Any, BinaryIO, cast
+
+import httpx
+import requests
+
+from AzureContentUnderstandingClient import (
+    CachedResponse,
+    ContentUnderstandingClientBase,
+    PollingStrategy,
+    RetryPolicy,
+    _get_body_position,
+    parse_retry_after,
+)
+from JobJournal import EXPIRED, JobJournal
+from RateLimiter import POLL, SUBMIT, RateLimiter
+from ResultCache import ResultCache
+from UploadStream import UPLOAD_BUFFER_BYTES, UploadStream
+
+# Size of the reads used to feed a file-like body to the async transport
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class AsyncAzureContentUnderstandingClient(ContentUnderstandingClientBase):
+    """
+    asyncio twin of AzureContentUnderstandingClient.
+
+    Waiting for a result is an `asyncio.sleep`, not a blocked thread, so one event loop
+    can keep thousands of analyses in flight. `analyze` bounds how many run at once.
+
+    Usage:
+        async with AsyncAzureContentUnderstandingClient(endpoint, api_version, subscription_key=key) as client:
+            results = await asyncio.gather(*(client.analyze(analyzer_id, url) for url in urls))
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        api_version: str,
+        subscription_key: str | None = None,
+        token_provider: Callable[[], str] | None = None,
+        x_ms_useragent: str = "cu-sample-code",
+        max_concurrency: int = 100,
+        max_connections: int = 100,
+        request_timeout_seconds: float = 300,
+        result_cache: ResultCache | None = None,
+        job_journal: JobJournal | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        upload_buffer_bytes: int = UPLOAD_BUFFER_BYTES,
+    ) -> None:
+        """
+        Args:
+            max_concurrency (int, optional): The number of analyses `analyze` keeps in flight at once. Defaults to 100.
+            max_connections (int, optional): The size of the HTTP connection pool. Defaults to 100.
+            request_timeout_seconds (float, optional): The timeout of a single HTTP request. Defaults to 300.
+            result_cache (ResultCache, optional): Results of inputs analyzed before are taken from
+                this cache instead of being analyzed again.
+            job_journal (JobJournal, optional): Records submitted analyses, so that after a restart
+                `begin_analyze` re-attaches to a running analysis instead of submitting it again.
+            rate_limiter (RateLimiter, optional): Request budgets to share with other clients, so that
+                together they stay under the service's quota.
+            retry_policy (RetryPolicy, optional): How throttled and failed requests are retried.
+                Defaults to RetryPolicy(); RetryPolicy(max_attempts=1) disables retries.
+            upload_buffer_bytes (int, optional): The most bytes of a file held in memory while it is
+                uploaded. Defaults to 1 MiB.
+        """
+        super().__init__(
+            endpoint,
+            api_version,
+            subscription_key,
+            token_provider,
+            x_ms_useragent,
+            result_cache,
+            job_journal,
+            rate_limiter,
+            retry_policy,
+            upload_buffer_bytes,
+        )
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: httpx.AsyncClient = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=request_timeout_seconds,
+        )
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def analyze(
+        self,
+        analyzer_id: str,
+        file_location: str,
+        file_data: bytes | BinaryIO | None = None,
+        content_id: str | None = None,
+        job_key: str | None = None,
+        timeout_seconds: int = 120,
+        polling_interval_seconds: int = 2,
+        polling_strategy: PollingStrategy | None = None,
+    ) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        """
+        Submits a file and waits for its result, as one of at most `max_concurrency` analyses in flight.
+        See `begin_analyze` and `poll_result` for the arguments.
+        """
+        async with self._semaphore:
+            response = await self.begin_analyze(
+                analyzer_id, file_location, file_data, content_id, job_key
+            )
+            return await self.poll_result(
+                response, timeout_seconds, polling_interval_seconds, polling_strategy
+            )
+
+    async def begin_analyze(
+        self,
+        analyzer_id: str,
+        file_location: str,
+        file_data: bytes | BinaryIO | None = None,
+        content_id: str | None = None,
+        job_key: str | None = None,
+    ) -> httpx.Response | requests.Response:
+        """
+        Begins the analysis of a file or URL using the specified analyzer.
+
+        Args:
+            analyzer_id (str): The ID of the analyzer to use.
+            file_location (str): The path to the file or the URL to analyze.
+            file_data (bytes | BinaryIO, optional): The file content, or a readable stream that is
+                read chunk by chunk in a worker thread while it is sent. A stream that cannot be
+                rewound is spooled to disk first. Local files are streamed from disk.
+            content_id (str, optional): Identifies the content for the result cache, e.g. the blob's
+                ETag for a SAS URL. Derived from the content itself when omitted.
+            job_key (str, optional): Identifies the job in the job journal, e.g. the blob name.
+                Defaults to file_location without its query string.
+
+        Returns:
+            Response: The response from the analysis request, or a CachedResponse on a cache hit.
+                For a job the journal shows as still running, a response pointing at that analysis.
+
+        Raises:
+            ValueError: If the file location is not a valid path or URL.
+            HTTPStatusError: If the HTTP request returned an unsuccessful status code.
+        """
+        # Hashing the content and reading the cache and the journal can block, so they run
+        # on a worker thread, like the reads of the file itself
+        cache_key, cached_result = await asyncio.to_thread(
+            self._get_cached_result, analyzer_id, file_location, file_data, content_id
+        )
+        if cached_result is not None:
+            return CachedResponse(cached_result)
+        job_key = self._get_job_key(file_location, job_key)
+        resumed_response = await asyncio.to_thread(self._get_resumed_response, job_key, analyzer_id)
+        if resumed_response is not None:
+            return resumed_response
+
+        data, headers = await asyncio.to_thread(self._get_analyze_body, file_location, file_data)
+        url = self._get_analyze_url(self._endpoint, self._api_version, analyzer_id)
+        try:
+            if isinstance(data, dict):
+                response = await self._send(SUBMIT, "POST", url, headers=headers, json=data)
+            elif isinstance(data, bytes):
+                response = await self._send(SUBMIT, "POST", url, headers=headers, content=data)
+            else:
+                if hasattr(data, "__len__"):
+                    headers["Content-Length"] = str(len(data))
+                response = await self._send(SUBMIT, "POST", url, content_stream=data, headers=headers)
+        finally:
+            if data is not file_data and isinstance(data, UploadStream):
+                data.close()
+
+        response.raise_for_status()
+        await asyncio.to_thread(self._track_operation, analyzer_id, job_key, cache_key, response)
+        self._logger.info(
+            f"Analyzing file {file_location} with analyzer: {analyzer_id}"
+        )
+        return response
+
+    async def poll_result(
+        self,
+        response: httpx.Response | requests.Response,
+        timeout_seconds: int = 120,
+        polling_interval_seconds: int = 2,
+        polling_strategy: PollingStrategy | None = None,
+    ) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        """
+        Polls the result of an asynchronous operation until it completes or times out.
+
+        Args:
+            response (Response): The initial response object containing the operation location.
+            timeout_seconds (int, optional): The maximum number of seconds to wait for the operation to complete. Defaults to 120.
+            polling_interval_seconds (int, optional): The initial number of seconds between polling attempts,
+                backing off from there. Defaults to 2. Ignored when polling_strategy is given.
+            polling_strategy (PollingStrategy, optional): Decides when to poll. Retry-After headers are always honored.
+
+        Raises:
+            ValueError: If the operation location is not found in the response headers.
+            TimeoutError: If the operation does not complete within the specified timeout.
+            RuntimeError: If the operation fails.
+
+        Returns:
+            dict: The JSON response of the completed operation if it succeeds.
+        """
+        if isinstance(response, CachedResponse):
+            return response.result
+
+        operation_location = self._get_operation_location(response)
+        polling_strategy = polling_strategy or PollingStrategy(
+            interval_seconds=polling_interval_seconds
+        )
+
+        start_time = time.time()
+        attempt = 0
+        retry_after = parse_retry_after(response.headers)
+        while True:
+            remaining_seconds = timeout_seconds - (time.time() - start_time)
+            if remaining_seconds < 0:
+                raise TimeoutError(
+                    f"Operation timed out after {timeout_seconds:.2f} seconds."
+                )
+            await asyncio.sleep(min(polling_strategy.next_delay(attempt, retry_after), remaining_seconds))
+
+            elapsed_time = time.time() - start_time
+            response = await self._send(POLL, "GET", operation_location, headers=await self._get_request_headers())
+            if response.status_code == 404:
+                # The service no longer knows the operation; the job has to be submitted again
+                await asyncio.to_thread(self._record_status, operation_location, EXPIRED)
+            response.raise_for_status()
+            result = cast(dict[str, Any], response.json())
+            if await asyncio.to_thread(self._check_status, operation_location, result):
+                self._logger.info(
+                    f"Request result is ready after {elapsed_time:.2f} seconds."
+                )
+                return result
+            attempt += 1
+            retry_after = parse_retry_after(response.headers)
+
+    async def _get_request_headers(self) -> dict[str, str]:
+        """Returns `_headers` without blocking the event loop while a token is fetched."""
+        if self._token_provider is None:
+            return self._headers
+        return await asyncio.to_thread(lambda: self._headers)
+
+    async def _send(
+        self,
+        budget: str,
+        method: str,
+        url: str,
+        content_stream: BinaryIO | None = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Sends a request like `send_with_retry` does for the sync client: after waiting for the rate
+        limiter, and again per the retry policy if it is throttled, hits a transient server error
+        or loses its connection. A stream body is read from its start again on each attempt,
+        if it can be rewound; otherwise it is sent only once.
+        """
+        body_position = _get_body_position(content_stream) if content_stream is not None else 0
+        attempt = 0
+        while True:
+            if self._rate_limiter is not None:
+                await asyncio.sleep(self._rate_limiter.reserve(budget))
+            if content_stream is not None:
+                kwargs["content"] = _aiter_stream(content_stream)
+            can_retry = attempt + 1 < self._retry_policy.max_attempts and body_position is not None
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except (httpx.NetworkError, httpx.RemoteProtocolError) as e:
+                if not can_retry:
+                    raise
+                delay = self._retry_policy.next_delay(attempt)
+                reason = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code not in self._retry_policy.retry_statuses or not can_retry:
+                    return response
+                delay = self._retry_policy.next_delay(attempt, parse_retry_after(response.headers))
+                if response.status_code == 429 and self._rate_limiter is not None:
+                    self._rate_limiter.pause(budget, delay)
+                reason = f"HTTP {response.status_code}"
+                await response.aclose()
+
+            self._logger.warning(
+                f"{method} {url.split('?', 1)[0]} failed ({reason}); retry {attempt + 1} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+            if content_stream is not None:
+                await asyncio.to_thread(content_stream.seek, body_position)
+            attempt += 1
+
+
+async def _aiter_stream(stream: BinaryIO) -> AsyncIterator[bytes]:
+    """Reads a blocking file-like object in a worker thread, one chunk at a time."""
+    while True:
+        chunk = await asyncio.to_thread(stream.read, UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
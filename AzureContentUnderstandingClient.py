@@ -0,0 +1,1005 @@
+import email.utils
+import io
+import json
+import logging
+import random
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, cast
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from AnalysisResult import StreamingAnalysisResult
+from JobJournal import EXPIRED, FAILED, SUCCEEDED, JobJournal
+from RateLimiter import POLL, SUBMIT, RateLimiter
+from ResultCache import ResultCache, get_content_id
+from TokenProvider import get_token_provider
+from UploadStream import UPLOAD_BUFFER_BYTES, UploadStream
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, kw_only=True)
+class Settings:
+    endpoint: str
+    api_version: str
+    subscription_key: str | None = None
+    aad_token: str | None = None
+    # An azure.identity credential, e.g. DefaultAzureCredential(), to get AAD tokens from as needed
+    credential: Any | None = None
+    analyzer_id: str
+    file_location: str
+
+    def __post_init__(self):
+        key_not_provided = (
+            not self.subscription_key
+            or self.subscription_key == "AZURE_CONTENT_UNDERSTANDING_SUBSCRIPTION_KEY"
+        )
+        token_not_provided = (
+            not self.aad_token
+            or self.aad_token == "AZURE_CONTENT_UNDERSTANDING_AAD_TOKEN"
+        )
+        if key_not_provided and token_not_provided and self.credential is None:
+            raise ValueError(
+                "Either 'subscription_key', 'aad_token' or 'credential' must be provided"
+            )
+
+    @property
+    def token_provider(self) -> Callable[[], str] | None:
+        if self.credential is not None:
+            # Shared by every client using this credential, and refreshed before it expires
+            return get_token_provider(self.credential)
+
+        aad_token = self.aad_token
+        if aad_token is None:
+            return None
+
+        return lambda: aad_token
+
+
+@dataclass(frozen=True)
+class PollingStrategy:
+    """
+    Decides how long to wait before each poll of a long-running operation.
+
+    The first poll is scheduled after `initial_delay_seconds`, which callers can set
+    from an estimate of how long the job takes (see `for_expected_duration`). After that
+    the wait grows from `interval_seconds` by `multiplier` per poll, capped at
+    `max_interval_seconds`, with +/- `jitter` (a fraction) so that many jobs started
+    together do not poll in lockstep. A Retry-After sent by the service always wins.
+    """
+
+    initial_delay_seconds: float = 1.0
+    interval_seconds: float = 1.0
+    max_interval_seconds: float = 30.0
+    multiplier: float = 1.5
+    jitter: float = 0.1
+
+    @classmethod
+    def for_expected_duration(cls, expected_seconds: float, **kwargs: Any) -> "PollingStrategy":
+        """
+        A strategy for a job expected to take about `expected_seconds`, e.g. derived from a
+        video's duration: the first poll comes shortly before the job should be done,
+        and polls after that are spaced relative to the expected duration.
+        """
+        kwargs.setdefault("initial_delay_seconds", expected_seconds * 0.8)
+        kwargs.setdefault("interval_seconds", max(1.0, expected_seconds * 0.05))
+        return cls(**kwargs)
+
+    def next_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """
+        Returns the number of seconds to wait before poll number `attempt` (0 for the first poll).
+
+        Args:
+            attempt (int): The number of polls already made.
+            retry_after (float, optional): The Retry-After of the last response, in seconds.
+        """
+        if retry_after is not None:
+            return retry_after
+        if attempt == 0:
+            return self.initial_delay_seconds
+
+        delay = self.interval_seconds * self.multiplier ** (attempt - 1)
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(0.0, min(self.max_interval_seconds, delay))
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    """
+    Returns the Retry-After (or retry-after-ms) of a response in seconds, or None if there is none.
+    Both the delay-seconds and the HTTP-date forms are supported.
+    """
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Decides whether and when a failed request is sent again.
+
+    Throttled requests (429), transient server errors and dropped connections are retried,
+    up to `max_attempts` attempts in all. The wait doubles from `backoff_seconds` with each
+    retry, capped at `max_backoff_seconds`, and is randomized between half and all of that
+    so that throttled workers do not come back in lockstep. A Retry-After sent by the service always wins.
+    """
+
+    max_attempts: int = 5
+    backoff_seconds: float = 1.0
+    max_backoff_seconds: float = 60.0
+    retry_statuses: frozenset[int] = frozenset({408, 429, 500, 502, 503, 504})
+
+    def next_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """
+        Returns the number of seconds to wait before retry number `attempt` (0 for the first retry).
+
+        Args:
+            attempt (int): The number of retries already made.
+            retry_after (float, optional): The Retry-After of the failed response, in seconds.
+        """
+        if retry_after is not None:
+            return retry_after
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * 2**attempt)
+        return random.uniform(delay / 2, delay)
+
+
+def _get_body_position(body: Any) -> int | None:
+    """Returns where a stream body starts, 0 for bodies that are sent whole, or None if it cannot be sent again."""
+    if not hasattr(body, "read"):
+        return 0
+    seekable = getattr(body, "seekable", None)
+    if seekable is None or not seekable():
+        return None
+    return body.tell()
+
+
+def send_with_retry(
+    session: Any,
+    method: str,
+    url: str,
+    budget: str = POLL,
+    retry_policy: RetryPolicy | None = None,
+    rate_limiter: RateLimiter | None = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    Sends a request, first waiting for the rate limiter, and sends it again per the retry policy
+    if it is throttled, hits a transient server error or loses its connection.
+
+    A 429 also pauses the whole budget of the rate limiter, so the other threads back off
+    with this one instead of each being throttled in turn. A stream body is rewound before
+    it is sent again; one that cannot be rewound is sent only once.
+
+    Args:
+        session (Session): What sends the request: a requests.Session, or the requests module.
+        method (str): The HTTP method.
+        url (str): The URL.
+        budget (str, optional): The rate limiter budget the request is charged to, SUBMIT or POLL.
+        retry_policy (RetryPolicy, optional): When to retry. Defaults to RetryPolicy().
+        rate_limiter (RateLimiter, optional): The request budgets shared with other callers.
+        **kwargs: Passed on to session.request.
+
+    Returns:
+        Response: The last response. Callers check its status as usual.
+
+    Raises:
+        ConnectionError: If the connection failed on every attempt.
+    """
+    retry_policy = retry_policy or RetryPolicy()
+    body = kwargs.get("data")
+    body_position = _get_body_position(body)
+    attempt = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire(budget)
+        can_retry = attempt + 1 < retry_policy.max_attempts and body_position is not None
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.ConnectionError as e:
+            if not can_retry:
+                raise
+            delay = retry_policy.next_delay(attempt)
+            reason = f"{type(e).__name__}: {e}"
+        else:
+            if response.status_code not in retry_policy.retry_statuses or not can_retry:
+                return response
+            delay = retry_policy.next_delay(attempt, parse_retry_after(response.headers))
+            if response.status_code == 429 and rate_limiter is not None:
+                rate_limiter.pause(budget, delay)
+            reason = f"HTTP {response.status_code}"
+            response.close()
+
+        logger.warning(f"{method} {url.split('?', 1)[0]} failed ({reason}); retry {attempt + 1} in {delay:.1f}s")
+        time.sleep(delay)
+        if hasattr(body, "seek"):
+            body.seek(body_position)
+        attempt += 1
+
+
+# Analyzer properties the service can change in place; any other change needs a new analyzer
+MUTABLE_ANALYZER_PROPERTIES = frozenset({"description", "tags"})
+# Analyzer properties the service fills in with defaults for settings left out
+DEFAULTED_ANALYZER_PROPERTIES = frozenset({"config"})
+
+
+def diff_analyzer(current: Mapping[str, Any], desired: Mapping[str, Any]) -> dict[str, Any]:
+    """
+    Returns the top-level properties of the desired analyzer definition that the current one,
+    as returned by the service, does not match. Properties only the service sets (status,
+    timestamps) and config defaults it filled in are not compared.
+    """
+    changes = {}
+    for name, value in desired.items():
+        current_value = current.get(name)
+        if name in DEFAULTED_ANALYZER_PROPERTIES and isinstance(value, Mapping):
+            matches = isinstance(current_value, Mapping) and all(
+                current_value.get(key) == setting for key, setting in value.items()
+            )
+        else:
+            matches = current_value == value
+        if not matches:
+            changes[name] = value
+    return changes
+
+
+class OperationFailedError(RuntimeError):
+    """
+    Raised when a polled operation ends as Failed. `result` holds the operation, with its error.
+    """
+
+    def __init__(self, result: dict[str, Any]) -> None:
+        super().__init__("Request failed.")
+        self.result: dict[str, Any] = result
+
+
+class CachedResponse(requests.Response):
+    """
+    Stands in for the response of `begin_analyze` when the result came from the result cache.
+    `poll_result` returns its result without calling the service.
+    """
+
+    def __init__(self, result: dict[str, Any]) -> None:
+        super().__init__()
+        self.status_code = 200
+        self.result: dict[str, Any] = result
+
+
+class ContentUnderstandingClientBase:
+    """
+    What the sync and async Content Understanding clients share: configuration,
+    auth headers, URLs and request bodies. Transport is left to the subclasses.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        api_version: str,
+        subscription_key: str | None = None,
+        token_provider: Callable[[], str] | None = None,
+        x_ms_useragent: str = "cu-sample-code",
+        result_cache: ResultCache | None = None,
+        job_journal: JobJournal | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        upload_buffer_bytes: int = UPLOAD_BUFFER_BYTES,
+    ) -> None:
+        if not subscription_key and token_provider is None:
+            raise ValueError(
+                "Either subscription key or token provider must be provided"
+            )
+        if not api_version:
+            raise ValueError("API version must be provided")
+        if not endpoint:
+            raise ValueError("Endpoint must be provided")
+
+        self._endpoint: str = endpoint.rstrip("/")
+        self._api_version: str = api_version
+        self._logger: logging.Logger = logging.getLogger(__name__)
+        self._logger.setLevel(logging.INFO)
+        # A subscription key wins; otherwise a token is taken from the provider for every request
+        self._token_provider: Callable[[], str] | None = None if subscription_key else token_provider
+        self._static_headers: dict[str, str] = self._get_headers(
+            subscription_key, None, x_ms_useragent
+        )
+        self._result_cache: ResultCache | None = result_cache
+        self._job_journal: JobJournal | None = job_journal
+        self._rate_limiter: RateLimiter | None = rate_limiter
+        self._retry_policy: RetryPolicy = retry_policy or RetryPolicy()
+        self._upload_buffer_bytes: int = upload_buffer_bytes
+        # Analyzers whose results are not cached, since their schema is not registered
+        self._uncached_analyzers: set[str] = set()
+        # Cache keys of submitted analyses, by operation location, until their result is stored
+        self._pending_cache_keys: dict[str, str] = {}
+
+    @property
+    def _headers(self) -> dict[str, str]:
+        """The headers of the next request, with a current token when authenticating with AAD."""
+        if self._token_provider is None:
+            return dict(self._static_headers)
+        return dict(self._static_headers, Authorization=f"Bearer {self._token_provider()}")
+
+    def _get_cached_result(
+        self,
+        analyzer_id: str,
+        file_location: str,
+        file_data: bytes | BinaryIO | None,
+        content_id: str | None,
+    ) -> tuple[str | None, dict[str, Any] | None]:
+        """Returns the cache key of an analyze request and the cached result, if any."""
+        if self._result_cache is None:
+            return None, None
+        if not self._result_cache.has_schema(analyzer_id):
+            # Without the schema, a result of an older definition of the analyzer could be reused
+            if analyzer_id not in self._uncached_analyzers:
+                self._uncached_analyzers.add(analyzer_id)
+                self._logger.warning(
+                    f"Not caching results of analyzer {analyzer_id}: its schema is not registered with the result cache"
+                )
+            return None, None
+        content_id = content_id or get_content_id(file_location, file_data)
+        if content_id is None:
+            return None, None
+
+        cache_key = self._result_cache.make_key(analyzer_id, self._api_version, content_id)
+        result = self._result_cache.get(cache_key)
+        if result is not None:
+            self._logger.info(f"Using cached result for {file_location} with analyzer: {analyzer_id}")
+        return cache_key, result
+
+    def _get_job_key(self, file_location: str, job_key: str | None) -> str | None:
+        if self._job_journal is None:
+            return None
+        # Without a caller-supplied key, a job is its file; SAS tokens change on every run
+        return job_key or file_location.split("?", 1)[0]
+
+    def _get_resumed_response(
+        self, job_key: str | None, analyzer_id: str
+    ) -> requests.Response | None:
+        """Returns a response pointing at the running analysis of the job by the analyzer, if the journal has one."""
+        if self._job_journal is None or job_key is None:
+            return None
+        record = self._job_journal.get_pending(job_key, analyzer_id)
+        if record is None:
+            return None
+
+        operation_location = record["operation_location"]
+        if record.get("cache_key"):
+            self._pending_cache_keys[operation_location] = record["cache_key"]
+        self._logger.info(f"Resuming analysis of {job_key} at {operation_location}")
+        response = requests.Response()
+        response.status_code = 202
+        response.headers["operation-location"] = operation_location
+        return response
+
+    def _track_operation(
+        self, analyzer_id: str, job_key: str | None, cache_key: str | None, response
+    ) -> None:
+        """Remembers a submitted analysis for the result cache and the job journal."""
+        operation_location = self._get_operation_location(response)
+        if cache_key is not None:
+            self._pending_cache_keys[operation_location] = cache_key
+        if self._job_journal is not None and job_key is not None:
+            self._job_journal.record_submitted(
+                job_key, analyzer_id, operation_location, cache_key
+            )
+
+    def _store_result(self, operation_location: str, result: dict[str, Any]) -> None:
+        cache_key = self._pending_cache_keys.pop(operation_location, None)
+        if cache_key is not None and self._result_cache is not None:
+            self._result_cache.put(cache_key, result)
+        self._record_status(operation_location, SUCCEEDED)
+
+    def _record_status(self, operation_location: str, status: str) -> None:
+        if status != SUCCEEDED:
+            self._pending_cache_keys.pop(operation_location, None)
+        if self._job_journal is not None:
+            self._job_journal.record_status(operation_location, status)
+
+    def _check_status(
+        self,
+        operation_location: str,
+        result: dict[str, Any] | StreamingAnalysisResult,
+        stream: bool = False,
+    ) -> bool:
+        """
+        Returns whether a polled operation succeeded, after storing its result and status.
+
+        Raises:
+            OperationFailedError: If the operation failed.
+        """
+        status = result.get("status", "").lower()
+        # An analyzer polled directly (see begin_deploy_analyzer) is done once it is "ready"
+        if status in ("succeeded", "ready"):
+            if stream:
+                self._pending_cache_keys.pop(operation_location, None)
+                self._record_status(operation_location, SUCCEEDED)
+            else:
+                self._store_result(operation_location, cast(dict[str, Any], result))
+            return True
+        if status == "failed":
+            if isinstance(result, StreamingAnalysisResult):
+                result = result.to_dict()
+            self._logger.error(f"Request failed. Reason: {result}")
+            self._record_status(operation_location, FAILED)
+            raise OperationFailedError(result)
+
+        self._logger.info(
+            f"Request {operation_location.split('/')[-1].split('?')[0]} in progress ..."
+        )
+        if isinstance(result, StreamingAnalysisResult):
+            result.close()
+        return False
+
+    def _get_analyze_body(
+        self, file_location: str, file_data: bytes | BinaryIO | None
+    ) -> tuple[bytes | BinaryIO | dict[str, str], dict[str, str]]:
+        """Returns the body of an analyze request and its headers.
+        Local files, and streams that cannot be rewound, are sent through an UploadStream,
+        so at most `upload_buffer_bytes` of them is in memory; the caller closes it.
+        Raises:
+            ValueError: If the file location is not a valid path or URL.
+        """
+        if file_data is not None:
+            data = file_data
+            if _get_body_position(file_data) is None:
+                # Spooled, so that it can be sent again if the request is retried
+                data = UploadStream.spool(file_data, self._upload_buffer_bytes)
+            headers = {"Content-Type": "application/octet-stream"}
+        elif Path(file_location).exists():
+            data = UploadStream.from_file(file_location, self._upload_buffer_bytes)
+            headers = {"Content-Type": "application/octet-stream"}
+        elif "https://" in file_location or "http://" in file_location:
+            data = {"url": file_location}
+            headers = {"Content-Type": "application/json"}
+        else:
+            raise ValueError("File location must be a valid path or URL.")
+
+        headers.update(self._headers)
+        return data, headers
+
+    def _get_operation_location(self, response) -> str:
+        operation_location = response.headers.get("operation-location", "")
+        if not operation_location:
+            raise ValueError("Operation location not found in response headers.")
+        return operation_location
+
+    def _get_analyzer_url(self, analyzer_id: str) -> str:
+        return f"{self._endpoint}/contentunderstanding/analyzers/{analyzer_id}?api-version={self._api_version}"
+
+    def _get_analyze_url(self, endpoint: str, api_version: str, analyzer_id: str):
+        return f"{endpoint}/contentunderstanding/analyzers/{analyzer_id}:analyze?api-version={api_version}&stringEncoding=utf16"
+
+    def _get_headers(
+        self, subscription_key: str | None, api_token: str | None, x_ms_useragent: str
+    ) -> dict[str, str]:
+        """Returns the headers for the HTTP requests.
+        Args:
+            subscription_key (str): The subscription key for the service.
+            api_token (str): The API token for the service.
+            enable_face_identification (bool): A flag to enable face identification.
+        Returns:
+            dict: A dictionary containing the headers for the HTTP requests.
+        """
+        headers = {}
+        if subscription_key:
+            headers["Ocp-Apim-Subscription-Key"] = subscription_key
+        elif api_token:
+            headers["Authorization"] = f"Bearer {api_token}"
+        headers["x-ms-useragent"] = x_ms_useragent
+        return headers
+
+
+class AzureContentUnderstandingClient(ContentUnderstandingClientBase):
+    def __init__(
+        self,
+        endpoint: str,
+        api_version: str,
+        subscription_key: str | None = None,
+        token_provider: Callable[[], str] | None = None,
+        x_ms_useragent: str = "cu-sample-code",
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        session: requests.Session | None = None,
+        result_cache: ResultCache | None = None,
+        job_journal: JobJournal | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        upload_buffer_bytes: int = UPLOAD_BUFFER_BYTES,
+    ) -> None:
+        """
+        Args:
+            endpoint (str): The Content Understanding endpoint.
+            api_version (str): The API version to use.
+            subscription_key (str, optional): The subscription key for the service.
+            token_provider (Callable[[], str], optional): Returns an AAD token for the service. It is called
+                for every request, so use one that caches tokens, e.g. TokenProvider.get_token_provider().
+            x_ms_useragent (str, optional): The user agent reported to the service.
+            pool_connections (int, optional): The number of hosts to keep connection pools for. Defaults to 10.
+            pool_maxsize (int, optional): The number of kept-alive connections per host.
+                Set it to the number of threads sharing the client. Defaults to 10.
+            session (Session, optional): A session to share with other clients. One with the
+                configured pool is created when omitted.
+            result_cache (ResultCache, optional): Results of inputs analyzed before are taken from
+                this cache instead of being analyzed again.
+            job_journal (JobJournal, optional): Records submitted analyses, so that after a restart
+                `begin_analyze` re-attaches to a running analysis instead of submitting it again.
+            rate_limiter (RateLimiter, optional): Request budgets to share with other clients, so that
+                together they stay under the service's quota.
+            retry_policy (RetryPolicy, optional): How throttled and failed requests are retried.
+                Defaults to RetryPolicy(); RetryPolicy(max_attempts=1) disables retries.
+            upload_buffer_bytes (int, optional): The most bytes of a file held in memory while it is
+                uploaded. Defaults to 1 MiB.
+        """
+        super().__init__(
+            endpoint,
+            api_version,
+            subscription_key,
+            token_provider,
+            x_ms_useragent,
+            result_cache,
+            job_journal,
+            rate_limiter,
+            retry_policy,
+            upload_buffer_bytes,
+        )
+        # One session for all calls, so polls reuse kept-alive TCP+TLS connections
+        self._owns_session: bool = session is None
+        self._session: requests.Session = session or self.create_session(
+            pool_connections, pool_maxsize
+        )
+
+    @staticmethod
+    def create_session(pool_connections: int = 10, pool_maxsize: int = 10) -> requests.Session:
+        """
+        Creates a session with connection pools sized for the given number of hosts and
+        concurrent requests. Connections are kept alive and reused between requests.
+        """
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self) -> None:
+        """Closes the pooled connections, unless the session was passed in by the caller."""
+        if self._owns_session:
+            self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _send(self, budget: str, method: str, url: str, **kwargs: Any) -> requests.Response:
+        return send_with_retry(
+            self._session, method, url, budget, self._retry_policy, self._rate_limiter, **kwargs
+        )
+
+    def begin_analyze(
+        self,
+        analyzer_id: str,
+        file_location: str,
+        file_data: bytes | BinaryIO | None = None,
+        content_id: str | None = None,
+        job_key: str | None = None,
+    ):
+        """
+        Begins the analysis of a file or URL using the specified analyzer.
+
+        Args:
+            analyzer_id (str): The ID of the analyzer to use.
+            file_location (str): The path to the file or the URL to analyze.
+            file_data (bytes | BinaryIO, optional): The file content, or a readable stream (e.g. a BlobReadStream
+                or an UploadStream with a progress callback) that is sent as the request body without
+                being read into memory first. A stream that cannot be rewound is spooled to disk first.
+                When omitted, file_location is streamed from disk or, if it is a URL
+                (e.g. a blob SAS URL), only the URL is sent and the service fetches the file itself.
+            content_id (str, optional): Identifies the content for the result cache, e.g. the blob's
+                ETag for a SAS URL. Derived from the content itself when omitted.
+            job_key (str, optional): Identifies the job in the job journal, e.g. the blob name.
+                Defaults to file_location without its query string.
+
+        Returns:
+            Response: The response from the analysis request, or a CachedResponse on a cache hit.
+                For a job the journal shows as still running, a response pointing at that analysis.
+
+        Raises:
+            ValueError: If the file location is not a valid path or URL.
+            HTTPError: If the HTTP request returned an unsuccessful status code.
+        """
+        cache_key, cached_result = self._get_cached_result(
+            analyzer_id, file_location, file_data, content_id
+        )
+        if cached_result is not None:
+            return CachedResponse(cached_result)
+        job_key = self._get_job_key(file_location, job_key)
+        resumed_response = self._get_resumed_response(job_key, analyzer_id)
+        if resumed_response is not None:
+            return resumed_response
+
+        data, headers = self._get_analyze_body(file_location, file_data)
+        try:
+            if isinstance(data, dict):
+                response = self._send(
+                    SUBMIT,
+                    "POST",
+                    self._get_analyze_url(self._endpoint, self._api_version, analyzer_id),
+                    headers=headers,
+                    json=data,
+                )
+            else:
+                response = self._send(
+                    SUBMIT,
+                    "POST",
+                    self._get_analyze_url(self._endpoint, self._api_version, analyzer_id),
+                    headers=headers,
+                    data=data,
+                )
+        finally:
+            if data is not file_data and isinstance(data, UploadStream):
+                data.close()
+
+        response.raise_for_status()
+        self._track_operation(analyzer_id, job_key, cache_key, response)
+        self._logger.info(
+            f"Analyzing file {file_location} with analyzer: {analyzer_id}"
+        )
+        return response
+
+    def poll_result(
+        self,
+        response: requests.Response,
+        timeout_seconds: int = 120,
+        polling_interval_seconds: int = 2,
+        polling_strategy: PollingStrategy | None = None,
+    ) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        """
+        Polls the result of an asynchronous operation until it completes or times out.
+
+        Args:
+            response (Response): The initial response object containing the operation location.
+            timeout_seconds (int, optional): The maximum number of seconds to wait for the operation to complete. Defaults to 120.
+            polling_interval_seconds (int, optional): The initial number of seconds between polling attempts,
+                backing off from there. Defaults to 2. Ignored when polling_strategy is given.
+            polling_strategy (PollingStrategy, optional): Decides when to poll. Retry-After headers are always honored.
+
+        Raises:
+            ValueError: If the operation location is not found in the response headers.
+            TimeoutError: If the operation does not complete within the specified timeout.
+            RuntimeError: If the operation fails.
+
+        Returns:
+            dict: The JSON response of the completed operation if it succeeds.
+        """
+        if isinstance(response, CachedResponse):
+            return response.result
+
+        polling_strategy = polling_strategy or PollingStrategy(
+            interval_seconds=polling_interval_seconds
+        )
+        return cast(
+            dict[str, Any],
+            self._poll_operation(response, timeout_seconds, polling_strategy, stream=False),
+        )
+
+    def poll_result_stream(
+        self,
+        response: requests.Response,
+        timeout_seconds: int = 120,
+        polling_interval_seconds: int = 2,
+        polling_strategy: PollingStrategy | None = None,
+    ) -> StreamingAnalysisResult:
+        """
+        Like `poll_result`, but the final result is streamed rather than read into memory.
+
+        Iterate `iter_contents()` of the returned result to parse its contents one at a time,
+        and close it (or use it as a context manager) to release the connection. Streamed
+        results are not added to the result cache, since they are never held whole.
+
+        Args:
+            response (Response): The initial response object containing the operation location.
+            timeout_seconds (int, optional): The maximum number of seconds to wait for the operation to complete. Defaults to 120.
+            polling_interval_seconds (int, optional): The initial number of seconds between polling attempts. Defaults to 2.
+            polling_strategy (PollingStrategy, optional): Decides when to poll. Retry-After headers are always honored.
+
+        Raises:
+            ValueError: If the operation location is not found in the response headers.
+            TimeoutError: If the operation does not complete within the specified timeout.
+            RuntimeError: If the operation fails.
+
+        Returns:
+            StreamingAnalysisResult: The succeeded operation, positioned before its contents.
+        """
+        if isinstance(response, CachedResponse):
+            return StreamingAnalysisResult(io.BytesIO(json.dumps(response.result).encode("utf-8")))
+
+        polling_strategy = polling_strategy or PollingStrategy(
+            interval_seconds=polling_interval_seconds
+        )
+        return cast(
+            StreamingAnalysisResult,
+            self._poll_operation(response, timeout_seconds, polling_strategy, stream=True),
+        )
+
+    def _poll_operation(
+        self,
+        response: requests.Response,
+        timeout_seconds: int,
+        polling_strategy: PollingStrategy,
+        stream: bool,
+    ) -> dict[str, Any] | StreamingAnalysisResult:
+        operation_location = self._get_operation_location(response)
+
+        start_time = time.time()
+        attempt = 0
+        retry_after = parse_retry_after(response.headers)
+        while True:
+            remaining_seconds = timeout_seconds - (time.time() - start_time)
+            if remaining_seconds < 0:
+                raise TimeoutError(
+                    f"Operation timed out after {timeout_seconds:.2f} seconds."
+                )
+            time.sleep(min(polling_strategy.next_delay(attempt, retry_after), remaining_seconds))
+
+            elapsed_time = time.time() - start_time
+            self._logger.info(
+                "Waiting for service response", extra={"elapsed": elapsed_time}
+            )
+            response = self._send(
+                POLL, "GET", operation_location, headers=self._headers, stream=stream
+            )
+            if response.status_code == 404:
+                # The service no longer knows the operation; the job has to be submitted again
+                self._record_status(operation_location, EXPIRED)
+            response.raise_for_status()
+            if stream:
+                result = StreamingAnalysisResult.from_response(response)
+            else:
+                result = cast(dict[str, Any], response.json())
+            if self._check_status(operation_location, result, stream):
+                self._logger.info(
+                    f"Request result is ready after {elapsed_time:.2f} seconds."
+                )
+                return result
+            attempt += 1
+            retry_after = parse_retry_after(response.headers)
+
+    def poll_once(
+        self, operation: requests.Response | str
+    ) -> tuple[dict[str, Any] | None, float | None]:
+        """
+        Polls an analysis or analyzer operation once, for callers that schedule the polls of many
+        operations themselves (see OperationPoller). A finished operation is handled as by `poll_result`.
+
+        Args:
+            operation (Response | str): The response that started the operation, or its operation location.
+
+        Returns:
+            tuple: The result if the operation succeeded, otherwise None; and the Retry-After
+                of the response in seconds, if it had one.
+
+        Raises:
+            OperationFailedError: If the operation failed.
+            HTTPError: If the HTTP request returned an unsuccessful status code.
+        """
+        if isinstance(operation, CachedResponse):
+            return operation.result, None
+        operation_location = (
+            operation if isinstance(operation, str) else self._get_operation_location(operation)
+        )
+
+        response = self._send(POLL, "GET", operation_location, headers=self._headers)
+        if response.status_code == 404:
+            # The service no longer knows the operation; the job has to be submitted again
+            self._record_status(operation_location, EXPIRED)
+        response.raise_for_status()
+        result = cast(dict[str, Any], response.json())
+        if self._check_status(operation_location, result):
+            return result, None
+        return None, parse_retry_after(response.headers)
+
+    def get_analyzer(self, analyzer_id: str) -> dict[str, Any] | None:
+        """
+        Returns the analyzer definition as stored by the service, or None if there is no such analyzer.
+        """
+        response = self._send(
+            POLL, "GET", self._get_analyzer_url(analyzer_id), headers=self._headers
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def begin_create_analyzer(
+        self, analyzer_id: str, analyzer_definition: dict[str, Any]
+    ) -> requests.Response:
+        """
+        Begins creating an analyzer. Pass the response to `poll_result` to wait for it.
+
+        Raises:
+            HTTPError: If the HTTP request returned an unsuccessful status code,
+                e.g. 409 if the analyzer already exists.
+        """
+        headers = {"Content-Type": "application/json"}
+        headers.update(self._headers)
+        response = self._send(
+            SUBMIT, "PUT", self._get_analyzer_url(analyzer_id), headers=headers, json=analyzer_definition
+        )
+        response.raise_for_status()
+        self._logger.info(f"Creating analyzer: {analyzer_id}")
+        return response
+
+    def update_analyzer(self, analyzer_id: str, changes: dict[str, Any]) -> dict[str, Any]:
+        """
+        Changes properties of an existing analyzer in place. Only MUTABLE_ANALYZER_PROPERTIES can be changed.
+        """
+        headers = {"Content-Type": "application/merge-patch+json"}
+        headers.update(self._headers)
+        response = self._send(
+            SUBMIT, "PATCH", self._get_analyzer_url(analyzer_id), headers=headers, json=changes
+        )
+        response.raise_for_status()
+        self._logger.info(f"Updated {', '.join(changes)} of analyzer: {analyzer_id}")
+        return response.json()
+
+    def delete_analyzer(self, analyzer_id: str) -> None:
+        """
+        Deletes an analyzer. Deleting an analyzer that does not exist is not an error.
+        """
+        response = self._send(
+            SUBMIT, "DELETE", self._get_analyzer_url(analyzer_id), headers=self._headers
+        )
+        if response.status_code != 404:
+            response.raise_for_status()
+        self._logger.info(f"Deleted analyzer: {analyzer_id}")
+
+    def begin_deploy_analyzer(
+        self,
+        analyzer_id: str,
+        analyzer_definition: dict[str, Any],
+        force: bool = False,
+    ) -> tuple[str, requests.Response | None]:
+        """
+        Makes the analyzer match the definition, doing as little as possible: nothing if it already
+        matches, an in-place update if only mutable properties differ, and a delete and create only
+        when the schema itself changed. Analyses running on an unchanged analyzer are not disturbed.
+
+        Several workers can deploy the same definition at startup: a worker that finds the
+        analyzer being created by another (a 409 on create, or an analyzer that is not ready yet)
+        waits for that one instead, and an analyzer is only deleted if it is still the one this
+        worker found outdated, not one another worker has just recreated.
+
+        Args:
+            analyzer_id (str): The ID of the analyzer.
+            analyzer_definition (dict): The analyzer definition, e.g. the content of qm_video_schema_2.0.json.
+            force (bool, optional): Delete and recreate the analyzer even if it matches. Defaults to False.
+
+        Returns:
+            tuple: What is being done ("unchanged", "updated", "created" or "recreated"), and
+                the response to pass to `poll_result` to wait until the analyzer is ready, or
+                None if it already is.
+        """
+        current = self.get_analyzer(analyzer_id)
+        if current is not None and not force and current.get("status") != "failed":
+            changes = diff_analyzer(current, analyzer_definition)
+            if not changes:
+                if current.get("status", "ready") != "ready":
+                    self._logger.info(f"Analyzer {analyzer_id} is up to date but still {current['status']}")
+                    return "unchanged", self._get_analyzer_ready_response(analyzer_id)
+                self._logger.info(f"Analyzer {analyzer_id} is up to date")
+                return "unchanged", None
+            if changes.keys() <= MUTABLE_ANALYZER_PROPERTIES:
+                self.update_analyzer(analyzer_id, changes)
+                return "updated", None
+            self._logger.info(
+                f"Analyzer {analyzer_id} differs in {', '.join(changes)}; recreating it"
+            )
+
+        if current is not None:
+            latest = self.get_analyzer(analyzer_id)
+            if latest is not None and latest.get("createdAt") != current.get("createdAt"):
+                # Another worker recreated it since; use theirs if it is this definition
+                return self._join_analyzer_creation(analyzer_id, analyzer_definition, latest)
+            self.delete_analyzer(analyzer_id)
+        response = self._create_analyzer_or_join(analyzer_id, analyzer_definition)
+        if response is None:
+            return self._join_analyzer_creation(analyzer_id, analyzer_definition)
+        return ("created" if current is None else "recreated"), response
+
+    def _create_analyzer_or_join(
+        self, analyzer_id: str, analyzer_definition: dict[str, Any], timeout_seconds: float = 60
+    ) -> requests.Response | None:
+        """
+        Begins creating the analyzer. Returns None if another worker created it with the same
+        definition meanwhile, so the caller waits for that one instead.
+        """
+        deadline = time.time() + timeout_seconds
+        delay = 0.5
+        while True:
+            try:
+                return self.begin_create_analyzer(analyzer_id, analyzer_definition)
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 409:
+                    raise
+            current = self.get_analyzer(analyzer_id)
+            if current is not None and current.get("status") != "failed" and not diff_analyzer(current, analyzer_definition):
+                return None
+            if time.time() >= deadline:
+                raise RuntimeError(
+                    f"Analyzer {analyzer_id} exists with another definition and was not deleted in time"
+                )
+            # A deleted analyzer can take a moment to free its id
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    def _join_analyzer_creation(
+        self, analyzer_id: str, analyzer_definition: dict[str, Any], current: dict[str, Any] | None = None
+    ) -> tuple[str, requests.Response | None]:
+        # Another worker deployed the analyzer; it is only of use if it has this definition
+        current = current or self.get_analyzer(analyzer_id)
+        if current is None or current.get("status") == "failed" or diff_analyzer(current, analyzer_definition):
+            raise RuntimeError(f"Analyzer {analyzer_id} was redeployed concurrently with another definition")
+        self._logger.info(f"Analyzer {analyzer_id} was deployed by another worker")
+        if current.get("status", "ready") == "ready":
+            return "unchanged", None
+        return "unchanged", self._get_analyzer_ready_response(analyzer_id)
+
+    def _get_analyzer_ready_response(self, analyzer_id: str) -> requests.Response:
+        """Returns a response to poll the analyzer itself with until it is ready."""
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["operation-location"] = self._get_analyzer_url(analyzer_id)
+        return response
+
+    def deploy_analyzer(
+        self,
+        analyzer_id: str,
+        analyzer_definition: dict[str, Any],
+        force: bool = False,
+        timeout_seconds: int = 10 * 60,
+        polling_strategy: PollingStrategy | None = None,
+    ) -> str:
+        """
+        Deploys the analyzer like `begin_deploy_analyzer` and waits until it is ready.
+
+        Args:
+            timeout_seconds (int, optional): How long to wait for the analyzer to be created. Defaults to 600.
+            polling_strategy (PollingStrategy, optional): How to poll the creation operation.
+
+        Raises:
+            RuntimeError: If the analyzer creation fails.
+
+        Returns:
+            str: What was done: "unchanged", "updated", "created" or "recreated".
+        """
+        action, response = self.begin_deploy_analyzer(
+            analyzer_id, analyzer_definition, force
+        )
+        if response is not None:
+            self.poll_result(
+                response, timeout_seconds=timeout_seconds, polling_strategy=polling_strategy
+            )
+        return action
@@ -0,0 +1,327 @@
+import datetime
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient, CachedResponse, PollingStrategy
+from CommonUtils import CommonUtils
+from Pipeline import Pipeline, Stage, StageMetrics, format_stage_metrics
+from ResultCache import get_blob_content_id
+
+logger = logging.getLogger(__name__)
+
+REPLAY_CSV_PREFIX = "QM Replay Analysis - Checkout Steps(Step5to6)"
+REPLAY_CSV_HEADER = "Date,Replay ID,Assignee,Quantum Metric Session,Customer UID,Order number,Cart number,Payment method,What is the issue?,JIRA ID,Comments/Observation"
+
+
+@dataclass
+class BatchReport:
+    """
+    Outcome and throughput of a batch run.
+    """
+    total: int = 0
+    succeeded: int = 0
+    failed: List[str] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+    # How each pipeline stage did; the busiest one is the bottleneck
+    stages: List[StageMetrics] = field(default_factory=list)
+
+    @property
+    def videos_per_minute(self) -> float:
+        if not self.elapsed_seconds:
+            return 0.0
+        return self.succeeded / self.elapsed_seconds * 60
+
+    def __str__(self) -> str:
+        return (
+            f"{self.succeeded}/{self.total} videos analyzed in {self.elapsed_seconds:.1f}s "
+            f"({self.videos_per_minute:.1f} videos/min), {len(self.failed)} failed"
+        )
+
+    def format_stages(self) -> str:
+        return format_stage_metrics(self.stages, self.elapsed_seconds)
+
+
+def build_replay_row(blob_name: str, cart_number: str, payment_method: str) -> str:
+    """
+    Build a CSV row for the replay analysis report.
+    Replay videos are named {replay id}-{yyyy-MM-dd-HHmmss}.mp4.
+    """
+    replay_id = os.path.basename(blob_name).split("-", 1)[0]
+    today = datetime.date.today()
+    values = [
+        f"{today.month}/{today.day}/{today.year}",
+        replay_id, "", "", "", "",
+        cart_number, payment_method,
+        "", "", "",
+    ]
+    return ",".join('"' + value.replace('"', '""') + '"' for value in values)
+
+
+class BatchAnalysisRunner:
+    """
+    Analyzes every video under a blob prefix concurrently and writes one CSV row per video.
+
+    Each video goes through a pipeline of stages with their own workers, connected by
+    bounded queues. Submitting (which may stream the video) and polling are limited
+    separately: a few uploads at a time keep the worker's bandwidth in check, while many
+    more cheap polls can be waiting on the service at once.
+    """
+
+    def __init__(
+        self,
+        blob_utils,
+        client: AzureContentUnderstandingClient,
+        analyzer_id: str,
+        csv_writer,
+        max_uploads: int = 4,
+        max_polls: int = 32,
+        timeout_seconds: int = 60 * 60,
+        polling_strategy: Optional[PollingStrategy] = None,
+        suffix: str = ".mp4",
+        segmenter=None,
+        stage_report_seconds: Optional[float] = None,
+        poller=None,
+    ):
+        """
+        :param blob_utils: Instance of BlobStorageUtils holding the videos.
+        :param client: The Content Understanding client. Its pool_maxsize should be at least max_uploads + max_polls,
+            or max_uploads + the max_workers of the poller.
+        :param analyzer_id: The analyzer to run on each video.
+        :param csv_writer: A CsvBlobWriter (or anything with write_row(row)) the result rows go to.
+        :param max_uploads: The number of videos being submitted at once.
+        :param max_polls: The number of submitted videos being polled at once.
+        :param timeout_seconds: How long to wait for a single video's result.
+        :param polling_strategy: How to poll each video's result.
+        :param suffix: Only blobs whose name ends with this are analyzed.
+        :param segmenter: A SegmentedVideoAnalyzer to split each video and analyze the segments
+            concurrently. Videos are then downloaded first, by max_uploads workers.
+        :param stage_report_seconds: How often to log the metrics of the pipeline stages while it runs.
+        :param poller: An OperationPoller to poll the results with, instead of max_polls threads
+            each waiting on one video. max_polls then bounds the videos it is polling at once.
+        """
+        if max_uploads < 1 or max_polls < 1:
+            raise ValueError("max_uploads and max_polls must be at least 1")
+
+        self.blob_utils = blob_utils
+        self.client = client
+        self.analyzer_id = analyzer_id
+        self.csv_writer = csv_writer
+        self.max_uploads = max_uploads
+        self.max_polls = max_polls
+        self.timeout_seconds = timeout_seconds
+        self.polling_strategy = polling_strategy
+        self.suffix = suffix
+        self.segmenter = segmenter
+        self.stage_report_seconds = stage_report_seconds
+        self.poller = poller
+
+    def run(self, prefix: str) -> BatchReport:
+        """
+        Analyze all videos under `prefix` and report how it went.
+
+        The videos go through a pipeline (see build_pipeline), so the fetching, submitting,
+        polling and reporting of different videos overlap. The listing is read only as fast as
+        the first stage takes videos, so memory does not grow with the number of videos.
+        """
+        logger.info(f"Analyzing videos under {prefix}")
+        jobs = (_VideoJob(blob.name) for blob in self.blob_utils.list_blobs(prefix, suffix=self.suffix))
+        pipeline_report = self.build_pipeline().run(jobs)
+
+        report = BatchReport(
+            total=len(pipeline_report.succeeded) + len(pipeline_report.failed),
+            succeeded=len(pipeline_report.succeeded),
+            failed=[job.blob_name for job, _, _ in pipeline_report.failed],
+            elapsed_seconds=pipeline_report.elapsed_seconds,
+            stages=pipeline_report.stages,
+        )
+        logger.info(f"{report}\n{report.format_stages()}")
+        return report
+
+    def build_pipeline(self) -> Pipeline:
+        """
+        The stages every video goes through:
+
+            fetch    get a SAS URL for the blob, or open it and start downloading (max_uploads workers)
+            submit   begin the analysis, streaming the video if there is no SAS URL (max_uploads workers)
+            poll     wait for the result (max_polls workers, or max_polls videos handed to the poller)
+            extract  take the checkout fields from the result
+            csv      write the report row
+
+        With a segmenter, fetch downloads the video to a temporary file and a single analyze
+        stage splits it, submits the segments and polls them, instead of submit and poll.
+        """
+        if self.segmenter is not None:
+            stages = [
+                Stage("fetch", self._download, self.max_uploads),
+                Stage("analyze", self._analyze_segmented, self.max_uploads),
+            ]
+        else:
+            stages = [
+                Stage("fetch", self._fetch, self.max_uploads),
+                Stage("submit", self._submit, self.max_uploads),
+            ]
+            if self.poller is not None:
+                stages.append(Stage("poll", self._begin_poll, 1, max_pending=self.max_polls))
+            else:
+                stages.append(Stage("poll", self._poll, self.max_polls))
+        stages += [
+            Stage("extract", self._extract, 2),
+            Stage("csv", self._write_row, 1),
+        ]
+        return Pipeline(stages, self.stage_report_seconds)
+
+    def analyze_video(self, blob_name: str) -> None:
+        """
+        Analyze a single video and write its CSV row, going through the stages one after the other.
+        """
+        job = _VideoJob(blob_name)
+        if self.segmenter is not None:
+            job = self._analyze_segmented(self._download(job))
+        else:
+            job = self._poll(self._submit(self._fetch(job)))
+        self._write_row(self._extract(job))
+
+    def _fetch(self, job: "_VideoJob") -> "_VideoJob":
+        # A video whose result is cached, or that the journal shows as still being analyzed,
+        # needs no transfer at all
+        job.response = self._get_known_response(job)
+        if job.response is not None:
+            return job
+
+        # Let the service read the blob itself when possible, otherwise stream it through
+        job.video_url = CommonUtils.get_video_sas_url(self.blob_utils, "", job.blob_name)
+        if job.video_url:
+            return job
+
+        data_stream = CommonUtils.read_video_to_stream(self.blob_utils, "", job.blob_name)
+        if data_stream is None:
+            raise ValueError(f"Blob not found: {job.blob_name}")
+        try:
+            # The first chunks download while the video waits for the submit stage
+            data_stream.prefetch()
+        except Exception:
+            data_stream.close()
+            raise
+        job.data_stream = data_stream
+        return job
+
+    def _get_known_response(self, job: "_VideoJob") -> Any:
+        if self.client._result_cache is None and self.client._job_journal is None:
+            return None
+        try:
+            # The ETag identifies the cached result, and the service reads the blob through the
+            # SAS URL at whatever version it is then, so it must not be the one listed up to a
+            # TTL ago. Refreshing also caches it for the stream, which then opens without a request.
+            properties = self.blob_utils.get_properties(job.blob_name, refresh=True)
+        except ResourceNotFoundError:
+            raise ValueError(f"Blob not found: {job.blob_name}")
+        job.content_id = get_blob_content_id(properties.name, properties.etag)
+        _, cached_result = self.client._get_cached_result(self.analyzer_id, job.blob_name, None, job.content_id)
+        if cached_result is not None:
+            return CachedResponse(cached_result)
+        return self.client._get_resumed_response(
+            self.client._get_job_key(job.blob_name, job.blob_name), self.analyzer_id
+        )
+
+    def _submit(self, job: "_VideoJob") -> "_VideoJob":
+        if job.response is not None:
+            # Answered by the fetch stage
+            return job
+        if job.video_url:
+            # The service reads the blob through the URL, so its ETag is what identifies the content
+            job.response = self.client.begin_analyze(
+                self.analyzer_id, job.video_url, content_id=job.content_id, job_key=job.blob_name
+            )
+        else:
+            with job.data_stream:
+                job.response = self.client.begin_analyze(
+                    self.analyzer_id, job.blob_name, job.data_stream, job_key=job.blob_name
+                )
+            job.data_stream = None
+        return job
+
+    def _poll(self, job: "_VideoJob") -> "_VideoJob":
+        # The result is read whole: a streamed one would hold a pooled connection while it
+        # waits for the extract stage
+        job.result = self.client.poll_result(
+            job.response,
+            timeout_seconds=self.timeout_seconds,
+            polling_strategy=self.polling_strategy,
+        )
+        job.response = None
+        return job
+
+    def _begin_poll(self, job: "_VideoJob") -> Future:
+        # No thread waits for the result; the poller resolves the job once it is in
+        polled = self.poller.submit(
+            job.response,
+            timeout_seconds=self.timeout_seconds,
+            polling_strategy=self.polling_strategy,
+        )
+        job_polled: Future = Future()
+
+        def resolve(polled: Future) -> None:
+            try:
+                job.result = polled.result()
+            except BaseException as e:
+                job_polled.set_exception(e)
+            else:
+                job.response = None
+                job_polled.set_result(job)
+
+        polled.add_done_callback(resolve)
+        return job_polled
+
+    def _extract(self, job: "_VideoJob") -> "_VideoJob":
+        job.checkout_fields = CommonUtils.extract_checkout_fields(job.result) or ("", "")
+        job.result = None
+        return job
+
+    def _write_row(self, job: "_VideoJob") -> None:
+        cart_number, payment_method = job.checkout_fields
+        self.csv_writer.write_row(build_replay_row(job.blob_name, cart_number, payment_method))
+
+    def _download(self, job: "_VideoJob") -> "_VideoJob":
+        data_stream = CommonUtils.read_video_to_stream(self.blob_utils, "", job.blob_name)
+        if data_stream is None:
+            raise ValueError(f"Blob not found: {job.blob_name}")
+        suffix = os.path.splitext(job.blob_name)[1]
+        job.temp_dir = tempfile.mkdtemp(prefix="video-")
+        job.video_path = os.path.join(job.temp_dir, f"video{suffix}")
+        try:
+            with data_stream, open(job.video_path, "wb") as file:
+                shutil.copyfileobj(data_stream, file)
+        except Exception:
+            shutil.rmtree(job.temp_dir, ignore_errors=True)
+            raise
+        return job
+
+    def _analyze_segmented(self, job: "_VideoJob") -> "_VideoJob":
+        try:
+            job.result = self.segmenter.analyze(job.video_path, job_key=job.blob_name)
+        finally:
+            shutil.rmtree(job.temp_dir, ignore_errors=True)
+        return job
+
+
+@dataclass
+class _VideoJob:
+    """
+    A video on its way through the pipeline; each stage fills in what the next one needs.
+    """
+    blob_name: str
+    video_url: Optional[str] = None
+    content_id: Optional[str] = None
+    data_stream: Any = None
+    video_path: Optional[str] = None
+    temp_dir: Optional[str] = None
+    response: Any = None
+    result: Optional[Dict[str, Any]] = None
+    checkout_fields: Tuple[str, str] = ("", "")
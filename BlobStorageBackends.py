@@ -0,0 +1,481 @@
+import bisect
+import datetime
+import itertools
+import logging
+import mmap
+import os
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from azure.storage.blob import (
+    BlobClient,
+    BlobSasPermissions,
+    BlobServiceClient,
+    ContainerClient,
+    generate_blob_sas,
+)
+
+logger = logging.getLogger(__name__)
+
+# Largest block a single Append Block call accepts
+APPEND_BLOCK_MAX_BYTES = 4 * 1024 * 1024
+
+
+@dataclass
+class BlobInfo:
+    """
+    Properties of a stored blob.
+    """
+    name: str
+    size: int
+    etag: str
+    last_modified: datetime.datetime
+
+
+@dataclass
+class BlobPage:
+    """
+    One page of a blob listing. Pass `continuation_token` back to the listing to resume after this page.
+    """
+    items: List[BlobInfo] = field(default_factory=list)
+    continuation_token: Optional[str] = None
+
+
+# Every backend provides the same operations, so BlobStorageUtils works on any of them:
+#
+#   exists(path) -> bool
+#   get_properties(path) -> BlobInfo
+#   read(path) -> bytes
+#   read_range(path, offset, length, etag=None) -> bytes
+#   write(path, content_stream, max_concurrency=1)
+#   append(path, data)                      data of at most APPEND_BLOCK_MAX_BYTES
+#   append_if_empty(path, data) -> bool     data of at most APPEND_BLOCK_MAX_BYTES
+#   delete(path)
+#   list_blob_pages(prefix, page_size, continuation_token=None) -> Iterator[BlobPage]
+#   generate_read_url(path, expiry_minutes) -> str
+#
+# Missing blobs raise ResourceNotFoundError and failed ETag conditions raise
+# ResourceModifiedError, as with Azure, so callers handle all backends alike.
+# An append is a single write, so concurrent writers never interleave inside one.
+
+
+def _check_append_size(data: bytes) -> None:
+    if len(data) > APPEND_BLOCK_MAX_BYTES:
+        raise ValueError(
+            f"Cannot append {len(data)} bytes at once: an append is a single block of at most "
+            f"{APPEND_BLOCK_MAX_BYTES} bytes, so that it is written atomically"
+        )
+
+
+class AzureBlobBackend:
+    """
+    Stores blobs in an Azure Blob Storage container.
+    """
+
+    def __init__(self, connection_string: str, container_name: str):
+        """
+        :param connection_string: Azure Blob Storage connection string.
+        :param container_name: Name of the blob container.
+        """
+        self.container_name = container_name
+        self.blob_service_client: BlobServiceClient = BlobServiceClient.from_connection_string(connection_string)
+        self.container_client: ContainerClient = self.blob_service_client.get_container_client(container_name)
+
+    def exists(self, path: str) -> bool:
+        return self._get_blob_client(path).exists()
+
+    def get_properties(self, path: str) -> BlobInfo:
+        properties = self._get_blob_client(path).get_blob_properties()
+        return BlobInfo(path, properties.size, properties.etag, properties.last_modified)
+
+    def read(self, path: str) -> bytes:
+        return self._get_blob_client(path).download_blob().readall()
+
+    def read_range(self, path: str, offset: int, length: int, etag: Optional[str] = None) -> bytes:
+        conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+        downloader = self._get_blob_client(path).download_blob(offset=offset, length=length, **conditions)
+        return downloader.readall()
+
+    def write(self, path: str, content_stream: BinaryIO, max_concurrency: int = 1) -> None:
+        # With max_concurrency > 1, a seekable stream is uploaded as blocks staged in parallel
+        self._get_blob_client(path).upload_blob(content_stream, overwrite=True, max_concurrency=max_concurrency)
+
+    def delete(self, path: str) -> None:
+        self._get_blob_client(path).delete_blob()
+
+    def list_blob_pages(
+        self, prefix: str = "", page_size: int = 5000, continuation_token: Optional[str] = None
+    ) -> Iterator[BlobPage]:
+        # Each page is one List Blobs call; the next is only requested when the caller gets to it
+        pages = self.container_client.list_blobs(
+            name_starts_with=prefix, results_per_page=page_size
+        ).by_page(continuation_token=continuation_token)
+        for page in pages:
+            items = [BlobInfo(blob.name, blob.size, blob.etag, blob.last_modified) for blob in page]
+            yield BlobPage(items, pages.continuation_token)
+
+    def generate_read_url(self, path: str, expiry_minutes: int = 15) -> str:
+        """
+        :raises ValueError: If the connection string has no account key to sign the SAS with.
+        """
+        credential = self.blob_service_client.credential
+        account_key = getattr(credential, "account_key", None)
+        if not account_key:
+            raise ValueError("An account key is required to generate a SAS token")
+
+        blob_client = self._get_blob_client(path)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        sas_token = generate_blob_sas(
+            account_name=blob_client.account_name,
+            container_name=self.container_name,
+            blob_name=blob_client.blob_name,
+            account_key=account_key,
+            permission=BlobSasPermissions(read=True),
+            # Start slightly in the past to tolerate clock skew with the service
+            start=now - datetime.timedelta(minutes=5),
+            expiry=now + datetime.timedelta(minutes=expiry_minutes),
+        )
+        return f"{blob_client.url}?{sas_token}"
+
+    def append(self, path: str, data: bytes) -> None:
+        """
+        Append `data` to the append blob at `path`, creating it if needed.
+        Only the new bytes are sent, as one Append Block, so the cost of an append
+        does not grow with the size of the blob and concurrent appends never interleave.
+
+        :raises ValueError: If `data` is larger than one append block, or the blob at
+            `path` is a block blob, which cannot be appended to without rewriting it.
+        """
+        _check_append_size(data)
+        if not data:
+            return
+        blob_client = self._get_blob_client(path)
+        try:
+            blob_client.append_block(data)
+        except ResourceNotFoundError:
+            # First append: create the append blob unless another writer beat us to it
+            try:
+                blob_client.create_append_blob(match_condition=MatchConditions.IfMissing)
+            except ResourceExistsError:
+                pass
+            blob_client.append_block(data)
+        except HttpResponseError as e:
+            if e.error_code != "InvalidBlobType":
+                raise
+            raise ValueError(
+                f"{path} is a block blob; copy its content to a new append blob before appending to it"
+            ) from e
+
+    def append_if_empty(self, path: str, data: bytes) -> bool:
+        """
+        Write `data` at the very start of the append blob at `path`, creating the blob
+        if needed, but only if nothing has been written yet. The check and the write
+        are a single conditional Append Block, so when several processes race exactly
+        one of them wins.
+
+        :raises ValueError: If `data` is larger than one append block.
+        """
+        _check_append_size(data)
+        blob_client = self._get_blob_client(path)
+        try:
+            # The blob usually exists already, so try the write first: one call in the common case
+            try:
+                blob_client.append_block(data, appendpos_condition=0)
+            except ResourceNotFoundError:
+                try:
+                    blob_client.create_append_blob(match_condition=MatchConditions.IfMissing)
+                except ResourceExistsError:
+                    pass
+                blob_client.append_block(data, appendpos_condition=0)
+        except HttpResponseError as e:
+            if e.error_code == "AppendPositionConditionNotMet":
+                return False
+            if e.error_code != "InvalidBlobType":
+                raise
+            # A block blob written before appends were used; it already has content
+            return False
+        return True
+
+    def _get_blob_client(self, blob_path: str) -> BlobClient:
+        return self.container_client.get_blob_client(blob_path)
+
+
+class InMemoryBackend:
+    """
+    Keeps blobs in a dict, for tests and benchmarks. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blobs: Dict[str, bytearray] = {}
+        self._info: Dict[str, BlobInfo] = {}
+        self._version = 0
+
+    def exists(self, path: str) -> bool:
+        return path in self._blobs
+
+    def get_properties(self, path: str) -> BlobInfo:
+        with self._lock:
+            return self._get_info(path)
+
+    def read(self, path: str) -> bytes:
+        with self._lock:
+            self._get_info(path)
+            return bytes(self._blobs[path])
+
+    def read_range(self, path: str, offset: int, length: int, etag: Optional[str] = None) -> bytes:
+        with self._lock:
+            info = self._get_info(path)
+            if etag and info.etag != etag:
+                raise ResourceModifiedError(f"The blob {path} has been modified.")
+            return bytes(memoryview(self._blobs[path])[offset:offset + length])
+
+    def write(self, path: str, content_stream: BinaryIO, max_concurrency: int = 1) -> None:
+        data = bytearray(content_stream.read())
+        with self._lock:
+            self._blobs[path] = data
+            self._touch(path)
+
+    def delete(self, path: str) -> None:
+        with self._lock:
+            self._get_info(path)
+            del self._blobs[path]
+            del self._info[path]
+
+    def list_blob_pages(
+        self, prefix: str = "", page_size: int = 5000, continuation_token: Optional[str] = None
+    ) -> Iterator[BlobPage]:
+        # The continuation token is the last name listed; names are listed in order
+        with self._lock:
+            names = sorted(name for name in self._info if name.startswith(prefix))
+        start = bisect.bisect_right(names, continuation_token) if continuation_token else 0
+        for offset in range(start, len(names), page_size):
+            with self._lock:
+                items = [self._info[name] for name in names[offset:offset + page_size] if name in self._info]
+            last = offset + page_size >= len(names)
+            yield BlobPage(items, None if last else names[offset + page_size - 1])
+
+    def generate_read_url(self, path: str, expiry_minutes: int = 15) -> str:
+        raise ValueError("In-memory blobs cannot be read by URL")
+
+    def append(self, path: str, data: bytes) -> None:
+        _check_append_size(data)
+        with self._lock:
+            self._blobs.setdefault(path, bytearray()).extend(data)
+            self._touch(path)
+
+    def append_if_empty(self, path: str, data: bytes) -> bool:
+        _check_append_size(data)
+        with self._lock:
+            blob = self._blobs.setdefault(path, bytearray())
+            if blob:
+                return False
+            blob.extend(data)
+            self._touch(path)
+            return True
+
+    def _get_info(self, path: str) -> BlobInfo:
+        info = self._info.get(path)
+        if info is None:
+            raise ResourceNotFoundError(f"The blob {path} does not exist.")
+        return info
+
+    def _touch(self, path: str) -> None:
+        self._version += 1
+        self._info[path] = BlobInfo(
+            path,
+            len(self._blobs[path]),
+            f'"{self._version}"',
+            datetime.datetime.now(datetime.timezone.utc),
+        )
+
+
+class LocalFileSystemBackend:
+    """
+    Stores blobs as files under a local directory; blob "a/b.csv" is file "{root}/a/b.csv".
+
+    Reads map the file into memory, so ranged reads of large blobs only touch the pages they
+    need, and appends use O_APPEND so they never rewrite existing content. The ETag of a blob
+    is derived from its modification time and size.
+    """
+
+    def __init__(self, root: str):
+        """
+        :param root: The directory holding the blobs. It is created if needed.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Makes append_if_empty's check and write atomic between threads
+        self._lock = threading.Lock()
+
+    def exists(self, path: str) -> bool:
+        return self._path(path).is_file()
+
+    def get_properties(self, path: str) -> BlobInfo:
+        return self._get_info(path, self._path(path))
+
+    def read(self, path: str) -> bytes:
+        try:
+            return self._path(path).read_bytes()
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The blob {path} does not exist.")
+
+    def read_range(self, path: str, offset: int, length: int, etag: Optional[str] = None) -> bytes:
+        file_path = self._path(path)
+        try:
+            file = open(file_path, "rb")
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The blob {path} does not exist.")
+        with file:
+            stat = os.fstat(file.fileno())
+            if etag and self._etag(stat) != etag:
+                raise ResourceModifiedError(f"The blob {path} has been modified.")
+            if offset >= stat.st_size or length <= 0:
+                return b""
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[offset:offset + length]
+
+    def write(self, path: str, content_stream: BinaryIO, max_concurrency: int = 1) -> None:
+        file_path = self._path(path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = file_path.with_name(f".{file_path.name}.{threading.get_ident()}.tmp")
+        with open(temp_path, "wb") as file:
+            for chunk in iter(lambda: content_stream.read(1024 * 1024), b""):
+                file.write(chunk)
+        # Readers see either the old or the new content, never a partial write
+        os.replace(temp_path, file_path)
+
+    def delete(self, path: str) -> None:
+        try:
+            self._path(path).unlink()
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The blob {path} does not exist.")
+
+    def list_blob_pages(
+        self, prefix: str = "", page_size: int = 5000, continuation_token: Optional[str] = None
+    ) -> Iterator[BlobPage]:
+        # The continuation token is the last name listed; names are listed in order
+        blobs = self._walk(prefix.rsplit("/", 1)[0] + "/" if "/" in prefix else "", prefix, continuation_token)
+        while True:
+            items = list(itertools.islice(blobs, page_size))
+            if len(items) < page_size:
+                yield BlobPage(items, None)
+                return
+            yield BlobPage(items, items[-1].name)
+
+    def generate_read_url(self, path: str, expiry_minutes: int = 15) -> str:
+        raise ValueError("Local files cannot be read by the service; upload them instead")
+
+    def append(self, path: str, data: bytes) -> None:
+        _check_append_size(data)
+        file_path = self._path(path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        # O_APPEND writes go to the end of the file even with several writers
+        with open(file_path, "ab") as file:
+            file.write(data)
+
+    def append_if_empty(self, path: str, data: bytes) -> bool:
+        _check_append_size(data)
+        file_path = self._path(path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(file_path, "ab") as file:
+            if file.tell() > 0:
+                return False
+            file.write(data)
+            return True
+
+    def _path(self, path: str) -> Path:
+        return self.root / path.lstrip("/")
+
+    def _walk(self, directory: str, prefix: str, start_after: Optional[str]) -> Iterator[BlobInfo]:
+        """
+        Yield the blobs under `directory` whose name starts with `prefix` and comes after
+        `start_after`, in name order, skipping the subdirectories that cannot hold any.
+        """
+        try:
+            entries = list(os.scandir(self.root / directory))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        # A directory sorts as "name/", so that its blobs come out in name order
+        keyed = sorted((directory + entry.name + ("/" if entry.is_dir() else ""), entry) for entry in entries)
+        for name, entry in keyed:
+            if name.endswith("/"):
+                if not (name.startswith(prefix) or prefix.startswith(name)):
+                    continue
+                if start_after and name < start_after and not start_after.startswith(name):
+                    continue
+                yield from self._walk(name, prefix, start_after)
+                continue
+            if entry.name.startswith(".") and entry.name.endswith(".tmp"):
+                continue
+            if not name.startswith(prefix) or (start_after and name <= start_after):
+                continue
+            try:
+                yield self._get_info(name, Path(entry.path))
+            except ResourceNotFoundError:
+                continue
+
+    def _get_info(self, name: str, file_path: Path) -> BlobInfo:
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The blob {name} does not exist.")
+        last_modified = datetime.datetime.fromtimestamp(stat.st_mtime, datetime.timezone.utc)
+        return BlobInfo(name, stat.st_size, self._etag(stat), last_modified)
+
+    @staticmethod
+    def _etag(stat: os.stat_result) -> str:
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+class CountingBackend:
+    """
+    Wraps another backend and counts the calls made to it, to measure how many storage
+    requests each higher-level operation costs. `stats` holds the count of each operation
+    and their "total"; a listing counts one call per page fetched.
+
+    Each call is one storage request with the Azure backend, except for the one-off path
+    that creates a missing append blob.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats.clear()
+
+    def list_blob_pages(
+        self, prefix: str = "", page_size: int = 5000, continuation_token: Optional[str] = None
+    ) -> Iterator[BlobPage]:
+        for page in self.backend.list_blob_pages(prefix, page_size, continuation_token):
+            self._count("list_blob_pages")
+            yield page
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.backend, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+
+        def counted(*args, **kwargs):
+            self._count(name)
+            return attribute(*args, **kwargs)
+
+        return counted
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+            self.stats["total"] += 1
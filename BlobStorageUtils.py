@@ -1,122 +1,581 @@
-import tempfile
-import os
+import datetime
+import functools
+import io
 import logging
-from typing import BinaryIO, List
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
 
-from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
+from azure.core.exceptions import ResourceModifiedError, ResourceNotFoundError
+
+from BlobStorageBackends import AzureBlobBackend, BlobInfo, BlobPage
 # If you use DefaultAzureCredential or other credential, import accordingly:
 # from azure.identity import DefaultAzureCredential
 
 logger = logging.getLogger(__name__)
 
+# Default size of the ranges requested by read_stream
+READ_CHUNK_BYTES = 4 * 1024 * 1024
+# How long the properties of a blob are reused before they are fetched again
+METADATA_TTL_SECONDS = 30.0
+# The most blob properties kept at once; the oldest are dropped first
+METADATA_CACHE_MAX_ENTRIES = 10000
+
+MB = 1024 * 1024
+
+
+@dataclass
+class TransferReport:
+    """
+    Outcome and throughput of a bulk upload or download.
+    """
+    total: int = 0
+    succeeded: int = 0
+    failed: List[str] = field(default_factory=list)
+    bytes_transferred: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        if not self.elapsed_seconds:
+            return 0.0
+        return self.bytes_transferred / MB / self.elapsed_seconds
+
+    def __str__(self) -> str:
+        return (
+            f"{self.succeeded}/{self.total} files ({self.bytes_transferred / MB:.1f} MB) transferred in "
+            f"{self.elapsed_seconds:.1f}s ({self.megabytes_per_second:.1f} MB/s), {len(self.failed)} failed"
+        )
+
+
+class BlobReadStream(io.RawIOBase):
+    """
+    Read-only file-like view of a blob, read from its storage backend in ranged chunks.
+
+    Up to `max_concurrency` chunks are fetched in parallel ahead of the reader, so at most
+    `max_concurrency + 1` chunks are held in memory no matter how large the blob is.
+    All ranges are read under the blob's ETag, so a blob rewritten mid-read fails
+    instead of producing a mix of old and new bytes. A stream opened from properties that
+    may be stale is given `revalidate`: if its first range fails, the properties are fetched
+    again with it and the stream restarts under the new ETag and size.
+
+    The stream reports its length, so it can be passed directly as a `requests` body.
+    """
+
+    def __init__(
+        self,
+        backend,
+        path: str,
+        size: int,
+        etag: str,
+        chunk_size: int = READ_CHUNK_BYTES,
+        max_concurrency: int = 4,
+        revalidate: Optional[Callable[[], BlobInfo]] = None,
+    ):
+        super().__init__()
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.name = path
+        self.size = size
+        self.etag = etag
+        self._backend = backend
+        self._chunk_size = chunk_size
+        self._max_concurrency = max_concurrency
+        self._revalidate = revalidate
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="BlobReadStream")
+        self._pending: Deque[Future] = deque()
+        self._next_offset = 0
+        self._position = 0
+        self._buffer = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """
+        Move to `offset`. Chunks already fetched ahead are dropped, so seeking back, e.g. to
+        send the stream again after a failed request, downloads the content again.
+        """
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        if offset != self._position:
+            for future in self._pending:
+                future.cancel()
+            self._pending.clear()
+            self._buffer = memoryview(b"")
+            self._next_offset = self._position = offset
+        return self._position
+
+    def __len__(self) -> int:
+        return self.size
+
+    def readinto(self, buffer) -> int:
+        if not self._buffer:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return 0
+            self._buffer = memoryview(chunk)
+
+        count = min(len(buffer), len(self._buffer))
+        buffer[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        self._position += count
+        return count
+
+    def prefetch(self) -> None:
+        """
+        Start downloading and wait for the first chunk, so a missing or changed blob fails
+        here rather than on the first read, and the length is known to be current.
+        """
+        if not self._buffer:
+            chunk = self._next_chunk()
+            if chunk is not None:
+                self._buffer = memoryview(chunk)
+
+    def chunks(self) -> Iterator[bytes]:
+        """
+        Iterate over the remaining content chunk by chunk, without extra copies.
+        """
+        if self._buffer:
+            chunk, self._buffer = bytes(self._buffer), memoryview(b"")
+            self._position += len(chunk)
+            yield chunk
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return
+            self._position += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        if not self.closed:
+            for future in self._pending:
+                future.cancel()
+            self._pending.clear()
+            self._executor.shutdown(wait=False)
+            self._buffer = memoryview(b"")
+        super().close()
+
+    def _next_chunk(self):
+        # Downloads start on the first read, so an unused stream costs nothing
+        self._schedule_downloads()
+        if not self._pending:
+            return None
+        try:
+            chunk = self._pending.popleft().result()
+        except (ResourceModifiedError, ResourceNotFoundError):
+            if self._revalidate is None:
+                raise
+            self._restart()
+            return self._next_chunk()
+        # Once a range was read under the ETag, a later change is a failure like any other
+        self._revalidate = None
+        self._schedule_downloads()
+        return chunk
+
+    def _restart(self) -> None:
+        # The blob changed since its properties were cached; read the current version instead
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        properties = self._revalidate()
+        self._revalidate = None
+        self.size = properties.size
+        self.etag = properties.etag
+        self._next_offset = self._position
+
+    def _schedule_downloads(self) -> None:
+        while len(self._pending) < self._max_concurrency and self._next_offset < self.size:
+            length = min(self._chunk_size, self.size - self._next_offset)
+            self._pending.append(self._executor.submit(self._download_range, self._next_offset, length))
+            self._next_offset += length
+
+    def _download_range(self, offset: int, length: int) -> bytes:
+        return self._backend.read_range(self.name, offset, length, etag=self.etag)
+
 class BlobStorageUtils:
     """
     Utility class for Azure Blob Storage operations.
+
+    The blobs live in a storage backend: an Azure container by default, or any other
+    backend from BlobStorageBackends (InMemoryBackend, LocalFileSystemBackend), which
+    lets everything built on this class run and be measured offline.
+
+    Operations are single conditional requests wherever possible instead of a check
+    followed by an action. The properties of blobs seen recently (listed, checked or
+    opened) are kept for a short time, so opening a blob that was just listed costs
+    no extra request; blobs written through this instance are dropped from the cache.
     """
 
-    def __init__(self, connection_string: str, container_name: str):
+    def __init__(
+        self,
+        connection_string: Optional[str] = None,
+        container_name: Optional[str] = None,
+        backend=None,
+        metadata_ttl_seconds: float = METADATA_TTL_SECONDS,
+    ):
         """
         Initialize the utility.
 
-        :param connection_string: Azure Blob Storage connection string.
-        :param container_name: Name of the blob container.
+        :param connection_string: Azure Blob Storage connection string. Not needed with a backend.
+        :param container_name: Name of the blob container. Not needed with a backend.
+        :param backend: The storage backend to use instead of the Azure container.
+        :param metadata_ttl_seconds: How long blob properties are reused; 0 disables the cache.
         """
-        if not connection_string:
-            raise ValueError("Connection string is required")
-        if not container_name:
-            raise ValueError("Container name is required")
+        if backend is None:
+            if not connection_string:
+                raise ValueError("Connection string is required")
+            if not container_name:
+                raise ValueError("Container name is required")
+            backend = AzureBlobBackend(connection_string, container_name)
 
         self.container_name = container_name
-        self.blob_service_client: BlobServiceClient = BlobServiceClient.from_connection_string(connection_string)
-        self.container_client: ContainerClient = self.blob_service_client.get_container_client(container_name)
+        self.backend = backend
+        self.metadata_ttl_seconds = metadata_ttl_seconds
+        # Blob path -> (expires at, properties)
+        self._metadata: "OrderedDict[str, Tuple[float, BlobInfo]]" = OrderedDict()
+        self._metadata_lock = threading.Lock()
 
-    def _get_blob_client(self, blob_path: str) -> BlobClient:
-        """
-        Get the BlobClient for a specific blob path.
-        """
+    def _normalize_path(self, blob_path: str) -> str:
         # Remove leading slash if present
         if blob_path.startswith("/"):
             blob_path = blob_path[1:]
-        return self.container_client.get_blob_client(blob_path)
+        return blob_path
 
     def exists(self, path: str) -> bool:
         """
-        Check whether the blob at `path` exists.
+        Check whether the blob at `path` exists. A blob seen in the last `metadata_ttl_seconds`
+        is reported without a request, even if another writer deleted it since.
+        Prefer calling the operation itself and catching ResourceNotFoundError, which saves a request.
         """
-        blob_client = self._get_blob_client(path)
-        return blob_client.exists()
+        try:
+            self.get_properties(path)
+        except ResourceNotFoundError:
+            return False
+        return True
+
+    def get_properties(self, path: str, refresh: bool = False) -> BlobInfo:
+        """
+        Get the size, ETag and last modified time of the blob at `path`, from the cache if
+        they were seen in the last `metadata_ttl_seconds`.
 
-    def read(self, path: str) -> BinaryIO:
+        :param refresh: Always ask the backend, and cache the answer. Use it when the ETag
+            identifies the content, since a cached one can be up to `metadata_ttl_seconds` old.
+        :raises ResourceNotFoundError: If the blob does not exist.
         """
-        Read the blob at `path` and return a stream (BytesIO) of its content.
+        path = self._normalize_path(path)
+        if refresh:
+            return self._refresh_properties(path)
+        properties = self._cached_properties(path)
+        if properties is None:
+            properties = self.backend.get_properties(path)
+            self._remember(properties)
+        return properties
+
+    def read(self, path: str) -> bytes:
+        """
+        Read the blob at `path` and return its content.
         """
-        blob_client = self._get_blob_client(path)
-        downloader = blob_client.download_blob()
-        return downloader.readall()
+        return self.backend.read(self._normalize_path(path))
+
+    def read_stream(
+        self, path: str, chunk_size: int = READ_CHUNK_BYTES, max_concurrency: int = 4
+    ) -> BlobReadStream:
+        """
+        Open the blob at `path` for streaming reads.
+        The content is downloaded in ranges of `chunk_size` bytes, `max_concurrency` at a time,
+        so memory use stays bounded for blobs of any size.
+
+        A blob whose properties are cached is opened without a request. The first range is
+        read under the cached ETag, which validates it at no extra cost; until then, the
+        length of the stream is the cached one. Call `prefetch()` on the stream when the
+        length has to be current before reading, e.g. to send it as a request body.
+
+        :raises ResourceNotFoundError: If the blob does not exist. For a blob opened from
+            cached properties, this is raised by the first read instead.
+        """
+        path = self._normalize_path(path)
+        properties = self._cached_properties(path)
+        if properties is not None:
+            return BlobReadStream(
+                self.backend, path, properties.size, properties.etag, chunk_size, max_concurrency,
+                revalidate=functools.partial(self._refresh_properties, path),
+            )
+
+        properties = self.backend.get_properties(path)
+        self._remember(properties)
+        return BlobReadStream(self.backend, path, properties.size, properties.etag, chunk_size, max_concurrency)
+
+    def generate_read_sas_url(self, path: str, expiry_minutes: int = 15) -> str:
+        """
+        Generate a URL with a short-lived, read-only SAS token for the blob at `path`.
+
+        :raises ValueError: If the connection string has no account key to sign the SAS with,
+            or the backend has no URLs the service could read.
+        """
+        return self.backend.generate_read_url(self._normalize_path(path), expiry_minutes)
 
     def write(self, path: str, content_stream: BinaryIO) -> None:
         """
         Write the content from content_stream to the blob at `path`.
         This will overwrite existing content.
         """
-        blob_client = self._get_blob_client(path)
-        blob_client.upload_blob(content_stream, overwrite=True)
+        path = self._normalize_path(path)
+        self._forget(path)
+        self.backend.write(path, content_stream)
 
-    def upload_file(self, local_file_path: str, path: str) -> None:
+    def upload_file(self, local_file_path: str, path: str, max_concurrency: int = 1) -> int:
         """
-        Upload a local file to blob at `path`.
+        Upload a local file to blob at `path`. The file is streamed, not read into memory.
+
+        :param max_concurrency: The number of blocks of the file uploaded in parallel.
+        :return: The number of bytes uploaded.
         """
-        blob_client = self._get_blob_client(path)
+        path = self._normalize_path(path)
+        self._forget(path)
         with open(local_file_path, "rb") as f:
-            blob_client.upload_blob(f, overwrite=True)
+            size = os.fstat(f.fileno()).st_size
+            self.backend.write(path, f, max_concurrency=max_concurrency)
+        return size
+
+    def download_file(
+        self, path: str, local_file_path: str, chunk_size: int = READ_CHUNK_BYTES, max_concurrency: int = 4
+    ) -> int:
+        """
+        Download the blob at `path` to a local file, creating its folder if needed.
+        The blob is streamed as in read_stream, so memory use stays bounded. The file only
+        appears once the download is complete.
+
+        :return: The number of bytes downloaded.
+        :raises ResourceNotFoundError: If the blob does not exist.
+        """
+        folder = os.path.dirname(local_file_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        part_path = f"{local_file_path}.part"
+        try:
+            with self.read_stream(path, chunk_size, max_concurrency) as stream, open(part_path, "wb") as f:
+                for chunk in stream.chunks():
+                    f.write(chunk)
+                size = stream.size
+            os.replace(part_path, local_file_path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        return size
+
+    def upload_many(
+        self, files: Iterable[Tuple[str, str]], max_workers: int = 8, max_concurrency: int = 1
+    ) -> TransferReport:
+        """
+        Upload many local files, `max_workers` at a time.
+        A file that fails is logged and reported, and does not stop the others.
+
+        :param files: (local file path, blob path) pairs, e.g. dict.items(). Read lazily.
+        :param max_workers: The number of files uploaded at once.
+        :param max_concurrency: The number of blocks of each file uploaded in parallel.
+        """
+        upload = functools.partial(self.upload_file, max_concurrency=max_concurrency)
+        return self._transfer_many(files, upload, max_workers)
+
+    def download_many(
+        self,
+        blobs: Iterable[Tuple[str, str]],
+        max_workers: int = 8,
+        max_concurrency: int = 4,
+        chunk_size: int = READ_CHUNK_BYTES,
+    ) -> TransferReport:
+        """
+        Download many blobs to local files, `max_workers` at a time.
+        A blob that fails is logged and reported, and does not stop the others.
+        At most max_workers * (max_concurrency + 1) chunks are held in memory.
+
+        :param blobs: (blob path, local file path) pairs, e.g. dict.items(). Read lazily.
+        :param max_workers: The number of blobs downloaded at once.
+        :param max_concurrency: The number of ranges of each blob downloaded in parallel.
+        :param chunk_size: The size of those ranges.
+        """
+        download = functools.partial(self.download_file, chunk_size=chunk_size, max_concurrency=max_concurrency)
+        return self._transfer_many(blobs, download, max_workers)
 
     def remove(self, path: str) -> None:
         """
         Delete the blob at `path`.
         """
-        blob_client = self._get_blob_client(path)
-        blob_client.delete_blob()
+        path = self._normalize_path(path)
+        self._forget(path)
+        self.backend.delete(path)
 
     def list_names(self, prefix: str = "") -> List[str]:
         """
         List blob names under the given prefix (path).
+        This holds every name in memory; prefer list_blobs for large containers.
         """
-        blobs = self.container_client.list_blobs(name_starts_with=prefix)
-        return [b.name for b in blobs]
+        return [b.name for b in self.list_blobs(prefix)]
+
+    def list_blobs(
+        self,
+        prefix: str = "",
+        suffix: Optional[str] = None,
+        modified_after: Optional[datetime.datetime] = None,
+        modified_before: Optional[datetime.datetime] = None,
+        page_size: int = 5000,
+        continuation_token: Optional[str] = None,
+    ) -> Iterator[BlobInfo]:
+        """
+        Lazily list the blobs under the given prefix (path) with their size, ETag and last modified time.
+        Pages are fetched as the iteration reaches them, so processing can start right away.
+        See list_blob_pages for the arguments.
+        """
+        for page in self.list_blob_pages(
+            prefix, suffix, modified_after, modified_before, page_size, continuation_token
+        ):
+            yield from page.items
+
+    def list_blob_pages(
+        self,
+        prefix: str = "",
+        suffix: Optional[str] = None,
+        modified_after: Optional[datetime.datetime] = None,
+        modified_before: Optional[datetime.datetime] = None,
+        page_size: int = 5000,
+        continuation_token: Optional[str] = None,
+    ) -> Iterator[BlobPage]:
+        """
+        Lazily list the blobs under the given prefix (path), one page at a time.
+
+        Only the prefix is applied by the storage service; the other filters are applied to
+        each page as it arrives, so a page may hold fewer than `page_size` blobs, or none.
+
+        :param prefix: Only list blobs whose name starts with this.
+        :param suffix: Only list blobs whose name ends with this, ignoring case (e.g. ".mp4").
+        :param modified_after: Only list blobs last modified at or after this time (timezone-aware).
+        :param modified_before: Only list blobs last modified before this time (timezone-aware).
+        :param page_size: The number of blobs requested per page.
+        :param continuation_token: The continuation_token of a page from an earlier listing
+            with the same prefix, to resume right after that page.
+        """
+        suffix = suffix.lower() if suffix else None
+        for page in self.backend.list_blob_pages(prefix, page_size, continuation_token):
+            for blob in page.items:
+                self._remember(blob)
+            items = [
+                blob for blob in page.items
+                if (suffix is None or blob.name.lower().endswith(suffix))
+                and (modified_after is None or blob.last_modified >= modified_after)
+                and (modified_before is None or blob.last_modified < modified_before)
+            ]
+            yield BlobPage(items, page.continuation_token)
 
     def append(self, path: str, content_stream: BinaryIO) -> None:
         """
         Append data from content_stream to the blob at given path.
         If the blob does not exist, it is created with the new data.
-        If it exists, existing content is read, combined with new content,
-        and the blob is overwritten with the combined content.
+        Only the new bytes are sent, so the cost of an append does not grow with
+        the size of the blob. Each append is written atomically, in one block.
+
+        :raises ValueError: If the data is larger than APPEND_BLOCK_MAX_BYTES.
         """
+        path = self._normalize_path(path)
+        self._forget(path)
         try:
-            # Check if exists and read existing bytes
-            if self.exists(path):
-                existing_bytes = self.read(path)
-            else:
-                existing_bytes = b""
+            self.backend.append(path, content_stream.read())
+        except Exception as e:
+            logger.error(f"Failed to append to blob: {path}", exc_info=e)
+            raise
 
-            # Read new bytes
-            new_bytes = content_stream.read()
+    def write_if_empty(self, path: str, content_stream: BinaryIO) -> bool:
+        """
+        Write content_stream at the very start of the blob at `path`, creating the blob
+        if needed, but only if nothing has been written yet. The check and the write
+        are atomic, so when several writers race exactly one of them wins.
 
-            # Create temporary file with combined content
-            with tempfile.NamedTemporaryFile(delete=False, prefix="append-", suffix=".tmp") as tf:
-                tf.write(existing_bytes)
-                tf.write(new_bytes)
-                temp_path = tf.name
+        :return: True if the content was written, False if the blob already had data.
+        :raises ValueError: If the content is larger than APPEND_BLOCK_MAX_BYTES.
+        """
+        path = self._normalize_path(path)
+        self._forget(path)
+        return self.backend.append_if_empty(path, content_stream.read())
 
-            # Upload the temporary file
-            self.upload_file(temp_path, path)
+    def _transfer_many(
+        self, pairs: Iterable[Tuple[str, str]], transfer: Callable[[str, str], int], max_workers: int
+    ) -> TransferReport:
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
 
-        except Exception as e:
-            logger.error(f"Failed to append to blob: {path}", exc_info=e)
-            raise
-        finally:
-            # Attempt to delete the temporary file
+        report = TransferReport()
+        report_lock = threading.Lock()
+        # Only a few transfers are queued ahead of the workers, so a long listing can be passed in lazily
+        queue_slots = threading.Semaphore(2 * max_workers)
+
+        def on_done(source: str, future: Future) -> None:
+            queue_slots.release()
             try:
-                if 'temp_path' in locals() and os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except OSError as oe:
-                logger.warning(f"Could not delete temporary file {temp_path}: {oe}")
+                size = future.result()
+            except Exception as e:
+                logger.error(f"Failed to transfer {source}", exc_info=e)
+                with report_lock:
+                    report.failed.append(source)
+            else:
+                with report_lock:
+                    report.succeeded += 1
+                    report.bytes_transferred += size
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="BlobTransfer") as executor:
+            for source, destination in pairs:
+                queue_slots.acquire()
+                report.total += 1
+                future = executor.submit(transfer, source, destination)
+                future.add_done_callback(functools.partial(on_done, source))
+        report.elapsed_seconds = time.perf_counter() - start
+        logger.info(f"Bulk transfer: {report}")
+        return report
+
+    def _cached_properties(self, path: str) -> Optional[BlobInfo]:
+        with self._metadata_lock:
+            entry = self._metadata.get(path)
+            if entry is None:
+                return None
+            expires_at, properties = entry
+            if expires_at <= time.monotonic():
+                del self._metadata[path]
+                return None
+            return properties
+
+    def _remember(self, properties: BlobInfo) -> None:
+        if self.metadata_ttl_seconds <= 0:
+            return
+        with self._metadata_lock:
+            self._metadata[properties.name] = (time.monotonic() + self.metadata_ttl_seconds, properties)
+            self._metadata.move_to_end(properties.name)
+            while len(self._metadata) > METADATA_CACHE_MAX_ENTRIES:
+                self._metadata.popitem(last=False)
+
+    def _forget(self, path: str) -> None:
+        with self._metadata_lock:
+            self._metadata.pop(path, None)
+
+    def _refresh_properties(self, path: str) -> BlobInfo:
+        self._forget(path)
+        properties = self.backend.get_properties(path)
+        self._remember(properties)
+        return properties
@@ -1,52 +1,286 @@
 import datetime
 import io
 import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from AnalysisResult import get_field_value, iter_contents
+from BlobStorageBackends import APPEND_BLOCK_MAX_BYTES
+from BlobStorageUtils import READ_CHUNK_BYTES
 
 logger = logging.getLogger(__name__)
 
+# (container or storage backend, file path) of the CSV files known to already start with their header
+_csv_files_with_header: Set[Tuple[object, str]] = set()
+_csv_files_lock = threading.Lock()
+
+
+def _split_rows(rows: List[str], first_batch_bytes: int = 0) -> List[str]:
+    """
+    Join rows into batches that each fit in one append, so no row is ever split between two.
+
+    :param first_batch_bytes: Bytes already taken in the first batch, e.g. by the header.
+    """
+    batches: List[str] = []
+    batch: List[str] = []
+    size = first_batch_bytes
+    for row in rows:
+        row_bytes = len(row.encode("utf-8"))
+        if batch and size + row_bytes > APPEND_BLOCK_MAX_BYTES:
+            batches.append("".join(batch))
+            batch, size = [], 0
+        batch.append(row)
+        size += row_bytes
+    if batch:
+        batches.append("".join(batch))
+    return batches
+
+
+def _append_csv_rows(blob_utils, file_path: str, header: str, rows: List[str]) -> None:
+    """
+    Append already formatted CSV rows to the file, writing the header first if the file is new.
+    Whether a file has its header is cached, so after the first write only the rows are sent.
+    Rows go in as few appends as fit in an append block; each row is written whole.
+    """
+    if not rows:
+        return
+    storage = getattr(blob_utils, "container_name", None) or id(getattr(blob_utils, "backend", blob_utils))
+    cache_key = (storage, file_path)
+    with _csv_files_lock:
+        has_header = cache_key in _csv_files_with_header
+
+    batches = _split_rows(rows)
+    if not has_header:
+        # The header goes in with the first rows as one conditional write; if another
+        # writer created the file first, the rows are appended after its header instead
+        header_line = f"{header}\n"
+        first, *rest = _split_rows(rows, len(header_line.encode("utf-8")))
+        content_stream = io.BytesIO(f"{header_line}{first}".encode("utf-8"))
+        written = blob_utils.write_if_empty(file_path, content_stream)
+        with _csv_files_lock:
+            _csv_files_with_header.add(cache_key)
+        if written:
+            batches = rest
+
+    for batch in batches:
+        blob_utils.append(file_path, io.BytesIO(batch.encode("utf-8")))
+
+
 class CommonUtils:
     """
     Utility class for common operations, including writing/appending CSV files to blob storage.
     """
 
+    @staticmethod
+    def get_daily_csv_path(base_path: str, prefix: str) -> str:
+        """
+        Build the path of today's CSV file: {base_path}{prefix}_{MM-dd-yyyy}.csv
+        """
+        # format current date as MM‑dd‑yyyy
+        date_str = datetime.datetime.now().strftime("%m-%d-%Y")
+        return f"{base_path}{prefix}_{date_str}.csv"
+
     @staticmethod
     def write_csv_to_blob(blob_utils, base_path: str, prefix: str, header: str, row: str) -> None:
         """
         Write or append a CSV file to blob storage.
 
-        :param blob_utils: Instance of a blob‑storage utility class providing exists(path), write(path, stream), append(path, stream) methods.
-        :param configuration_service: Instance providing get_configuration().get_string(key, default) method for fetching config values.
+        :param blob_utils: Instance of a blob‑storage utility class providing write_if_empty(path, stream), append(path, stream) methods.
+        :param base_path: The folder (path prefix) the CSV file lives in.
         :param prefix: The prefix for the file name (will be combined with current date).
         :param header: The header line for the CSV file.
         :param row: The row to write (or append) into the CSV.
         :raises: Exception if the operation fails.
         """
-        # format current date as MM‑dd‑yyyy
-        date_str = datetime.datetime.now().strftime("%m-%d-%Y")
         # build full file path
-        file_path = f"{base_path}{prefix}_{date_str}.csv"
-        # build content for new file: header + row + newline
-        content = f"{header}\n{row}\n"
+        file_path = CommonUtils.get_daily_csv_path(base_path, prefix)
 
-        logger.info(f"writing affirm webhook filePath : {file_path}\ncontent : {content}")
+        logger.info(f"writing affirm webhook filePath : {file_path}\ncontent : {header}\n{row}\n")
 
-        # convert content into byte‑stream
-        content_bytes = content.encode("utf-8")
-        content_stream = io.BytesIO(content_bytes)
-
-        # if file doesn’t exist → write new, else append
-        if not blob_utils.exists(file_path):
-            blob_utils.write(file_path, content_stream)
-        else:
-            append_bytes = f"{row}\n".encode("utf-8")
-            append_stream = io.BytesIO(append_bytes)
-            blob_utils.append(file_path, append_stream)
+        _append_csv_rows(blob_utils, file_path, header, [f"{row}\n"])
 
     @staticmethod
     def read_video_to_bytes(blob_utils, base_path: str, prefix: str) -> bytes:
         file_path = f"{base_path}{prefix}"
+        logger.debug(f"Reading {file_path}")
 
-        print("file_path:", file_path)
-
-        if blob_utils.exists(file_path):
+        # A missing blob fails the read itself, so no separate exists() request is needed
+        try:
             return blob_utils.read(file_path)
+        except ResourceNotFoundError:
+            return None
+
+    @staticmethod
+    def read_video_to_stream(blob_utils, base_path: str, prefix: str, chunk_size: int = READ_CHUNK_BYTES, max_concurrency: int = 4):
+        """
+        Open a video blob as a file-like stream that downloads it in parallel ranged chunks,
+        so the whole video is never held in memory.
+
+        :return: A BlobReadStream, or None if the blob does not exist.
+        """
+        file_path = f"{base_path}{prefix}"
+        logger.debug(f"Opening {file_path}")
+
+        try:
+            return blob_utils.read_stream(file_path, chunk_size=chunk_size, max_concurrency=max_concurrency)
+        except ResourceNotFoundError:
+            return None
+
+    @staticmethod
+    def get_video_sas_url(blob_utils, base_path: str, prefix: str, expiry_minutes: int = 15) -> Optional[str]:
+        """
+        Get a short-lived read-only SAS URL for a video blob, so the analysis service can fetch
+        the video itself instead of it being downloaded and uploaded again.
+
+        :return: The SAS URL, or None if SAS generation is not possible with the current credentials.
+        """
+        file_path = f"{base_path}{prefix}"
+        try:
+            return blob_utils.generate_read_sas_url(file_path, expiry_minutes=expiry_minutes)
+        except ValueError as e:
+            logger.warning(f"Cannot generate SAS URL for {file_path}, falling back to upload: {e}")
+            return None
+
+    @staticmethod
+    def extract_checkout_fields(result: dict) -> Optional[Tuple[str, str]]:
+        """
+        Get the cart number and payment method from a checkout replay analysis result.
+
+        :param result: The analysis result, parsed or a StreamingAnalysisResult. Only its first content is read.
+        :return: (cart_number, payment_method), or None if the result has no contents.
+        """
+        content = next(iter_contents(result), None)
+        if content is None:
+            return None
+
+        fields = content.get("fields") or {}
+        shopping_cart = get_field_value(fields.get("ShoppingCart")) or ""
+        place_order_with = get_field_value(fields.get("PlaceOrderwith")) or ""
+
+        cart_number = shopping_cart.strip()
+        # 找到 “Place Order with” 之后的子串
+        if "Place Order with" in place_order_with:
+            payment_method = place_order_with.split("Place Order with", 1)[1].strip()
+        else:
+            payment_method = ""
+        return cart_number, payment_method
+
+class CsvBlobWriter:
+    """
+    Buffered CSV row writer for the daily report files written by CommonUtils.write_csv_to_blob.
+
+    Rows are collected in memory and appended in batches, either when `max_rows` are
+    buffered or every `flush_interval_seconds`. Each batch is a single append (split at
+    row boundaries if it outgrows an append block), so many processes can write the same
+    daily file without losing or interleaving rows.
+
+    Usage:
+        with CsvBlobWriter(blob_utils, base_path, prefix, header) as writer:
+            writer.write_row(row)
+    """
+
+    def __init__(
+        self,
+        blob_utils,
+        base_path: str,
+        prefix: str,
+        header: str,
+        max_rows: int = 100,
+        flush_interval_seconds: Optional[float] = 5.0,
+    ):
+        """
+        :param blob_utils: Instance of BlobStorageUtils (or compatible).
+        :param base_path: The folder (path prefix) the CSV files live in.
+        :param prefix: The prefix for the file name (will be combined with the date of each row).
+        :param header: The header line for the CSV file.
+        :param max_rows: Flush as soon as this many rows are buffered.
+        :param flush_interval_seconds: Also flush buffered rows this often; None disables the timer.
+        """
+        if max_rows < 1:
+            raise ValueError("max_rows must be at least 1")
+
+        self.blob_utils = blob_utils
+        self.base_path = base_path
+        self.prefix = prefix
+        self.header = header
+        self.max_rows = max_rows
+        self.flush_interval_seconds = flush_interval_seconds
+
+        self._rows: List[Tuple[str, str]] = []
+        self._rows_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer_thread: Optional[threading.Thread] = None
+        if flush_interval_seconds:
+            self._timer_thread = threading.Thread(
+                target=self._flush_periodically, name="CsvBlobWriter-flush", daemon=True
+            )
+            self._timer_thread.start()
+
+    def write_row(self, row: str) -> None:
+        """
+        Buffer a row for the file of the current day.
+        """
+        if self._closed.is_set():
+            raise ValueError("CsvBlobWriter is closed")
+
+        # The file is chosen when the row is written, so rows never move to the next day's file
+        file_path = CommonUtils.get_daily_csv_path(self.base_path, self.prefix)
+        with self._rows_lock:
+            self._rows.append((file_path, f"{row}\n"))
+            should_flush = len(self._rows) >= self.max_rows
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Append all buffered rows, one append per target file.
+        If an append fails the rows are put back in the buffer and the error is raised.
+        """
+        with self._flush_lock:
+            with self._rows_lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return
+
+            rows_by_path: Dict[str, List[str]] = {}
+            for file_path, row in rows:
+                rows_by_path.setdefault(file_path, []).append(row)
+
+            for file_path, path_rows in list(rows_by_path.items()):
+                try:
+                    _append_csv_rows(self.blob_utils, file_path, self.header, path_rows)
+                except Exception as e:
+                    logger.error(f"Failed to flush {len(path_rows)} rows to {file_path}", exc_info=e)
+                    with self._rows_lock:
+                        unwritten = [r for r in rows if r[0] in rows_by_path]
+                        self._rows = unwritten + self._rows
+                    raise
+                logger.info(f"flushed {len(path_rows)} rows to {file_path}")
+                del rows_by_path[file_path]
+
+    def close(self) -> None:
+        """
+        Stop the flush timer and write out any remaining rows.
+        """
+        self._closed.set()
+        if self._timer_thread is not None:
+            self._timer_thread.join()
+            self._timer_thread = None
+        self.flush()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval_seconds):
+            try:
+                self.flush()
+            except Exception:
+                # Already logged; the rows stay buffered for the next attempt
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
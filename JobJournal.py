@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+PENDING = "pending"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+EXPIRED = "expired"
+
+
+class JobJournal:
+    """
+    Durable record of submitted analyses, so a restarted worker re-attaches to the
+    operations it already started instead of uploading the files again.
+
+    The journal is a JSONL file: every submission and status change is appended as one
+    line, and the last line for a job wins. Each line is flushed to disk before the call
+    returns, so a crash loses at most the line being written. A job is a file analyzed with
+    an analyzer, so the same file analyzed by two analyzers is two jobs.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: The JSONL file to keep the journal in. It is created if needed.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        # Latest record by (job key, analyzer id)
+        self._jobs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._job_keys_by_operation: Dict[str, Tuple[str, str]] = {}
+        self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record_submitted(
+        self,
+        job_key: str,
+        analyzer_id: str,
+        operation_location: str,
+        cache_key: Optional[str] = None,
+    ) -> None:
+        """
+        Record that the analysis of `job_key` was submitted and is running at `operation_location`.
+        """
+        self._append({
+            "job_key": job_key,
+            "analyzer_id": analyzer_id,
+            "operation_location": operation_location,
+            "cache_key": cache_key,
+            "status": PENDING,
+        })
+
+    def record_status(self, operation_location: str, status: str) -> None:
+        """
+        Record the final status (succeeded, failed or expired) of an operation.
+        Operations that are not in the journal are ignored.
+        """
+        with self._lock:
+            key = self._job_keys_by_operation.get(operation_location)
+            if key is None:
+                return
+            record = dict(self._jobs[key], status=status)
+        self._append(record)
+
+    def get_pending(self, job_key: str, analyzer_id: str) -> Optional[Dict[str, Any]]:
+        """
+        :return: The record of the still running analysis of `job_key` by `analyzer_id`, or None.
+        """
+        with self._lock:
+            record = self._jobs.get((job_key, analyzer_id))
+        if record is None or record["status"] != PENDING:
+            return None
+        return record
+
+    def list_pending(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [record for record in self._jobs.values() if record["status"] == PENDING]
+
+    def compact(self) -> None:
+        """
+        Rewrite the journal with only the latest record of each job.
+        """
+        with self._lock:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                for record in self._jobs.values():
+                    file.write(json.dumps(record) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self._file.close()
+            os.replace(temp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        # Where the last complete line ends
+        complete_size = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    # A line cut short by a crash
+                    break
+                complete_size += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._remember(record)
+        if complete_size < os.path.getsize(self.path):
+            # Cut the partial line, or the next record would be appended to it and lost
+            with open(self.path, "r+b") as file:
+                file.truncate(complete_size)
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        record["updated_at"] = time.time()
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._remember(record)
+
+    def _remember(self, record: Dict[str, Any]) -> None:
+        key = (record["job_key"], record.get("analyzer_id") or "")
+        self._jobs[key] = record
+        self._job_keys_by_operation[record["operation_location"]] = key
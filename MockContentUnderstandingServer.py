@@ -0,0 +1,366 @@
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+_ANALYZE_PATH = re.compile(r"^/contentunderstanding/analyzers/([^/:]+):analyze$")
+_RESULT_PATH = re.compile(r"^/contentunderstanding/analyzerResults/([^/]+)$")
+_ANALYZER_PATH = re.compile(r"^/contentunderstanding/analyzers/([^/:]+)$")
+_OPERATION_PATH = re.compile(r"^/contentunderstanding/analyzers/([^/:]+)/operations/([^/]+)$")
+
+# Sample values of each field type, for generated results
+_SAMPLE_VALUES = {
+    "string": ("valueString", "Place Order with Affirm"),
+    "date": ("valueDate", "2025-05-13"),
+    "time": ("valueTime", "18:21:04"),
+    "number": ("valueNumber", 12.5),
+    "integer": ("valueInteger", 42),
+    "boolean": ("valueBoolean", True),
+}
+
+
+@dataclass
+class MockServerConfig:
+    """
+    How the mock service behaves. All times are in seconds.
+    """
+    # Added to the handling of every request
+    request_latency_seconds: float = 0.0
+    # How long an analysis runs before its result is ready
+    analysis_seconds: float = 1.0
+    # How long creating an analyzer takes
+    analyzer_creation_seconds: float = 0.5
+    # The fraction of analyses that end as Failed
+    failure_rate: float = 0.0
+    # The number of contents in each result
+    contents_per_result: int = 1
+    # Markdown added to each content, to make results as large as real ones
+    markdown_bytes_per_content: int = 1024
+    # Sent as Retry-After with 202 responses and running operations, if set
+    retry_after_seconds: Optional[int] = None
+    # Reject analyses for analyzers that were not created first
+    require_analyzer: bool = False
+    # The quota: requests beyond this many in a second are answered 429 with a Retry-After
+    max_requests_per_second: Optional[int] = None
+    # The fraction of requests answered 503, as by an overloaded service
+    transient_error_rate: float = 0.0
+    seed: Optional[int] = None
+
+
+class MockContentUnderstandingServer:
+    """
+    A local stand-in for the Content Understanding REST API, to measure clients without Azure.
+
+    Implements :analyze, analyzerResults/{id}, analyzer PUT/PATCH/GET/DELETE and the analyzer
+    operations, with Operation-Location headers pointing back at itself. Results carry one value
+    per field of the analyzer's schema. Every request is counted in `stats`, by kind; requests
+    rejected by the quota count as "throttled" and injected 503s as "transient_error".
+    Uploaded files are read and dropped as they arrive; `bytes_received` counts them.
+
+    Usage:
+        with MockContentUnderstandingServer(MockServerConfig(analysis_seconds=0.2)) as server:
+            client = AzureContentUnderstandingClient(server.url, "2025-05-01-preview", subscription_key="any")
+    """
+
+    def __init__(self, config: Optional[MockServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockServerConfig()
+        self.stats: Counter = Counter()
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(self.config.seed)
+        self._ids = itertools.count(1)
+        self._analyzers: Dict[str, Dict[str, Any]] = {}
+        # Analyzer id -> when its creation completes
+        self._analyzers_ready_at: Dict[str, float] = {}
+        # Analysis id -> (analyzer id, ready at, failed)
+        self._analyses: Dict[str, Tuple[str, float, bool]] = {}
+        # Operation id -> ready at
+        self._operations: Dict[str, float] = {}
+        # The current one-second quota window and the requests accepted in it
+        self._window_start = 0.0
+        self._window_requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockContentUnderstandingServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats.clear()
+            self.bytes_received = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self.stats[kind] += 1
+            self.stats["total"] += 1
+
+    def _reject(self) -> Optional[Tuple[int, Dict[str, Any], Dict[str, str]]]:
+        """
+        Decide whether to refuse a request, as the real service does when over quota or overloaded.
+
+        :return: The status code, body and headers to refuse it with, or None to handle it.
+        """
+        with self._lock:
+            if self.config.max_requests_per_second is not None:
+                now = time.time()
+                if now - self._window_start >= 1.0:
+                    self._window_start = now
+                    self._window_requests = 0
+                if self._window_requests >= self.config.max_requests_per_second:
+                    retry_after = self._window_start + 1.0 - now
+                    headers = {"Retry-After": str(math.ceil(retry_after)), "retry-after-ms": str(int(retry_after * 1000))}
+                    return 429, _error("TooManyRequests", "Rate limit exceeded."), headers
+                self._window_requests += 1
+            if self.config.transient_error_rate and self._random.random() < self.config.transient_error_rate:
+                return 503, _error("ServiceUnavailable", "Injected transient failure."), {}
+        return None
+
+    def _build_result(self, analysis_id: str, analyzer_id: str) -> Dict[str, Any]:
+        analyzer = self._analyzers.get(analyzer_id, {})
+        fields = {
+            name: _sample_field(schema)
+            for name, schema in (analyzer.get("fieldSchema", {}).get("fields") or {}).items()
+        }
+        markdown = "x" * self.config.markdown_bytes_per_content
+        contents = [
+            {"kind": "document", "markdown": markdown, "fields": fields}
+            for _ in range(self.config.contents_per_result)
+        ]
+        return {
+            "id": analysis_id,
+            "status": "Succeeded",
+            "result": {"analyzerId": analyzer_id, "apiVersion": "mock", "contents": contents, "warnings": []},
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Keep-alive responses stall on Nagle + delayed ACK otherwise
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_PUT(self):
+                self._handle("PUT")
+
+            def do_PATCH(self):
+                self._handle("PATCH")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self, method: str) -> None:
+                body = self._read_body()
+                if server.config.request_latency_seconds:
+                    time.sleep(server.config.request_latency_seconds)
+                path = self.path.split("?", 1)[0]
+
+                rejection = server._reject()
+                if rejection is not None:
+                    status_code, error, headers = rejection
+                    server._count("throttled" if status_code == 429 else "transient_error")
+                    return self._send(status_code, error, headers)
+                match = _ANALYZE_PATH.match(path)
+                if match and method == "POST":
+                    return self._analyze(match.group(1))
+                match = _RESULT_PATH.match(path)
+                if match and method == "GET":
+                    return self._get_result(match.group(1))
+                match = _OPERATION_PATH.match(path)
+                if match and method == "GET":
+                    return self._get_operation(match.group(2))
+                match = _ANALYZER_PATH.match(path)
+                if match:
+                    analyzer_id = match.group(1)
+                    if method == "PUT":
+                        return self._create_analyzer(analyzer_id, body)
+                    if method == "PATCH":
+                        return self._update_analyzer(analyzer_id, body)
+                    if method == "GET":
+                        return self._get_analyzer(analyzer_id)
+                    if method == "DELETE":
+                        return self._delete_analyzer(analyzer_id)
+                server._count("unknown")
+                self._send(404, _error("NotFound", f"{method} {path}"))
+
+            def _analyze(self, analyzer_id: str) -> None:
+                server._count("analyze")
+                if server.config.require_analyzer and analyzer_id not in server._analyzers:
+                    return self._send(404, _error("ModelNotFound", f"Analyzer {analyzer_id} not found."))
+                analysis_id = f"mock-{next(server._ids)}"
+                with server._lock:
+                    failed = server._random.random() < server.config.failure_rate
+                    server._analyses[analysis_id] = (
+                        analyzer_id, time.time() + server.config.analysis_seconds, failed
+                    )
+                location = f"{server.url}/contentunderstanding/analyzerResults/{analysis_id}?api-version=mock"
+                self._send(202, {"id": analysis_id, "status": "Running"}, {"Operation-Location": location})
+
+            def _get_result(self, analysis_id: str) -> None:
+                server._count("poll")
+                analysis = server._analyses.get(analysis_id)
+                if analysis is None:
+                    return self._send(404, _error("NotFound", f"Result {analysis_id} not found."))
+                analyzer_id, ready_at, failed = analysis
+                if time.time() < ready_at:
+                    return self._send(200, {"id": analysis_id, "status": "Running"})
+                if failed:
+                    return self._send(200, {
+                        "id": analysis_id,
+                        "status": "Failed",
+                        "error": {"code": "InternalServerError", "message": "Injected failure."},
+                    })
+                self._send(200, server._build_result(analysis_id, analyzer_id))
+
+            def _create_analyzer(self, analyzer_id: str, definition: Any) -> None:
+                server._count("analyzer_put")
+                with server._lock:
+                    if analyzer_id in server._analyzers:
+                        return self._send(409, _error("Conflict", f"Analyzer {analyzer_id} already exists."))
+                    operation_id = f"op-{next(server._ids)}"
+                    ready_at = time.time() + server.config.analyzer_creation_seconds
+                    server._operations[operation_id] = ready_at
+                    server._analyzers[analyzer_id] = dict(
+                        definition or {}, analyzerId=analyzer_id, status="creating", createdAt=time.time()
+                    )
+                    server._analyzers_ready_at[analyzer_id] = ready_at
+                location = (
+                    f"{server.url}/contentunderstanding/analyzers/{analyzer_id}"
+                    f"/operations/{operation_id}?api-version=mock"
+                )
+                self._send(201, dict(server._analyzers[analyzer_id], status="creating"), {"Operation-Location": location})
+
+            def _update_analyzer(self, analyzer_id: str, changes: Any) -> None:
+                server._count("analyzer_patch")
+                with server._lock:
+                    analyzer = server._analyzers.get(analyzer_id)
+                    if analyzer is None:
+                        return self._send(404, _error("NotFound", f"Analyzer {analyzer_id} not found."))
+                    analyzer.update(changes or {})
+                self._send(200, analyzer)
+
+            def _get_analyzer(self, analyzer_id: str) -> None:
+                server._count("analyzer_get")
+                with server._lock:
+                    analyzer = server._analyzers.get(analyzer_id)
+                    if analyzer is None:
+                        return self._send(404, _error("NotFound", f"Analyzer {analyzer_id} not found."))
+                    if analyzer["status"] == "creating" and time.time() >= server._analyzers_ready_at[analyzer_id]:
+                        analyzer["status"] = "ready"
+                    analyzer = dict(analyzer)
+                self._send(200, analyzer)
+
+            def _delete_analyzer(self, analyzer_id: str) -> None:
+                server._count("analyzer_delete")
+                with server._lock:
+                    server._analyzers.pop(analyzer_id, None)
+                    server._analyzers_ready_at.pop(analyzer_id, None)
+                self._send(204)
+
+            def _get_operation(self, operation_id: str) -> None:
+                server._count("operation_poll")
+                ready_at = server._operations.get(operation_id)
+                if ready_at is None:
+                    return self._send(404, _error("NotFound", f"Operation {operation_id} not found."))
+                status = "Succeeded" if time.time() >= ready_at else "Running"
+                self._send(200, {"id": operation_id, "status": status})
+
+            def _read_body(self) -> Any:
+                is_json = self.headers.get("Content-Type", "").startswith(("application/json", "application/merge-patch+json"))
+                # Only JSON bodies are kept; files are dropped piece by piece, so that the mock
+                # does not hold what the client took care not to
+                data = bytearray()
+                received = 0
+                for piece in self._iter_body():
+                    received += len(piece)
+                    if is_json:
+                        data += piece
+                with server._lock:
+                    server.bytes_received += received
+                return json.loads(data or b"null") if is_json else None
+
+            def _iter_body(self) -> Iterator[bytes]:
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    while True:
+                        size = int(self.rfile.readline().split(b";", 1)[0], 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return
+                        yield from self._iter_exactly(size)
+                        self.rfile.readline()
+                else:
+                    yield from self._iter_exactly(int(self.headers.get("Content-Length") or 0))
+
+            def _iter_exactly(self, size: int) -> Iterator[bytes]:
+                while size > 0:
+                    piece = self.rfile.read(min(size, 64 * 1024))
+                    if not piece:
+                        return
+                    size -= len(piece)
+                    yield piece
+
+            def _send(self, status_code: int, body: Any = None, headers: Optional[Dict[str, str]] = None) -> None:
+                content = json.dumps(body).encode("utf-8") if body is not None else b""
+                self.send_response(status_code)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                running = isinstance(body, dict) and body.get("status") == "Running"
+                if server.config.retry_after_seconds is not None and (status_code == 202 or running):
+                    self.send_header("Retry-After", str(server.config.retry_after_seconds))
+                if content:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        return Handler
+
+
+def _error(code: str, message: str) -> Dict[str, Any]:
+    return {"error": {"code": code, "message": message}}
+
+
+def _sample_field(schema: Dict[str, Any]) -> Dict[str, Any]:
+    field_type = schema.get("type", "string")
+    if field_type == "array":
+        return {"type": "array", "valueArray": [_sample_field(schema.get("items") or {}) for _ in range(2)]}
+    if field_type == "object":
+        properties = schema.get("properties") or {}
+        return {"type": "object", "valueObject": {name: _sample_field(value) for name, value in properties.items()}}
+    value_key, value = _SAMPLE_VALUES.get(field_type, _SAMPLE_VALUES["string"])
+    return {"type": field_type, value_key: value, "confidence": 0.9}
@@ -0,0 +1,240 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+import requests
+
+from AzureContentUnderstandingClient import (
+    AzureContentUnderstandingClient,
+    CachedResponse,
+    PollingStrategy,
+    parse_retry_after,
+)
+from RateLimiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Operation:
+    """
+    An operation being polled, and where it is in its polling schedule.
+    """
+    operation_location: str
+    future: Future
+    polling_strategy: PollingStrategy
+    timeout_seconds: float
+    deadline: float
+    started_at: float = field(default_factory=time.monotonic)
+    attempt: int = 0
+
+
+class OperationPoller:
+    """
+    Polls many long-running operations from one scheduler thread, instead of one sleeping
+    thread per operation.
+
+    Operations are kept in a heap keyed by when they are next due. The scheduler sleeps until
+    the earliest one is due, hands its GET to a small pool of workers, and schedules the
+    next poll from the PollingStrategy and the Retry-After of the response. Each operation
+    resolves the Future returned by `submit` with its result, or with the exception that
+    `poll_result` would have raised: OperationFailedError, TimeoutError or an HTTPError.
+
+    Analysis results (analyzerResults/{id}) and analyzer operations are polled alike. With
+    `polls_per_second`, the scheduler spaces out the GETs of all operations together, so
+    the total poll rate stays under the cap however many operations are pending. Leave it
+    unset when the client has a RateLimiter with a poll budget, which already limits these GETs
+    along with every other poll the client sends.
+
+    Usage:
+        with OperationPoller(client, polls_per_second=10) as poller:
+            futures = [poller.submit(client.begin_analyze(analyzer_id, url)) for url in urls]
+            results = [future.result() for future in futures]
+    """
+
+    def __init__(
+        self,
+        client: AzureContentUnderstandingClient,
+        polls_per_second: Optional[float] = None,
+        polling_strategy: Optional[PollingStrategy] = None,
+        max_workers: int = 4,
+    ):
+        """
+        :param client: The Content Understanding client the polls are sent with.
+        :param polls_per_second: The cap on polls of all operations together. Unlimited if None.
+        :param polling_strategy: How to poll operations submitted without their own strategy.
+        :param max_workers: The number of polls in flight at once. It does not depend on the
+            number of operations, since a poll only takes as long as one GET.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self.client = client
+        self.polling_strategy = polling_strategy or PollingStrategy()
+        self.max_workers = max_workers
+        self._bucket = TokenBucket(polls_per_second) if polls_per_second else None
+        self._heap: List[Tuple[float, int, _Operation]] = []
+        self._sequence = itertools.count()
+        self._wakeup = threading.Condition()
+        self._closed = False
+        # A poll is only dispatched when a worker is free, so it goes out when it is due
+        self._free_workers = threading.Semaphore(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="OperationPoller")
+        self._scheduler = threading.Thread(target=self._schedule, name="OperationPoller", daemon=True)
+        self._scheduler.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of operations waiting for their next poll.
+        """
+        with self._wakeup:
+            return len(self._heap)
+
+    def submit(
+        self,
+        operation: Union[requests.Response, str],
+        timeout_seconds: float = 120,
+        polling_strategy: Optional[PollingStrategy] = None,
+        callback: Optional[Callable[[Future], Any]] = None,
+    ) -> Future:
+        """
+        Start polling an operation.
+
+        :param operation: The response that started the operation (e.g. of begin_analyze or
+            begin_create_analyzer), or its operation location.
+        :param timeout_seconds: How long to wait for the operation to complete.
+        :param polling_strategy: How to poll this operation. Defaults to the poller's.
+        :param callback: Called with the future once it is resolved.
+        :return: A future of the succeeded operation. Cancelling it stops the polling.
+        :raises ValueError: If the response has no operation location.
+        """
+        future: Future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        if isinstance(operation, CachedResponse):
+            future.set_result(operation.result)
+            return future
+
+        if isinstance(operation, str):
+            operation_location, retry_after = operation, None
+        else:
+            operation_location = self.client._get_operation_location(operation)
+            retry_after = parse_retry_after(operation.headers)
+
+        polling_strategy = polling_strategy or self.polling_strategy
+        now = time.monotonic()
+        state = _Operation(
+            operation_location,
+            future,
+            polling_strategy,
+            timeout_seconds,
+            deadline=now + timeout_seconds,
+            started_at=now,
+        )
+        self._schedule_poll(state, now + polling_strategy.next_delay(0, retry_after))
+        return future
+
+    def close(self) -> None:
+        """
+        Stop polling. Operations still pending are cancelled; wait for their futures first to avoid that.
+        """
+        with self._wakeup:
+            if self._closed:
+                return
+            self._closed = True
+            pending = [state for _, _, state in self._heap]
+            self._heap.clear()
+            self._wakeup.notify_all()
+        self._scheduler.join()
+        self._executor.shutdown(wait=True)
+        for state in pending:
+            state.future.cancel()
+
+    def _schedule_poll(self, state: _Operation, due: float) -> None:
+        # Never sleep past the deadline, so that timeouts are reported on time
+        due = min(due, state.deadline)
+        with self._wakeup:
+            if self._closed:
+                state.future.cancel()
+                return
+            heapq.heappush(self._heap, (due, next(self._sequence), state))
+            if self._heap[0][2] is state:
+                self._wakeup.notify()
+
+    def _schedule(self) -> None:
+        while True:
+            with self._wakeup:
+                while not self._closed:
+                    if self._heap:
+                        wait_seconds = self._heap[0][0] - time.monotonic()
+                        if wait_seconds <= 0:
+                            break
+                        self._wakeup.wait(wait_seconds)
+                    else:
+                        self._wakeup.wait()
+                if self._closed:
+                    return
+                _, _, state = heapq.heappop(self._heap)
+
+            if state.future.cancelled():
+                continue
+            if time.monotonic() >= state.deadline:
+                _resolve(state.future, exception=TimeoutError(
+                    f"Operation timed out after {state.timeout_seconds:.2f} seconds."
+                ))
+                continue
+            if self._bucket is not None:
+                delay = self._bucket.reserve()
+                if delay > 0:
+                    time.sleep(delay)
+            self._free_workers.acquire()
+            try:
+                self._executor.submit(self._poll, state)
+            except RuntimeError:
+                # The executor was shut down by close()
+                self._free_workers.release()
+                state.future.cancel()
+                return
+
+    def _poll(self, state: _Operation) -> None:
+        try:
+            result, retry_after = self.client.poll_once(state.operation_location)
+        except Exception as e:
+            _resolve(state.future, exception=e)
+            return
+        finally:
+            self._free_workers.release()
+
+        if result is not None:
+            logger.info(
+                f"Request result is ready after {time.monotonic() - state.started_at:.2f} seconds."
+            )
+            _resolve(state.future, result=result)
+            return
+        state.attempt += 1
+        self._schedule_poll(
+            state, time.monotonic() + state.polling_strategy.next_delay(state.attempt, retry_after)
+        )
+
+
+def _resolve(future: Future, result: Any = None, exception: Optional[BaseException] = None) -> None:
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        # Cancelled by the caller while its last poll was in flight
+        pass
@@ -0,0 +1,322 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from dataclasses import dataclass, field, replace
+from functools import partial
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tells a stage worker that no more items are coming
+_DONE = object()
+
+
+@dataclass
+class StageMetrics:
+    """
+    What a pipeline stage has done so far.
+    """
+    name: str
+    workers: int
+    processed: int = 0
+    failed: int = 0
+    # Items waiting in the stage's input queue, now and at most
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    # Time spent by workers on items, and by items waiting in the input queue
+    busy_seconds: float = 0.0
+    queue_wait_seconds: float = 0.0
+
+    @property
+    def seconds_per_item(self) -> float:
+        done = self.processed + self.failed
+        return self.busy_seconds / done if done else 0.0
+
+    @property
+    def average_queue_wait_seconds(self) -> float:
+        done = self.processed + self.failed
+        return self.queue_wait_seconds / done if done else 0.0
+
+    def utilization(self, elapsed_seconds: float) -> float:
+        """
+        The fraction of the time its workers were busy; the stage near 1.0 is the bottleneck.
+        """
+        if not elapsed_seconds:
+            return 0.0
+        return self.busy_seconds / (self.workers * elapsed_seconds)
+
+
+@dataclass
+class PipelineReport:
+    """
+    Outcome of a pipeline run: which items went all the way through, and how each stage did.
+    """
+    succeeded: List[Any] = field(default_factory=list)
+    # (item, stage name, exception) of each item that failed
+    failed: List[Tuple[Any, str, BaseException]] = field(default_factory=list)
+    stages: List[StageMetrics] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def bottleneck(self) -> Optional[StageMetrics]:
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda stage: stage.utilization(self.elapsed_seconds))
+
+    def format_stages(self) -> str:
+        return format_stage_metrics(self.stages, self.elapsed_seconds)
+
+
+def format_stage_metrics(stages: List[StageMetrics], elapsed_seconds: float) -> str:
+    """
+    Format stage metrics as a table, one line per stage.
+    """
+    lines = [
+        f"{'stage':<12} {'workers':>7} {'done':>6} {'failed':>6} {'queued':>6} {'max q':>6} "
+        f"{'s/item':>8} {'wait s':>8} {'busy':>6}"
+    ]
+    for stage in stages:
+        lines.append(
+            f"{stage.name:<12} {stage.workers:7d} {stage.processed:6d} {stage.failed:6d} "
+            f"{stage.queue_depth:6d} {stage.max_queue_depth:6d} {stage.seconds_per_item:8.2f} "
+            f"{stage.average_queue_wait_seconds:8.2f} {stage.utilization(elapsed_seconds):6.0%}"
+        )
+    return "\n".join(lines)
+
+
+class Stage:
+    """
+    One step of a Pipeline: `function` applied to every item by `workers` threads.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        function: Callable[[Any], Any],
+        workers: int = 1,
+        queue_size: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ):
+        """
+        :param name: Identifies the stage in the metrics.
+        :param function: Turns an item into the item passed to the next stage. An exception
+            fails the item, which then goes no further. It may also return a
+            concurrent.futures.Future of that item, e.g. from an OperationPoller: the worker
+            then moves on to the next item, and the item is passed on when the future resolves.
+        :param workers: The number of threads calling `function`.
+        :param queue_size: How many items may wait for the stage. Defaults to twice the workers.
+            A full queue holds back the stage before it, so memory use stays bounded.
+        :param max_pending: The number of items the stage works on at once, futures included.
+            Defaults to the workers.
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if max_pending is not None and max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.queue_size = queue_size if queue_size is not None else 2 * workers
+        self.max_pending = max_pending if max_pending is not None else workers
+
+
+class Pipeline:
+    """
+    Runs items through a sequence of stages connected by bounded queues, so that every
+    stage works on different items at the same time: while one video is being polled,
+    the next is being uploaded and the one after that fetched.
+
+    Metrics of every stage (queue depth, time per item, utilization) can be read while it
+    runs, and are logged every `report_interval_seconds` if set, to show which stage is the
+    bottleneck: the one whose workers are always busy and whose input queue stays full.
+
+    Usage:
+        pipeline = Pipeline([Stage("fetch", fetch, 4), Stage("submit", submit, 4), Stage("poll", poll, 32)])
+        report = pipeline.run(blob_names)
+    """
+
+    def __init__(self, stages: List[Stage], report_interval_seconds: Optional[float] = None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+
+        self.stages = stages
+        self.report_interval_seconds = report_interval_seconds
+        self._lock = threading.Lock()
+        # Signalled when a future of a stage resolves
+        self._resolved = threading.Condition(self._lock)
+        self._metrics = [StageMetrics(stage.name, stage.max_pending) for stage in stages]
+        self._queues: List[queue.Queue] = []
+        # Futures resolved per stage, waiting to be handed on by the stage's forwarder
+        self._resolved_futures: List[queue.Queue] = []
+        self._slots: List[threading.Semaphore] = []
+        self._pending: List[int] = []
+        self._start_time = 0.0
+
+    def metrics(self) -> List[StageMetrics]:
+        """
+        A snapshot of the metrics of every stage.
+        """
+        with self._lock:
+            snapshot = [replace(metrics) for metrics in self._metrics]
+        for metrics, stage_queue in zip(snapshot, self._queues):
+            metrics.queue_depth = stage_queue.qsize()
+        return snapshot
+
+    def run(self, items: Iterable[Any]) -> PipelineReport:
+        """
+        Run every item through all stages and wait for the last one to finish.
+        Items are taken from `items` only as the first stage has room, so it can be a lazy listing.
+        """
+        report = PipelineReport()
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        # Unbounded, so a future's callback never waits; max_pending bounds them anyway
+        self._resolved_futures = [queue.Queue() for _ in self.stages]
+        self._slots = [threading.Semaphore(stage.max_pending) for stage in self.stages]
+        # Futures not yet resolved per stage
+        self._pending = [0 for _ in self.stages]
+        # Workers still running per stage; the last one to finish tells the next stage to stop
+        remaining_workers = [stage.workers for stage in self.stages]
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for worker in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(index, report, remaining_workers),
+                    name=f"{stage.name}-{worker}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+            # Passes on the items of resolved futures, which may have to wait for room in the next
+            # stage; the future's callback runs on the thread that resolved it, e.g. a poller's
+            thread = threading.Thread(
+                target=self._forward_resolved, args=(index, report), name=f"{stage.name}-resolved", daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+
+        self._start_time = time.perf_counter()
+        stop_reporting = threading.Event()
+        if self.report_interval_seconds:
+            threading.Thread(target=self._report_periodically, args=(stop_reporting,), daemon=True).start()
+        try:
+            for item in items:
+                self._put(0, (item, item))
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+            stop_reporting.set()
+
+        report.elapsed_seconds = time.perf_counter() - self._start_time
+        report.stages = self.metrics()
+        return report
+
+    def _put(self, index: int, entry: Tuple[Any, Any]) -> None:
+        stage_queue = self._queues[index]
+        # Blocks while the stage is behind, which holds back the stage feeding it
+        stage_queue.put((time.perf_counter(), entry))
+        depth = stage_queue.qsize()
+        with self._lock:
+            metrics = self._metrics[index]
+            metrics.max_queue_depth = max(metrics.max_queue_depth, depth)
+
+    def _work(self, index: int, report: PipelineReport, remaining_workers: List[int]) -> None:
+        stage = self.stages[index]
+        stage_queue = self._queues[index]
+        slots = self._slots[index]
+        while True:
+            queued = stage_queue.get()
+            if queued is _DONE:
+                break
+            queued_at, (item, value) = queued
+            slots.acquire()
+            started_at = time.perf_counter()
+            try:
+                value = stage.function(value)
+            except Exception as e:
+                self._finish(index, report, item, queued_at, started_at, error=e)
+                continue
+            if isinstance(value, Future):
+                with self._lock:
+                    self._pending[index] += 1
+                value.add_done_callback(partial(self._resolve, index, report, item, queued_at, started_at))
+            else:
+                self._finish(index, report, item, queued_at, started_at, value=value)
+
+        with self._lock:
+            remaining_workers[index] -= 1
+            last_worker = remaining_workers[index] == 0
+            if last_worker:
+                # Items still behind a future have to reach the next stage before it is told to stop
+                while self._pending[index]:
+                    self._resolved.wait()
+        if not last_worker:
+            return
+        self._resolved_futures[index].put(_DONE)
+        if index < len(self.stages) - 1:
+            for _ in range(self.stages[index + 1].workers):
+                self._queues[index + 1].put(_DONE)
+
+    def _resolve(self, index: int, report: PipelineReport, item: Any, queued_at: float, started_at: float, future: Future) -> None:
+        # Called by whoever resolves the future, so it must not block
+        self._resolved_futures[index].put_nowait((item, queued_at, started_at, future))
+
+    def _forward_resolved(self, index: int, report: PipelineReport) -> None:
+        resolved_futures = self._resolved_futures[index]
+        while True:
+            resolved = resolved_futures.get()
+            if resolved is _DONE:
+                return
+            item, queued_at, started_at, future = resolved
+            if future.cancelled():
+                self._finish(index, report, item, queued_at, started_at, error=CancelledError())
+            elif future.exception() is not None:
+                self._finish(index, report, item, queued_at, started_at, error=future.exception())
+            else:
+                self._finish(index, report, item, queued_at, started_at, value=future.result())
+            with self._lock:
+                self._pending[index] -= 1
+                self._resolved.notify_all()
+
+    def _finish(
+        self,
+        index: int,
+        report: PipelineReport,
+        item: Any,
+        queued_at: float,
+        started_at: float,
+        value: Any = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """
+        Record how an item did in a stage and hand it on to the next one.
+        """
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+        finished_at = time.perf_counter()
+        self._slots[index].release()
+        if error is not None:
+            logger.error(f"{stage.name} failed for {item}", exc_info=error)
+        with self._lock:
+            metrics = self._metrics[index]
+            metrics.busy_seconds += finished_at - started_at
+            metrics.queue_wait_seconds += started_at - queued_at
+            if error is not None:
+                metrics.failed += 1
+                report.failed.append((item, stage.name, error))
+            else:
+                metrics.processed += 1
+                if is_last:
+                    report.succeeded.append(item)
+        if error is None and not is_last:
+            self._put(index + 1, (item, value))
+
+    def _report_periodically(self, stop: threading.Event) -> None:
+        while not stop.wait(self.report_interval_seconds):
+            elapsed_seconds = time.perf_counter() - self._start_time
+            logger.info(f"Pipeline after {elapsed_seconds:.0f}s:\n{format_stage_metrics(self.metrics(), elapsed_seconds)}")
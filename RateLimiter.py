@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Dict, Optional
+
+# The budgets requests are charged to: submitting work (analyses, analyzer changes),
+# and polling or reading state
+SUBMIT = "submit"
+POLL = "poll"
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `rate_per_second` requests on average, with bursts of up to `burst`.
+
+    Callers reserve a token and then wait the returned delay, so the bucket works the
+    same for threads (time.sleep) and coroutines (asyncio.sleep), and waiting callers are
+    served in the order they arrived instead of racing each other.
+    """
+
+    def __init__(self, rate_per_second: float, burst: Optional[float] = None):
+        """
+        :param rate_per_second: The sustained number of requests per second.
+        :param burst: The number of requests allowed at once after a quiet period. Defaults to one second's worth.
+        """
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second must be positive")
+
+        self.rate_per_second = rate_per_second
+        self.capacity = burst if burst is not None else max(1.0, rate_per_second)
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        # When tokens were last added; in the future while the bucket is paused
+        self._updated = time.monotonic()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Take `tokens` from the bucket, going into debt if there are not enough.
+
+        :return: How many seconds to wait before sending the request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            return max(0.0, self._updated - now) + max(0.0, -self._tokens) / self.rate_per_second
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Take `tokens` from the bucket, blocking until the request may be sent.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold back every request not yet reserved for `seconds`, e.g. after the service
+        answered 429 with a Retry-After. Sending resumes at the sustained rate, not with a burst.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            resume_at = now + seconds
+            if resume_at > self._updated:
+                self._tokens = min(self._tokens, 0.0)
+                self._updated = resume_at
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+            self._updated = now
+
+
+class RateLimiter:
+    """
+    Client-side request budgets for the Content Understanding service, one token bucket per budget.
+
+    Submits and polls are limited separately, so a backlog of polls never starves new
+    submissions and vice versa. Share one instance between all clients and threads of a
+    process, so that together they stay under the resource's quota instead of each
+    discovering it through 429 responses.
+    """
+
+    def __init__(
+        self,
+        submits_per_second: Optional[float] = None,
+        polls_per_second: Optional[float] = None,
+        submit_burst: Optional[float] = None,
+        poll_burst: Optional[float] = None,
+    ):
+        """
+        :param submits_per_second: The rate of analyze and analyzer create, update and delete requests. Unlimited if None.
+        :param polls_per_second: The rate of result, operation and analyzer reads. Unlimited if None.
+        :param submit_burst: The burst of the submit budget. Defaults to one second's worth.
+        :param poll_burst: The burst of the poll budget. Defaults to one second's worth.
+        """
+        self._buckets: Dict[str, TokenBucket] = {}
+        if submits_per_second:
+            self._buckets[SUBMIT] = TokenBucket(submits_per_second, submit_burst)
+        if polls_per_second:
+            self._buckets[POLL] = TokenBucket(polls_per_second, poll_burst)
+
+    def reserve(self, budget: str) -> float:
+        """
+        Charge one request to `budget` (SUBMIT or POLL).
+
+        :return: How many seconds to wait before sending it.
+        """
+        bucket = self._buckets.get(budget)
+        return bucket.reserve() if bucket is not None else 0.0
+
+    def acquire(self, budget: str) -> None:
+        """
+        Charge one request to `budget` (SUBMIT or POLL), blocking until it may be sent.
+        """
+        delay = self.reserve(budget)
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, budget: str, seconds: float) -> None:
+        """
+        Hold back all requests of `budget` for `seconds`, after the service throttled one of them.
+        """
+        bucket = self._buckets.get(budget)
+        if bucket is not None:
+            bucket.pause(seconds)
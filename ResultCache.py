@@ -0,0 +1,273 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from UploadStream import UploadStream
+
+logger = logging.getLogger(__name__)
+
+# Size of the reads used to hash files and streams
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def hash_schema(schema: Union[dict, str]) -> str:
+    """
+    SHA-256 of an analyzer schema, independent of key order and formatting.
+    """
+    if isinstance(schema, str):
+        schema = json.loads(schema)
+    canonical = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_content_id(file_location: str, file_data: Union[bytes, BinaryIO, None]) -> Optional[str]:
+    """
+    Identify the content of an analyze request without changing what will be sent.
+
+    Bytes, local files and seekable streams are identified by their SHA-256. Blob streams
+    (anything with an `etag`, such as BlobReadStream) are identified by name and ETag,
+    so they are not downloaded twice.
+
+    :return: The content id, or None if the content cannot be identified (e.g. a plain URL).
+    """
+    if isinstance(file_data, (bytes, bytearray, memoryview)):
+        return "sha256:" + hashlib.sha256(file_data).hexdigest()
+    if file_data is not None:
+        etag = getattr(file_data, "etag", None)
+        if etag:
+            return get_blob_content_id(getattr(file_data, "name", ""), etag)
+        if isinstance(file_data, UploadStream):
+            # Read past its progress callback, which only reports what is sent
+            return "sha256:" + file_data.sha256()
+        if getattr(file_data, "seekable", lambda: False)():
+            position = file_data.tell()
+            digest = _hash_stream(file_data)
+            file_data.seek(position)
+            return "sha256:" + digest
+        return None
+    if Path(file_location).is_file():
+        with open(file_location, "rb") as file:
+            return "sha256:" + _hash_stream(file)
+    return None
+
+
+def get_blob_content_id(name: str, etag: str) -> str:
+    """
+    Identify the content of a blob by its name and ETag, e.g. from listed blob properties,
+    the same way get_content_id identifies a stream of the blob.
+    """
+    return f"etag:{name}:{etag}"
+
+
+def _hash_stream(stream: BinaryIO) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_BYTES), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LocalDiskCacheBackend:
+    """
+    Stores cached results as JSON files in a local directory.
+    When the directory grows beyond `max_bytes`, the least recently used entries are removed;
+    since that scans the whole directory, it is checked every `evict_every_puts` puts rather
+    than on each one.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024, evict_every_puts: int = 100):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.evict_every_puts = evict_every_puts
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._puts_lock = threading.Lock()
+        self._puts = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            content = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # Reads count as use for the LRU eviction
+        os.utime(path)
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        path = self._path(key)
+        temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        temp_path.write_bytes(content)
+        # Atomic rename, so concurrent readers never see a partial entry
+        os.replace(temp_path, path)
+        with self._puts_lock:
+            self._puts += 1
+            due = self._puts % self.evict_every_puts == 0
+        if due:
+            self.evict()
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries until the cache fits in `max_bytes`.
+        This scans the whole directory; `put` runs it every `evict_every_puts` puts.
+        """
+        with self._lock:
+            entries = []
+            for path in self.directory.glob("*.json"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total_bytes = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total_bytes -= size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+
+class BlobCacheBackend:
+    """
+    Stores cached results as JSON blobs under `base_path`, so they are shared by all workers.
+    When the cache grows beyond `max_bytes`, the oldest entries are removed; since that lists
+    the whole cache, it is checked every `evict_every_puts` puts rather than on each one.
+    """
+
+    def __init__(
+        self,
+        blob_utils,
+        base_path: str = "result-cache/",
+        max_bytes: int = 10 * 1024 * 1024 * 1024,
+        evict_every_puts: int = 100,
+    ):
+        self.blob_utils = blob_utils
+        self.base_path = base_path
+        self.max_bytes = max_bytes
+        self.evict_every_puts = evict_every_puts
+        self._lock = threading.Lock()
+        self._puts = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.blob_utils.read(self._path(key))
+        except ResourceNotFoundError:
+            return None
+
+    def put(self, key: str, content: bytes) -> None:
+        self.blob_utils.write(self._path(key), io.BytesIO(content))
+        with self._lock:
+            self._puts += 1
+            due = self._puts % self.evict_every_puts == 0
+        if due:
+            self.evict()
+
+    def delete(self, key: str) -> None:
+        try:
+            self.blob_utils.remove(self._path(key))
+        except ResourceNotFoundError:
+            pass
+
+    def evict(self) -> None:
+        """
+        Remove the oldest entries until the cache fits in `max_bytes`.
+        This lists the whole cache; `put` runs it every `evict_every_puts` puts.
+        """
+        blobs = self.blob_utils.list_blobs(self.base_path)
+        entries = sorted((b.last_modified, b.size, b.name) for b in blobs)
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            self.blob_utils.remove(name)
+            total_bytes -= size
+
+    def _path(self, key: str) -> str:
+        return f"{self.base_path}{key}.json"
+
+
+class ResultCache:
+    """
+    Cache of Content Understanding results, so identical inputs are never analyzed twice.
+
+    Entries are keyed by analyzer id, analyzer schema hash, API version and the content id
+    of the input (see get_content_id). Registering the analyzer schemas makes sure results
+    of an older analyzer definition are not reused after the analyzer has changed; results
+    of analyzers whose schema is not registered are not cached at all.
+    """
+
+    def __init__(
+        self,
+        backend,
+        ttl_seconds: Optional[float] = 7 * 24 * 60 * 60,
+        analyzer_schemas: Optional[Dict[str, Union[dict, str]]] = None,
+    ):
+        """
+        :param backend: Where entries are stored: a LocalDiskCacheBackend or BlobCacheBackend.
+        :param ttl_seconds: How long a result stays valid; None keeps results until they are evicted.
+        :param analyzer_schemas: The schema of each analyzer, by analyzer id.
+        """
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._schema_hashes: Dict[str, str] = {
+            analyzer_id: hash_schema(schema)
+            for analyzer_id, schema in (analyzer_schemas or {}).items()
+        }
+
+    def register_schema(self, analyzer_id: str, schema: Union[dict, str]) -> None:
+        self._schema_hashes[analyzer_id] = hash_schema(schema)
+
+    def has_schema(self, analyzer_id: str) -> bool:
+        return analyzer_id in self._schema_hashes
+
+    def make_key(self, analyzer_id: str, api_version: str, content_id: str) -> Optional[str]:
+        """
+        :return: The cache key, or None if the schema of the analyzer is not registered.
+        """
+        schema_hash = self._schema_hashes.get(analyzer_id)
+        if schema_hash is None:
+            return None
+        key_source = "|".join([analyzer_id, schema_hash, api_version, content_id])
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        :return: The cached result, or None if there is no valid entry.
+        """
+        content = self.backend.get(key)
+        if content is None:
+            return None
+
+        stored_at, result = self._decode(content)
+        if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+            self.backend.delete(key)
+            return None
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        content = json.dumps({"stored_at": time.time(), "result": result})
+        self.backend.put(key, content.encode("utf-8"))
+
+    def _decode(self, content: bytes) -> Tuple[float, Dict[str, Any]]:
+        entry = json.loads(content)
+        return entry["stored_at"], entry["result"]
@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# The scope of Microsoft Entra ID tokens for Azure AI services, Content Understanding included
+COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
+
+# Refresh tokens this long before they expire
+REFRESH_MARGIN_SECONDS = 5 * 60
+
+_providers: Dict[Tuple[int, str], "CachedTokenProvider"] = {}
+_providers_lock = threading.Lock()
+_default_credential = None
+
+
+class CachedTokenProvider:
+    """
+    Returns a bearer token for a scope, getting a new one from the credential only when needed.
+
+    The token is kept until shortly before it expires, so a request costs a clock check
+    instead of a walk through the credential chain (which for some credentials, like the
+    Azure CLI, starts a process). Once the token is due for refresh but still valid, callers
+    keep getting it while one background thread fetches the next, so nobody waits and a long
+    run never sends an expired token. Only when there is no valid token at all does a caller
+    wait, and then only one of them asks the credential.
+
+    It is a plain callable, so it can be passed as the `token_provider` of any client.
+    Instances are thread-safe; use get_token_provider to share one per credential and scope.
+    """
+
+    def __init__(self, credential, scope: str = COGNITIVE_SERVICES_SCOPE, refresh_margin_seconds: float = REFRESH_MARGIN_SECONDS):
+        """
+        :param credential: An azure.identity credential, e.g. DefaultAzureCredential().
+        :param scope: The scope to get tokens for.
+        :param refresh_margin_seconds: How long before its expiry a token is refreshed,
+            unless the credential says when to refresh it.
+        """
+        self.credential = credential
+        self.scope = scope
+        self.refresh_margin_seconds = refresh_margin_seconds
+        # Held while callers without a valid token wait for one, so only one of them asks the credential
+        self._lock = threading.Lock()
+        # Guards _refreshing and publishing _cached; never held while the credential is called
+        self._state_lock = threading.Lock()
+        # (token, expires on, refresh on), replaced as a whole so that callers that do not
+        # take a lock never pair a token with the times of another
+        self._cached: Optional[Tuple[str, float, float]] = None
+        self._refreshing = False
+
+    def __call__(self) -> str:
+        """
+        :return: A token that is valid for at least a few more seconds.
+        :raises ClientAuthenticationError: If there is no valid token and the credential cannot get one.
+        """
+        now = time.time()
+        cached = self._cached
+        # Leave a little time for the request to reach the service
+        if cached is not None and now < cached[1] - 30:
+            token, _, refresh_on = cached
+            if now >= refresh_on:
+                self._start_background_refresh()
+            return token
+
+        with self._lock:
+            cached = self._cached
+            if cached is None or time.time() >= cached[1] - 30:
+                cached = self._publish(self._fetch())
+            return cached[0]
+
+    def _start_background_refresh(self) -> None:
+        with self._state_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="TokenRefresh", daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            # No lock is held meanwhile, so callers keep getting the current token
+            self._publish(self._fetch())
+        except Exception as e:
+            # The current token is still valid; the next call tries again
+            logger.warning(f"Failed to refresh the token for {self.scope}", exc_info=e)
+        finally:
+            with self._state_lock:
+                self._refreshing = False
+
+    def _publish(self, cached: Tuple[str, float, float]) -> Tuple[str, float, float]:
+        """
+        Make a new token the current one, unless a token that lives longer was published meanwhile.
+
+        :return: The current token, when it expires and when to refresh it.
+        """
+        with self._state_lock:
+            if self._cached is None or cached[1] >= self._cached[1]:
+                self._cached = cached
+            return self._cached
+
+    def _fetch(self) -> Tuple[str, float, float]:
+        """
+        Get a new token from the credential.
+
+        :return: The new token, when it expires and when to refresh it.
+        """
+        get_token_info = getattr(self.credential, "get_token_info", None)
+        if get_token_info is not None:
+            access_token: Any = get_token_info(self.scope)
+            refresh_on = getattr(access_token, "refresh_on", None)
+        else:
+            access_token = self.credential.get_token(self.scope)
+            refresh_on = None
+        expires_on = float(access_token.expires_on)
+        refresh_on = float(refresh_on) if refresh_on else expires_on - self.refresh_margin_seconds
+        now = time.time()
+        if refresh_on <= now:
+            # A token that lives shorter than the margin is refreshed halfway through its life
+            refresh_on = now + (expires_on - now) / 2
+        logger.info(f"Got a token for {self.scope}, valid for {expires_on - now:.0f}s")
+        return access_token.token, expires_on, refresh_on
+
+
+def get_token_provider(credential=None, scope: str = COGNITIVE_SERVICES_SCOPE) -> CachedTokenProvider:
+    """
+    Get the token provider of a credential and scope, shared by all clients and threads of the process.
+
+    :param credential: An azure.identity credential. Defaults to one DefaultAzureCredential for the process.
+    :param scope: The scope to get tokens for.
+    """
+    global _default_credential
+
+    with _providers_lock:
+        if credential is None:
+            if _default_credential is None:
+                # Imported here so that subscription-key users do not need azure-identity
+                from azure.identity import DefaultAzureCredential
+
+                _default_credential = DefaultAzureCredential()
+            credential = _default_credential
+        key = (id(credential), scope)
+        provider = _providers.get(key)
+        if provider is None or provider.credential is not credential:
+            provider = CachedTokenProvider(credential, scope)
+            _providers[key] = provider
+        return provider
@@ -0,0 +1,206 @@
+import hashlib
+import io
+import mmap
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Callable, Optional
+
+# Default for the most bytes an upload holds in memory at once
+UPLOAD_BUFFER_BYTES = 1024 * 1024
+
+
+class UploadStream(io.RawIOBase):
+    """
+    Read-only, seekable request body that sends a file without holding it in memory.
+
+    A local file is memory-mapped and read straight from the page cache; pages already sent
+    are released again, so a multi-gigabyte video does not end up in the process's RSS.
+    A stream that cannot be rewound is first spooled to a temporary file, which stays in
+    memory only while it is smaller than the buffer (see `spool`).
+
+    No read returns more than `buffer_size` bytes, so an upload holds about one buffer at once
+    (two while a stream is spooled). The stream reports its length, so `requests`
+    sends it with a Content-Length in pieces as it reads them, and it can be rewound to send
+    it again after a failed attempt.
+
+    Usage:
+        with UploadStream.from_file("video.mp4", progress=print_progress) as body:
+            client.begin_analyze(analyzer_id, "video.mp4", body)
+    """
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        size: int,
+        buffer_size: int = UPLOAD_BUFFER_BYTES,
+        progress: Optional[Callable[[int, int], None]] = None,
+        name: str = "",
+    ):
+        """
+        Use `from_file` or `spool` rather than creating an instance directly.
+
+        :param file: A seekable binary file the content is read from. Closed with the stream.
+        :param size: The number of bytes to send.
+        :param buffer_size: The most bytes read at once.
+        :param progress: Called with (bytes sent, total bytes) after every `buffer_size` bytes and at the end.
+        :param name: Identifies the upload, e.g. the path of the file.
+        """
+        super().__init__()
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+
+        self.name = name
+        self.size = size
+        self.buffer_size = buffer_size
+        self.progress = progress
+        self._file = file
+        self._map: Optional[mmap.mmap] = None
+        self._position = 0
+        self._reported = 0
+        # Where the pages not yet released start
+        self._released = 0
+
+    @classmethod
+    def from_file(
+        cls,
+        path: str,
+        buffer_size: int = UPLOAD_BUFFER_BYTES,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> "UploadStream":
+        """
+        Upload a local file, read through a memory map.
+        """
+        file = open(path, "rb")
+        try:
+            size = os.fstat(file.fileno()).st_size
+            stream = cls(file, size, buffer_size, progress, name=path)
+            # Empty files cannot be mapped; they are read like any other file
+            if size:
+                stream._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                if hasattr(stream._map, "madvise"):
+                    stream._map.madvise(mmap.MADV_SEQUENTIAL)
+        except BaseException:
+            file.close()
+            raise
+        return stream
+
+    @classmethod
+    def spool(
+        cls,
+        stream: BinaryIO,
+        buffer_size: int = UPLOAD_BUFFER_BYTES,
+        progress: Optional[Callable[[int, int], None]] = None,
+        directory: Optional[str] = None,
+    ) -> "UploadStream":
+        """
+        Upload what is left of a stream that cannot be rewound or does not know its length,
+        e.g. a pipe or a network download. The stream is read to its end first, `buffer_size`
+        bytes at a time, into a temporary file that stays in memory only if it fits in the buffer.
+
+        :param directory: Where the temporary file goes. Defaults to the system's temporary directory.
+        """
+        spooled = tempfile.SpooledTemporaryFile(max_size=buffer_size, dir=directory)
+        try:
+            first = stream.read(buffer_size) or b""
+            second = stream.read(buffer_size) or b"" if first else b""
+            if second:
+                # Going to disk before anything is written spares copying the buffer over later
+                spooled.rollover()
+            spooled.write(first)
+            spooled.write(second)
+            del first, second
+            shutil.copyfileobj(stream, spooled, buffer_size)
+            size = spooled.tell()
+            spooled.seek(0)
+        except BaseException:
+            spooled.close()
+            raise
+        return cls(spooled, size, buffer_size, progress, name=getattr(stream, "name", ""))
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._position = offset
+        self._reported = min(self._reported, offset)
+        self._released = min(self._released, offset - offset % mmap.PAGESIZE)
+        if self._map is None:
+            self._file.seek(offset)
+        return self._position
+
+    def __len__(self) -> int:
+        return self.size
+
+    def readinto(self, buffer) -> int:
+        count = max(0, min(len(buffer), self.buffer_size, self.size - self._position))
+        if not count:
+            return 0
+
+        if self._map is not None:
+            with memoryview(self._map) as content:
+                buffer[:count] = content[self._position:self._position + count]
+        else:
+            data = self._file.read(count)
+            count = len(data)
+            buffer[:count] = data
+        self._position += count
+        if self._position - self._released >= self.buffer_size:
+            self._release()
+        if self.progress is not None and (
+            self._position - self._reported >= self.buffer_size or self._position == self.size
+        ):
+            self._reported = self._position
+            self.progress(self._position, self.size)
+        return count
+
+    def sha256(self) -> str:
+        """
+        The SHA-256 of the content as a hex string, e.g. to look it up in a result cache.
+        The position is kept, and no progress is reported, since nothing is sent.
+        """
+        digest = hashlib.sha256()
+        if self._map is not None:
+            released = 0
+            with memoryview(self._map) as content:
+                for start in range(0, self.size, self.buffer_size):
+                    digest.update(content[start:start + self.buffer_size])
+                    end = min(start + self.buffer_size, self.size)
+                    end -= end % mmap.PAGESIZE
+                    if end > released and hasattr(mmap, "MADV_DONTNEED"):
+                        self._map.madvise(mmap.MADV_DONTNEED, released, end - released)
+                        released = end
+        else:
+            self._file.seek(0)
+            for chunk in iter(lambda: self._file.read(self.buffer_size), b""):
+                digest.update(chunk)
+            self._file.seek(self._position)
+        return digest.hexdigest()
+
+    def close(self) -> None:
+        if not self.closed:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+        super().close()
+
+    def _release(self) -> None:
+        # Drop the pages already sent from the process; the page cache keeps them if
+        # the stream is rewound
+        end = self._position - self._position % mmap.PAGESIZE
+        if self._map is not None and end > self._released and hasattr(mmap, "MADV_DONTNEED"):
+            self._map.madvise(mmap.MADV_DONTNEED, self._released, end - self._released)
+        self._released = end
@@ -0,0 +1,310 @@
+import csv
+import logging
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from AnalysisResult import iter_contents
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient, PollingStrategy
+
+logger = logging.getLogger(__name__)
+
+# How the values of a field found in several segments are combined
+FIRST = "first"
+LAST = "last"
+CONCAT = "concat"
+MAX_CONFIDENCE = "max_confidence"
+MERGE = "merge"
+
+
+@dataclass
+class VideoSegment:
+    """
+    A part of a video, as a file of its own.
+    """
+    path: str
+    start_seconds: float
+    end_seconds: float
+
+
+def probe_duration(video_path: str, ffprobe: str = "ffprobe") -> float:
+    """
+    :return: The duration of the video in seconds.
+    """
+    completed = subprocess.run(
+        [
+            ffprobe, "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            video_path,
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(completed.stdout.strip())
+
+
+def split_video(video_path: str, segment_seconds: float, output_dir: str, ffmpeg: str = "ffmpeg") -> List[VideoSegment]:
+    """
+    Split a video into segments of about `segment_seconds`, without re-encoding.
+
+    Streams are copied, so cuts fall on the keyframe at or after each boundary and the
+    segments may be slightly longer; their actual start and end times are returned.
+
+    :param video_path: The video to split.
+    :param segment_seconds: The target length of each segment.
+    :param output_dir: Where the segment files are written.
+    :return: The segments, in order.
+    """
+    extension = os.path.splitext(video_path)[1] or ".mp4"
+    segment_list = os.path.join(output_dir, "segments.csv")
+    subprocess.run(
+        [
+            ffmpeg, "-hide_banner", "-loglevel", "error",
+            "-i", video_path,
+            "-map", "0", "-c", "copy",
+            "-f", "segment",
+            "-segment_time", str(segment_seconds),
+            "-reset_timestamps", "1",
+            "-segment_list", segment_list,
+            "-segment_list_type", "csv",
+            os.path.join(output_dir, f"segment-%04d{extension}"),
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+    segments = []
+    with open(segment_list, "r", newline="") as file:
+        for file_name, start, end in csv.reader(file):
+            segments.append(VideoSegment(os.path.join(output_dir, file_name), float(start), float(end)))
+    return segments
+
+
+def _is_empty(field: Optional[Dict[str, Any]]) -> bool:
+    if not field:
+        return True
+    values = [value for key, value in field.items() if key.startswith("value")]
+    return not values or all(value in (None, "", [], {}) for value in values)
+
+
+def _resolve(field_schema: Dict[str, Any], definitions: Dict[str, Any]) -> Dict[str, Any]:
+    reference = field_schema.get("$ref")
+    if reference:
+        return definitions.get(reference.rsplit("/", 1)[-1], {})
+    return field_schema
+
+
+def _default_reduction(field_schema: Dict[str, Any]) -> str:
+    field_type = field_schema.get("type")
+    if field_type == "array":
+        return CONCAT
+    if field_type == "object":
+        return MERGE
+    # Later segments show the final state of the session, e.g. the button the order was placed with
+    return LAST
+
+
+def _reduce_field(
+    field_schema: Dict[str, Any],
+    fields: List[Dict[str, Any]],
+    reduction: str,
+    definitions: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    present = [field for field in fields if not _is_empty(field)]
+    if not present:
+        return fields[-1] if fields else None
+
+    if reduction == FIRST:
+        return present[0]
+    if reduction == LAST:
+        return present[-1]
+    if reduction == MAX_CONFIDENCE:
+        # Ties go to the later segment
+        return max(reversed(present), key=lambda field: field.get("confidence") or 0.0)
+    if reduction == CONCAT:
+        items = [item for field in present for item in field.get("valueArray") or ()]
+        return dict(present[-1], valueArray=items)
+    if reduction == MERGE:
+        properties = field_schema.get("properties") or {}
+        names = list(properties) + [
+            name for field in present for name in field.get("valueObject") or {}
+            if name not in properties
+        ]
+        merged = {}
+        for name in dict.fromkeys(names):
+            property_schema = _resolve(properties.get(name, {}), definitions)
+            property_fields = [
+                field["valueObject"][name] for field in present
+                if name in (field.get("valueObject") or {})
+            ]
+            value = _reduce_field(property_schema, property_fields, _default_reduction(property_schema), definitions)
+            if value is not None:
+                merged[name] = value
+        return dict(present[-1], valueObject=merged)
+    raise ValueError(f"Unknown reduction: {reduction}")
+
+
+def merge_segment_fields(
+    analyzer: Dict[str, Any],
+    segment_fields: List[Dict[str, Dict[str, Any]]],
+    reductions: Optional[Dict[str, str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Combine the fields extracted from each segment into the fields of the whole video.
+
+    By default, arrays are concatenated in segment order, objects are merged property by
+    property, and every other field takes its last non-empty value.
+
+    :param analyzer: The analyzer definition, or just its fieldSchema.
+    :param segment_fields: The fields of each segment's contents, in order.
+    :param reductions: The reduction (first, last, concat, max_confidence or merge) of
+        specific top-level fields, overriding the default for their type.
+    """
+    field_schema = analyzer.get("fieldSchema", analyzer)
+    definitions = field_schema.get("definitions") or {}
+    schema_fields = field_schema.get("fields") or {}
+    reductions = reductions or {}
+
+    names = list(schema_fields) + [name for fields in segment_fields for name in fields]
+    merged = {}
+    for name in dict.fromkeys(names):
+        schema = _resolve(schema_fields.get(name, {}), definitions)
+        fields = [fields[name] for fields in segment_fields if name in fields]
+        value = _reduce_field(schema, fields, reductions.get(name) or _default_reduction(schema), definitions)
+        if value is not None:
+            merged[name] = value
+    return merged
+
+
+def merge_segment_results(
+    analyzer: Dict[str, Any],
+    segments: List[VideoSegment],
+    results: List[Dict[str, Any]],
+    reductions: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Combine the analysis results of the segments of a video into one result.
+
+    The merged result has a single content spanning the whole video with the merged fields,
+    so it reads like the result of analyzing the video in one go. The segments' own contents,
+    with times relative to the whole video, are kept under result.segmentContents.
+    """
+    segment_fields = []
+    segment_contents = []
+    for segment, result in zip(segments, results):
+        offset_ms = int(segment.start_seconds * 1000)
+        for content in iter_contents(result):
+            segment_fields.append(content.get("fields") or {})
+            content = dict(content)
+            for key in ("startTimeMs", "endTimeMs"):
+                if key in content:
+                    content[key] += offset_ms
+            segment_contents.append(content)
+
+    merged_content = {
+        "kind": "audioVisual",
+        "startTimeMs": int(segments[0].start_seconds * 1000) if segments else 0,
+        "endTimeMs": int(segments[-1].end_seconds * 1000) if segments else 0,
+        "fields": merge_segment_fields(analyzer, segment_fields, reductions),
+    }
+    return {
+        "status": "Succeeded",
+        "result": {"contents": [merged_content], "segmentContents": segment_contents},
+    }
+
+
+class SegmentedVideoAnalyzer:
+    """
+    Analyzes long videos by splitting them into segments that are analyzed concurrently.
+
+    The service takes time in proportion to the length of a video, so analyzing N segments
+    at once returns in roughly 1/N of the time. The segment fields are then merged using the
+    analyzer schema (see merge_segment_fields). Videos no longer than one segment are
+    submitted as they are. Splitting needs ffmpeg and ffprobe on the PATH.
+    """
+
+    def __init__(
+        self,
+        client: AzureContentUnderstandingClient,
+        analyzer_id: str,
+        analyzer: Dict[str, Any],
+        segment_seconds: float = 5 * 60,
+        max_workers: int = 4,
+        timeout_seconds: int = 30 * 60,
+        polling_strategy: Optional[PollingStrategy] = None,
+        reductions: Optional[Dict[str, str]] = None,
+        ffmpeg: str = "ffmpeg",
+        ffprobe: str = "ffprobe",
+    ):
+        """
+        :param client: The Content Understanding client. Its pool_maxsize should be at least max_workers.
+        :param analyzer_id: The analyzer to run on each segment.
+        :param analyzer: The analyzer definition, used to merge the segment fields.
+        :param segment_seconds: The target length of each segment.
+        :param max_workers: The number of segments analyzed at once.
+        :param timeout_seconds: How long to wait for a single segment's result.
+        :param polling_strategy: How to poll each segment's result.
+        :param reductions: Reductions of specific fields, see merge_segment_fields.
+        :param ffmpeg: The ffmpeg executable.
+        :param ffprobe: The ffprobe executable.
+        """
+        if segment_seconds <= 0:
+            raise ValueError("segment_seconds must be positive")
+
+        self.client = client
+        self.analyzer_id = analyzer_id
+        self.analyzer = analyzer
+        self.segment_seconds = segment_seconds
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self.polling_strategy = polling_strategy
+        self.reductions = reductions
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+
+    def analyze(self, video_path: str, job_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyze a local video file.
+
+        :param video_path: The video to analyze.
+        :param job_key: Identifies the video in the client's job journal; each segment is journaled as "{job_key}#{index}".
+        :return: The merged result, shaped like a single analysis result.
+        """
+        duration = probe_duration(video_path, self.ffprobe)
+        if duration <= self.segment_seconds:
+            segment = VideoSegment(video_path, 0.0, duration)
+            return merge_segment_results(
+                self.analyzer, [segment], [self._analyze_segment(segment, job_key)], self.reductions
+            )
+
+        with tempfile.TemporaryDirectory(prefix="segments-") as output_dir:
+            segments = split_video(video_path, self.segment_seconds, output_dir, self.ffmpeg)
+            logger.info(f"Analyzing {video_path} ({duration:.0f}s) as {len(segments)} segments")
+            return self.analyze_segments(segments, job_key)
+
+    def analyze_segments(self, segments: List[VideoSegment], job_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyze a video that is already split into segment files, e.g. by split_video.
+
+        :param segments: The segments of the video, in order.
+        :param job_key: Identifies the video in the client's job journal; each segment is journaled as "{job_key}#{index}".
+        :return: The merged result, shaped like a single analysis result.
+        """
+        job_keys = [f"{job_key}#{index}" if job_key else None for index in range(len(segments))]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._analyze_segment, segments, job_keys))
+        return merge_segment_results(self.analyzer, segments, results, self.reductions)
+
+    def _analyze_segment(self, segment: VideoSegment, job_key: Optional[str]) -> Dict[str, Any]:
+        with open(segment.path, "rb") as file:
+            response = self.client.begin_analyze(self.analyzer_id, segment.path, file, job_key=job_key)
+        return self.client.poll_result(
+            response,
+            timeout_seconds=self.timeout_seconds,
+            polling_strategy=self.polling_strategy,
+        )
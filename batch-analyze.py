@@ -0,0 +1,100 @@
+from dotenv import load_dotenv
+import json
+import logging
+import os
+import sys
+
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient
+from BatchAnalysisRunner import BatchAnalysisRunner, REPLAY_CSV_HEADER, REPLAY_CSV_PREFIX
+from BlobStorageUtils import BlobStorageUtils
+from CommonUtils import CsvBlobWriter
+from JobJournal import JobJournal
+from OperationPoller import OperationPoller
+from RateLimiter import RateLimiter
+from TokenProvider import get_token_provider
+from VideoSegmentation import SegmentedVideoAnalyzer
+
+
+def main():
+
+    logging.basicConfig(level=logging.INFO)
+
+    # Get config settings
+    load_dotenv()
+    container = os.getenv("BLOB_CONTAINER_NAME")
+    blob_name_input = os.getenv("BLOB_NAME_INPUT")
+    blob_name_output = os.getenv("BLOB_NAME_OUTPUT")
+    conn_str = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+    endpoint = os.getenv('ENDPOINT')
+    key = os.getenv('KEY')
+    analyzer = os.getenv('ANALYZER_NAME')
+    version = os.getenv('API_VERSION')
+    max_uploads = int(os.getenv('MAX_UPLOADS', '4'))
+    max_polls = int(os.getenv('MAX_POLLS', '32'))
+    # Threads sending the GETs of the results being polled
+    poll_workers = int(os.getenv('POLL_WORKERS', '4'))
+    job_journal_file = os.getenv('JOB_JOURNAL', 'analysis-jobs.jsonl')
+    # Split videos longer than this many seconds and analyze the segments concurrently
+    segment_seconds = float(os.getenv('SEGMENT_SECONDS', '0'))
+    segment_workers = int(os.getenv('SEGMENT_WORKERS', '4'))
+    schema_file = os.getenv('ANALYZER_SCHEMA', 'qm_video_schema_2.0.json')
+    # Stay under the resource's quota; unlimited when not set
+    submits_per_second = float(os.getenv('SUBMITS_PER_SECOND', '0')) or None
+    polls_per_second = float(os.getenv('POLLS_PER_SECOND', '0')) or None
+    # Log the queue depths and timings of the pipeline stages this often
+    stage_report_seconds = float(os.getenv('STAGE_REPORT_SECONDS', '60')) or None
+
+    # Analyze everything under the given prefix (default: the input folder)
+    prefix = sys.argv[1] if len(sys.argv) > 1 else blob_name_input
+
+    blob_utils = BlobStorageUtils(connection_string=conn_str, container_name=container)
+    # Videos still being analyzed when a previous run died are picked up, not re-uploaded
+    job_journal = JobJournal(job_journal_file)
+    client = AzureContentUnderstandingClient(
+        endpoint,
+        version,
+        subscription_key=key,
+        # Without a key, authenticate with DefaultAzureCredential; tokens are refreshed before they expire
+        token_provider=None if key else get_token_provider(),
+        pool_maxsize=max_uploads * segment_workers + poll_workers,
+        job_journal=job_journal,
+        rate_limiter=RateLimiter(submits_per_second, polls_per_second),
+    )
+
+    segmenter = None
+    if segment_seconds > 0:
+        with open(schema_file, "r") as file:
+            analyzer_schema = json.load(file)
+        segmenter = SegmentedVideoAnalyzer(
+            client,
+            analyzer,
+            analyzer_schema,
+            segment_seconds=segment_seconds,
+            max_workers=segment_workers,
+        )
+
+    # One scheduler polls all submitted videos; the client's rate limiter keeps them within the poll budget
+    poller = OperationPoller(client, max_workers=poll_workers)
+
+    with job_journal, client, poller, CsvBlobWriter(blob_utils, blob_name_output, REPLAY_CSV_PREFIX, REPLAY_CSV_HEADER) as csv_writer:
+        runner = BatchAnalysisRunner(
+            blob_utils,
+            client,
+            analyzer,
+            csv_writer,
+            max_uploads=max_uploads,
+            max_polls=max_polls,
+            segmenter=segmenter,
+            stage_report_seconds=stage_report_seconds,
+            poller=poller,
+        )
+        report = runner.run(prefix)
+
+    print(report)
+    print(report.format_stages())
+    for blob_name in report.failed:
+        print(f"Failed: {blob_name}")
+
+
+if __name__ == "__main__":
+    main()
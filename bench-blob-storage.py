@@ -0,0 +1,187 @@
+import argparse
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from BlobStorageBackends import CountingBackend, InMemoryBackend, LocalFileSystemBackend
+from BlobStorageUtils import BlobStorageUtils
+from CommonUtils import CommonUtils
+
+MB = 1024 * 1024
+
+
+def bench_append(blob_utils: BlobStorageUtils, row_bytes: int, checkpoints_mb: list) -> None:
+    # Appends should cost the same whatever the size of the file they go to
+    row = io.BytesIO(b"x" * (row_bytes - 1) + b"\n")
+    size = 0
+    for checkpoint in checkpoints_mb:
+        while size < checkpoint * MB:
+            row.seek(0)
+            blob_utils.append("bench/append.csv", row)
+            size += row_bytes
+        start = time.perf_counter()
+        for _ in range(200):
+            row.seek(0)
+            blob_utils.append("bench/append.csv", row)
+        size += 200 * row_bytes
+        print(f"  append {row_bytes} B at {checkpoint:5d} MB    {(time.perf_counter() - start) / 200 * 1e6:8.1f} us/append")
+
+
+def bench_large_read(blob_utils: BlobStorageUtils, size_mb: int) -> None:
+    chunk = os.urandom(MB)
+    blob_utils.write("bench/large.bin", io.BytesIO(chunk * size_mb))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    content = blob_utils.read("bench/large.bin")
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del content
+    print(f"  read()         {size_mb:5d} MB    {size_mb / elapsed:8.1f} MB/s   peak {peak / MB:8.1f} MB")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with blob_utils.read_stream("bench/large.bin", chunk_size=4 * MB) as stream:
+        for _ in stream.chunks():
+            pass
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  read_stream()  {size_mb:5d} MB    {size_mb / elapsed:8.1f} MB/s   peak {peak / MB:8.1f} MB")
+
+
+def bench_listing(blob_utils: BlobStorageUtils, blobs: int) -> None:
+    for index in range(blobs):
+        blob_utils.write(f"bench/list/{index % 20:02d}/{index:06d}.mp4", io.BytesIO(b"v"))
+
+    start = time.perf_counter()
+    names = blob_utils.list_names("bench/list/")
+    elapsed = time.perf_counter() - start
+    print(f"  list_names     {len(names):7d} blobs   {len(names) / elapsed:10.0f} blobs/s")
+
+    start = time.perf_counter()
+    blobs = blob_utils.list_blobs("bench/list/", suffix=".mp4", page_size=500)
+    next(blobs)
+    print(f"  list_blobs     first blob after {(time.perf_counter() - start) * 1000:8.2f} ms (pages of 500)")
+
+    start = time.perf_counter()
+    names = blob_utils.list_names("bench/list/07/")
+    elapsed = time.perf_counter() - start
+    print(f"  list_names     {len(names):7d} blobs   {len(names) / elapsed:10.0f} blobs/s (one folder)")
+
+
+def bench_bulk_transfer(blob_utils: BlobStorageUtils, local_dir: str, files: int, file_mb: int, workers: list) -> None:
+    source_dir = os.path.join(local_dir, "upload")
+    os.makedirs(source_dir, exist_ok=True)
+    chunk = os.urandom(MB)
+    for index in range(files):
+        with open(os.path.join(source_dir, f"video-{index:04d}.mp4"), "wb") as file:
+            for _ in range(file_mb):
+                file.write(chunk)
+
+    for max_workers in workers:
+        uploads = {
+            os.path.join(source_dir, f"video-{index:04d}.mp4"): f"bench/bulk/video-{index:04d}.mp4"
+            for index in range(files)
+        }
+        tracemalloc.start()
+        report = blob_utils.upload_many(uploads.items(), max_workers=max_workers, max_concurrency=4)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  upload_many    {max_workers:3d} workers   {report.megabytes_per_second:8.1f} MB/s   peak {peak / MB:8.1f} MB")
+
+        downloads = {
+            path: os.path.join(local_dir, "download", os.path.basename(path))
+            for path in uploads.values()
+        }
+        tracemalloc.start()
+        report = blob_utils.download_many(downloads.items(), max_workers=max_workers, max_concurrency=4, chunk_size=MB)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  download_many  {max_workers:3d} workers   {report.megabytes_per_second:8.1f} MB/s   peak {peak / MB:8.1f} MB")
+        assert not report.failed, f"Failed downloads: {report.failed}"
+
+
+def count_calls(name: str, backend: CountingBackend, operation) -> None:
+    backend.reset_stats()
+    operation()
+    calls = dict(backend.stats)
+    total = calls.pop("total", 0)
+    detail = ", ".join(f"{operation_name} {count}" for operation_name, count in sorted(calls.items()))
+    print(f"  {name:<34} {total:3d} calls   ({detail})")
+
+
+def bench_storage_calls() -> None:
+    # The number of storage requests each operation costs; with Azure, each is a network round trip.
+    # tests/test_blob_storage_utils.py checks the counts that must not grow
+    backend = CountingBackend(InMemoryBackend())
+    blob_utils = BlobStorageUtils(backend=backend)
+    blob_utils.write("videos/video-1.mp4", io.BytesIO(b"v" * 1024))
+    header = "File Name,Cart Number,Payment Method"
+
+    def read_video_stream() -> None:
+        with CommonUtils.read_video_to_stream(blob_utils, "videos/", "video-1.mp4") as stream:
+            stream.read()
+
+    count_calls(
+        "CSV row, new file", backend,
+        lambda: CommonUtils.write_csv_to_blob(blob_utils, "calls/", "report", header, "a.mp4,1,card"),
+    )
+    count_calls(
+        "CSV row, existing file", backend,
+        lambda: CommonUtils.write_csv_to_blob(blob_utils, "calls/", "report", header, "b.mp4,2,card"),
+    )
+    count_calls(
+        "read_video_to_bytes", backend,
+        lambda: CommonUtils.read_video_to_bytes(blob_utils, "videos/", "video-1.mp4"),
+    )
+    count_calls(
+        "read_video_to_bytes, missing blob", backend,
+        lambda: CommonUtils.read_video_to_bytes(blob_utils, "videos/", "missing.mp4"),
+    )
+    count_calls(
+        "read_video_to_stream, unlisted", backend,
+        read_video_stream,
+    )
+    list(blob_utils.list_blobs("videos/"))
+    count_calls(
+        "read_video_to_stream, just listed", backend,
+        read_video_stream,
+    )
+    count_calls("exists, just listed", backend, lambda: blob_utils.exists("videos/video-1.mp4"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blob I/O benchmarks on the offline storage backends.")
+    parser.add_argument("--append-mb", type=int, nargs="+", default=[1, 16, 64], help="file sizes to measure appends at")
+    parser.add_argument("--row-bytes", type=int, default=256, help="size of each appended row")
+    parser.add_argument("--read-mb", type=int, default=128, help="size of the blob read whole and streamed")
+    parser.add_argument("--blobs", type=int, default=10000, help="blobs to list")
+    parser.add_argument("--files", type=int, default=16, help="files moved by upload_many and download_many")
+    parser.add_argument("--file-mb", type=int, default=16, help="size of each of those files")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8], help="worker counts for the bulk transfers")
+    args = parser.parse_args()
+
+    print("storage calls per operation")
+    bench_storage_calls()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        backends = {
+            "in-memory": InMemoryBackend(),
+            "local filesystem": LocalFileSystemBackend(temp_dir),
+        }
+        for name, backend in backends.items():
+            blob_utils = BlobStorageUtils(backend=backend)
+            print(name)
+            bench_append(blob_utils, args.row_bytes, args.append_mb)
+            bench_large_read(blob_utils, args.read_mb)
+            bench_listing(blob_utils, args.blobs)
+            with tempfile.TemporaryDirectory() as local_dir:
+                bench_bulk_transfer(blob_utils, local_dir, args.files, args.file_mb, args.workers)
+
+
+if __name__ == "__main__":
+    main()
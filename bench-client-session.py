@@ -0,0 +1,68 @@
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every poll with a still-running operation, like analyzerResults/{id} does."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, keep-alive
+    # connections stall on Nagle + delayed ACK and the numbers are meaningless
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps({"id": "stub", "status": "Running"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(get, url: str, polls: int) -> list[float]:
+    latencies = []
+    for _ in range(polls):
+        start = time.perf_counter()
+        response = get(url)
+        response.raise_for_status()
+        response.json()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    p99 = latencies_ms[int(len(latencies_ms) * 0.99) - 1]
+    print(f"{name:<28} mean {statistics.mean(latencies_ms):7.3f} ms   p50 {statistics.median(latencies_ms):7.3f} ms   p99 {p99:7.3f} ms")
+
+
+def main():
+    polls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/contentunderstanding/analyzerResults/stub"
+
+    print(f"Per-poll latency over {polls} polls against a local stub server")
+    report("requests.get (new conn)", measure(requests.get, url, polls))
+
+    session = AzureContentUnderstandingClient.create_session()
+    report("pooled session (keep-alive)", measure(session.get, url, polls))
+    session.close()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
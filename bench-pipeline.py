@@ -0,0 +1,229 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient, PollingStrategy
+from BatchAnalysisRunner import REPLAY_CSV_HEADER, REPLAY_CSV_PREFIX, BatchAnalysisRunner
+from BlobStorageBackends import InMemoryBackend
+from BlobStorageUtils import BlobStorageUtils
+from CommonUtils import CsvBlobWriter
+from MockContentUnderstandingServer import MockContentUnderstandingServer, MockServerConfig
+from OperationPoller import OperationPoller
+from RateLimiter import RateLimiter
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+API_VERSION = "2025-05-01-preview"
+
+
+def load_script(file_name: str):
+    # The sample scripts have hyphenated names, so they cannot be imported directly
+    spec = importlib.util.spec_from_file_location(file_name.replace("-", "_")[:-3], os.path.join(REPO_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@dataclass
+class ScenarioReport:
+    name: str
+    latencies: List[float] = field(default_factory=list)
+    failures: int = 0
+    requests: int = 0
+    throttled: int = 0
+    elapsed_seconds: float = 0.0
+
+    def __str__(self) -> str:
+        jobs = len(self.latencies) + self.failures
+        if self.latencies:
+            latencies_ms = sorted(latency * 1000 for latency in self.latencies)
+            p50 = statistics.median(latencies_ms)
+            p99 = latencies_ms[max(int(len(latencies_ms) * 0.99) - 1, 0)]
+        else:
+            p50 = p99 = float("nan")
+        return (
+            f"{self.name:<26} jobs {jobs:5d}  failed {self.failures:4d}  "
+            f"p50 {p50:9.1f} ms  p99 {p99:9.1f} ms  "
+            f"requests/job {self.requests / max(jobs, 1):6.2f}  429s {self.throttled:5d}  "
+            f"jobs/s {jobs / self.elapsed_seconds if self.elapsed_seconds else 0:8.2f}"
+        )
+
+
+def run_scenario(name: str, server: MockContentUnderstandingServer, job: Callable[[int], None], jobs: int, concurrency: int) -> ScenarioReport:
+    report = ScenarioReport(name)
+
+    def timed(index: int) -> None:
+        start = time.perf_counter()
+        try:
+            job(index)
+        except Exception:
+            report.failures += 1
+        else:
+            report.latencies.append(time.perf_counter() - start)
+
+    server.reset_stats()
+    start = time.perf_counter()
+    # The sample scripts print as they go; redirect once, since redirecting per thread races
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(jobs)))
+    report.elapsed_seconds = time.perf_counter() - start
+    report.requests = server.stats["total"]
+    report.throttled = server.stats["throttled"]
+    return report
+
+
+@contextlib.contextmanager
+def count_threads():
+    # Samples the number of live threads; yields a list holding the peak once the block is done
+    peak = [threading.active_count()]
+    stop = threading.Event()
+
+    def sample() -> None:
+        while not stop.wait(0.01):
+            peak[0] = max(peak[0], threading.active_count())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield peak
+    finally:
+        stop.set()
+        sampler.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks against a local mock Content Understanding service.")
+    parser.add_argument("--jobs", type=int, default=50, help="analyses per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="jobs running at once")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to every request")
+    parser.add_argument("--analysis-seconds", type=float, default=0.5, help="how long each analysis runs")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of analyses that fail")
+    parser.add_argument("--contents", type=int, default=1, help="contents per result")
+    parser.add_argument("--markdown-kb", type=int, default=16, help="markdown per content, in KiB")
+    parser.add_argument("--quota-rps", type=int, default=None, help="requests per second the service accepts before answering 429")
+    parser.add_argument("--transient-error-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--submit-rps", type=float, default=None, help="client-side limit on submits per second")
+    parser.add_argument("--poll-rps", type=float, default=None, help="client-side limit on polls per second")
+    parser.add_argument("--max-uploads", type=int, default=4, help="fetch and submit workers of the batch runner")
+    parser.add_argument("--poll-workers", type=int, default=4, help="threads sending the polls of the OperationPoller")
+    args = parser.parse_args()
+
+    config = MockServerConfig(
+        request_latency_seconds=args.latency,
+        analysis_seconds=args.analysis_seconds,
+        analyzer_creation_seconds=args.analysis_seconds,
+        failure_rate=args.failure_rate,
+        contents_per_result=args.contents,
+        markdown_bytes_per_content=args.markdown_kb * 1024,
+        max_requests_per_second=args.quota_rps,
+        transient_error_rate=args.transient_error_rate,
+        seed=0,
+    )
+    # One limiter shared by every scenario's requests, as a worker process would
+    rate_limiter = RateLimiter(args.submit_rps, args.poll_rps)
+    with open(os.path.join(REPO_DIR, "biz-card.json"), "r") as file:
+        card_schema = json.load(file)
+    with open(os.path.join(REPO_DIR, "biz-card-1.png"), "rb") as file:
+        card_image = file.read()
+
+    create_analyzer_script = load_script("1-create-analyzer.py")
+    read_card_script = load_script("read-card.py")
+    polling = PollingStrategy(initial_delay_seconds=0.1, interval_seconds=0.1, max_interval_seconds=1.0)
+
+    print(
+        f"{args.jobs} jobs per scenario, {args.concurrency} at a time; each analysis takes "
+        f"{args.analysis_seconds}s, each request {args.latency * 1000:.0f} ms, failure rate {args.failure_rate}, "
+        f"quota {args.quota_rps or 'unlimited'} requests/s, 503 rate {args.transient_error_rate}"
+    )
+    with MockContentUnderstandingServer(config) as server:
+        with AzureContentUnderstandingClient(
+            server.url,
+            API_VERSION,
+            subscription_key="mock",
+            pool_maxsize=args.concurrency + args.max_uploads,
+            rate_limiter=rate_limiter,
+        ) as client:
+            client.deploy_analyzer("biz-card", card_schema, polling_strategy=polling)
+
+            def analyze(index: int) -> None:
+                response = client.begin_analyze("biz-card", "biz-card-1.png", card_image)
+                client.poll_result(response, polling_strategy=polling)
+
+            print(run_scenario("client analyze + poll", server, analyze, args.jobs, args.concurrency))
+
+            # The batch runner over in-memory blobs, which are streamed since they have no SAS URLs
+            blob_utils = BlobStorageUtils(backend=InMemoryBackend())
+            logging.getLogger("CommonUtils").setLevel(logging.ERROR)
+            for index in range(args.jobs):
+                blob_utils.write(f"videos/{index:05d}-2025-05-13-000000.mp4", io.BytesIO(card_image))
+            # Without a poller, submitted videos also wait in the poll stage's queue (twice its workers);
+            # with one, max_polls bounds all submitted videos, and costs no threads
+            scenarios = [
+                ("batch runner pipeline", None, args.concurrency),
+                (
+                    "batch runner + poller",
+                    OperationPoller(client, polling_strategy=polling, max_workers=args.poll_workers),
+                    3 * args.concurrency,
+                ),
+            ]
+            for name, poller, max_polls in scenarios:
+                server.reset_stats()
+                with count_threads() as peak_threads, CsvBlobWriter(
+                    blob_utils, "reports/", REPLAY_CSV_PREFIX, REPLAY_CSV_HEADER
+                ) as csv_writer:
+                    runner = BatchAnalysisRunner(
+                        blob_utils,
+                        client,
+                        "biz-card",
+                        csv_writer,
+                        max_uploads=args.max_uploads,
+                        max_polls=max_polls,
+                        polling_strategy=polling,
+                        poller=poller,
+                    )
+                    batch_report = runner.run("videos/")
+                if poller is not None:
+                    poller.close()
+                print(
+                    f"{name:<26} {batch_report}, "
+                    f"requests/job {server.stats['total'] / max(batch_report.total, 1):.2f}, "
+                    f"peak threads {peak_threads[0]}"
+                )
+                print(batch_report.format_stages())
+
+        def create_analyzer(index: int) -> None:
+            create_analyzer_script.create_analyzer(
+                json.dumps(card_schema), f"bench-card-{index}", server.url, "mock", API_VERSION
+            )
+
+        print(run_scenario("1-create-analyzer", server, create_analyzer, args.jobs, args.concurrency))
+
+        def analyze_card(index: int) -> None:
+            result = read_card_script.analyze_card(
+                os.path.join(REPO_DIR, "biz-card-1.png"), "biz-card", server.url, "mock", rate_limiter
+            )
+            if result.get("status") != "Succeeded":
+                raise RuntimeError(result.get("error"))
+
+        # analyze_card saves results.json to the working directory
+        previous_dir = os.getcwd()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            os.chdir(temp_dir)
+            try:
+                print(run_scenario("read-card analyze_card", server, analyze_card, args.jobs, args.concurrency))
+            finally:
+                os.chdir(previous_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import io
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from AnalysisResult import ResultParser, StreamingAnalysisResult, get_fields, iter_contents
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient, PollingStrategy
+
+MB = 1024 * 1024
+
+# One field of every type, including an array of objects with a nested array
+ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "Sku": {"type": "string"},
+        "Quantity": {"type": "integer"},
+        "Price": {"type": "number"},
+        "Tags": {"type": "array", "items": {"type": "string"}},
+    },
+}
+
+
+def build_schema(fields_per_content: int) -> dict:
+    fields = {}
+    scalar_types = ["string", "number", "integer", "boolean", "date", "time"]
+    for index in range(fields_per_content):
+        if index % 10 == 9:
+            fields[f"Items{index}"] = {"type": "array", "items": {"$ref": "#/$defs/Item"}}
+        elif index % 10 == 8:
+            fields[f"Address{index}"] = {
+                "type": "object",
+                "properties": {"Street": {"type": "string"}, "City": {"type": "string"}},
+            }
+        else:
+            fields[f"Field{index}"] = {"type": scalar_types[index % len(scalar_types)]}
+    return {"fieldSchema": {"fields": fields, "definitions": {"Item": ITEM_SCHEMA}}}
+
+
+def build_field(field_schema: dict, schema: dict) -> dict:
+    if "$ref" in field_schema:
+        field_schema = schema["fieldSchema"]["definitions"][field_schema["$ref"].rsplit("/", 1)[-1]]
+    field_type = field_schema["type"]
+    if field_type == "array":
+        items = [build_field(field_schema["items"], schema) for _ in range(3)]
+        return {"type": "array", "valueArray": items}
+    if field_type == "object":
+        properties = {
+            name: build_field(property_schema, schema)
+            for name, property_schema in field_schema["properties"].items()
+        }
+        return {"type": "object", "valueObject": properties}
+    values = {
+        "string": ("valueString", "Contoso Ltd."),
+        "number": ("valueNumber", 12.5),
+        "integer": ("valueInteger", 42),
+        "boolean": ("valueBoolean", True),
+        "date": ("valueDate", "2025-05-13"),
+        "time": ("valueTime", "18:21:04"),
+    }
+    value_key, value = values[field_type]
+    return {"type": field_type, value_key: value, "confidence": 0.9}
+
+
+def build_result(schema: dict, contents: int) -> dict:
+    fields = {
+        name: build_field(field_schema, schema)
+        for name, field_schema in schema["fieldSchema"]["fields"].items()
+    }
+    return {
+        "id": "bench",
+        "status": "Succeeded",
+        "result": {"contents": [{"markdown": "", "fields": fields} for _ in range(contents)]},
+    }
+
+
+def parse_round_trip(results: list) -> int:
+    # The old approach: serialize, parse again, then walk the fields
+    count = 0
+    for result in results:
+        data = json.loads(json.dumps(result))
+        for content in data["result"]["contents"]:
+            for field in content["fields"].values():
+                field.get(f"value{field['type'].capitalize()}")
+                count += 1
+    return count
+
+
+def parse_generic(results: list) -> int:
+    count = 0
+    for result in results:
+        for content in result["result"]["contents"]:
+            count += len(get_fields(content))
+    return count
+
+
+def parse_typed(parser: ResultParser, results: list) -> int:
+    return sum(1 for _ in parser.parse_many(results)) * len(parser.record_type.__slots__)
+
+
+def count_fields(result) -> int:
+    # Walks the contents one at a time, so a streamed content can be dropped before the next is parsed
+    return sum(len(get_fields(content)) for content in iter_contents(result))
+
+
+class ResultServer:
+    """Serves one analyzerResults body for every GET, as the service does for a succeeded operation."""
+
+    def __init__(self, body: bytes):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def operation_response(operation_location: str) -> requests.Response:
+    # What begin_analyze returns, for polling an operation that already succeeded
+    response = requests.Response()
+    response.headers["Operation-Location"] = operation_location
+    return response
+
+
+def poll_buffered(client: AzureContentUnderstandingClient, operation_location: str) -> int:
+    response = operation_response(operation_location)
+    return count_fields(client.poll_result(response, polling_strategy=PollingStrategy(initial_delay_seconds=0)))
+
+
+def poll_streamed(client: AzureContentUnderstandingClient, operation_location: str) -> int:
+    response = operation_response(operation_location)
+    with client.poll_result_stream(response, polling_strategy=PollingStrategy(initial_delay_seconds=0)) as result:
+        return count_fields(result)
+
+
+def report_memory(name: str, function, body_bytes: int) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name:<32} {elapsed * 1000:9.1f} ms   peak {peak / MB:6.1f} MB ({peak / body_bytes:5.2f}x the body)")
+
+
+def report(name: str, function, fields: int, repeat: int = 3) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<32} {best * 1000:9.1f} ms   {fields / best / 1e6:6.2f} M fields/s")
+
+
+def main():
+    fields_per_content = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    contents = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    results_count = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    schema = build_schema(fields_per_content)
+    results = [build_result(schema, contents) for _ in range(results_count)]
+    fields = fields_per_content * contents * results_count
+    print(f"{results_count} results x {contents} contents x {fields_per_content} fields = {fields} top-level fields")
+
+    start = time.perf_counter()
+    parser = ResultParser(schema)
+    print(f"{'compile schema':<32} {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+    report("json round trip (raw values)", lambda: parse_round_trip(results), fields)
+    report("get_fields (untyped)", lambda: parse_generic(results), fields)
+    report("ResultParser (typed records)", lambda: parse_typed(parser, results), fields)
+
+    # Memory of reading one result: the body is built before tracing starts, so only parsing counts
+    body = json.dumps(results[0]).encode("utf-8")
+    del results
+    print(f"\none result of {len(body) / MB:.1f} MB, {fields_per_content * contents} top-level fields")
+    report_memory("json.loads", lambda: count_fields(json.loads(body)), len(body))
+    report_memory("StreamingAnalysisResult", lambda: count_fields(StreamingAnalysisResult(io.BytesIO(body))), len(body))
+    with ResultServer(body) as server, AzureContentUnderstandingClient(
+        server.url, "2025-05-01-preview", subscription_key="bench"
+    ) as client:
+        operation_location = f"{server.url}/contentunderstanding/analyzerResults/bench"
+        report_memory("poll_result (HTTP)", lambda: poll_buffered(client, operation_location), len(body))
+        report_memory("poll_result_stream (HTTP)", lambda: poll_streamed(client, operation_location), len(body))
+
+
+if __name__ == "__main__":
+    main()
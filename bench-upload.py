@@ -0,0 +1,164 @@
+import argparse
+import io
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient, RetryPolicy
+from MockContentUnderstandingServer import MockContentUnderstandingServer, MockServerConfig
+from UploadStream import UploadStream
+
+MB = 1024 * 1024
+
+
+class Pipe(io.RawIOBase):
+    """A file that can only be read front to back, like a pipe or a download."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._file = open(path, "rb", buffering=0)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        return self._file.readinto(buffer)
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+class RssSampler:
+    """Samples the resident set size of the process (Linux only), to catch what tracemalloc does not see, like mapped files."""
+
+    def __init__(self):
+        self.peak = self.baseline = self.read()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    @staticmethod
+    def read() -> Optional[int]:
+        try:
+            with open("/proc/self/statm", "r") as file:
+                return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return None
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self) -> None:
+        while self.peak is not None and not self._stop.wait(0.005):
+            self.peak = max(self.peak, self.read())
+
+    @property
+    def growth(self) -> str:
+        if self.peak is None:
+            return "     n/a"
+        return f"{(self.peak - self.baseline) / MB:8.1f}"
+
+
+def bench_uploads(
+    name: str,
+    server: MockContentUnderstandingServer,
+    upload: Callable[[int], None],
+    uploads: int,
+    parallel: int,
+    file_bytes: int,
+    max_peak_bytes: Optional[int] = None,
+) -> None:
+    server.reset_stats()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=parallel) as executor:
+        list(executor.map(upload, range(uploads)))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"  {name:<30} {uploads * file_bytes / MB / elapsed:8.1f} MB/s   "
+        f"peak {peak / MB:8.1f} MB ({peak / parallel / MB:6.1f} MB/upload)   RSS growth {rss.growth} MB"
+    )
+    assert server.bytes_received == uploads * file_bytes, f"{name}: {server.bytes_received} bytes received"
+    if max_peak_bytes is not None:
+        assert peak <= max_peak_bytes, f"{name}: peak {peak / MB:.1f} MB, expected at most {max_peak_bytes / MB:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory used by parallel file uploads to a local mock of the service.")
+    parser.add_argument("--file-mb", type=int, default=64, help="size of each uploaded file")
+    parser.add_argument("--uploads", type=int, default=8, help="files uploaded per scenario")
+    parser.add_argument("--parallel", type=int, default=4, help="uploads running at once")
+    parser.add_argument("--buffer-kb", type=int, nargs="+", default=[256, 1024, 4096], help="upload buffer sizes to measure")
+    args = parser.parse_args()
+
+    file_bytes = args.file_mb * MB
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "video.mp4")
+        chunk = os.urandom(MB)
+        with open(path, "wb") as file:
+            for _ in range(args.file_mb):
+                file.write(chunk)
+        del chunk
+
+        print(f"{args.uploads} uploads of {args.file_mb} MB, {args.parallel} at a time")
+        with MockContentUnderstandingServer(MockServerConfig()) as server:
+            with AzureContentUnderstandingClient(
+                server.url,
+                "2025-05-01-preview",
+                subscription_key="mock",
+                pool_maxsize=args.parallel,
+                retry_policy=RetryPolicy(max_attempts=1),
+            ) as client:
+
+                def upload_bytes(index: int) -> None:
+                    # What the samples used to do: the whole file in memory while it is sent
+                    with open(path, "rb") as file:
+                        data = file.read()
+                    client.begin_analyze("bench", path, data)
+
+                bench_uploads("whole file as bytes", server, upload_bytes, args.uploads, args.parallel, file_bytes)
+
+            for buffer_kb in args.buffer_kb:
+                buffer_bytes = buffer_kb * 1024
+                # An upload holds one buffer, two while it is spooled plus the copy a plain
+                # stream makes of each read; the rest covers connections, threads and the mock server
+                max_peak_bytes = args.parallel * 3 * buffer_bytes + 8 * MB
+                with AzureContentUnderstandingClient(
+                    server.url,
+                    "2025-05-01-preview",
+                    subscription_key="mock",
+                    pool_maxsize=args.parallel,
+                    retry_policy=RetryPolicy(max_attempts=1),
+                    upload_buffer_bytes=buffer_bytes,
+                ) as client:
+
+                    def upload_file(index: int) -> None:
+                        client.begin_analyze("bench", path)
+
+                    def upload_pipe(index: int) -> None:
+                        with Pipe(path) as pipe:
+                            client.begin_analyze("bench", path, pipe)
+
+                    bench_uploads(
+                        f"memory-mapped, {buffer_kb} KiB buffer", server, upload_file,
+                        args.uploads, args.parallel, file_bytes, max_peak_bytes,
+                    )
+                    bench_uploads(
+                        f"spooled pipe, {buffer_kb} KiB buffer", server, upload_pipe,
+                        args.uploads, args.parallel, file_bytes, max_peak_bytes,
+                    )
+
+
+if __name__ == "__main__":
+    main()
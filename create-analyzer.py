@@ -1,9 +1,11 @@
 from dotenv import load_dotenv
 import os
 import sys
-import time
-import requests
 import json
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient
+
+# Give up on an analyzer creation that is still running after this long
+MAX_WAIT_SECONDS = 10 * 60
 
 
 def main():
@@ -37,49 +39,27 @@ def main():
 
 def create_analyzer (schema, analyzer, endpoint, key):
 
-    # Create a Content Understanding analyzer
-    print (f"Creating {analyzer}")
+    # Create or update a Content Understanding analyzer
+    print (f"Deploying {analyzer}")
 
     # Set the API version
     CU_VERSION = "2025-05-01-preview"
 
-    # initiate the analyzer creation operation
-    headers = {
-        "Ocp-Apim-Subscription-Key": key,
-        "Content-Type": "application/json"}
-
-    url = f"{endpoint}/contentunderstanding/analyzers/{analyzer}?api-version={CU_VERSION}"
-
-    # Delete the analyzer if it already exists
-    response = requests.delete(url, headers=headers)
-    print(response.status_code)
-    time.sleep(1)
-
-    # Now create it
-    response = requests.put(url, headers=headers, data=(schema))
-    print(response.status_code)
-
-    # Get the response and extract the callback URL
-    callback_url = response.headers["Operation-Location"]
-
-    # Check the status of the operation
-    time.sleep(1)
-    result_response = requests.get(callback_url, headers=headers)
-
-    # Keep polling until the operation is no longer running
-    status = result_response.json().get("status")
-    while status == "Running":
-        time.sleep(1)
-        result_response = requests.get(callback_url, headers=headers)
-        status = result_response.json().get("status")
-
-    result = result_response.json().get("status")
-    print(result)
-    if result == "Succeeded":
-        print(f"Analyzer '{analyzer}' created successfully.")
+    # Compare with the deployed analyzer and only change what differs, so that
+    # running analyses are not interrupted when the schema has not changed
+    force = os.getenv('FORCE_RECREATE', '').lower() in ('1', 'true', 'yes')
+    with AzureContentUnderstandingClient(endpoint, CU_VERSION, subscription_key=key) as client:
+        action = client.deploy_analyzer(
+            analyzer,
+            json.loads(schema),
+            force=force,
+            timeout_seconds=MAX_WAIT_SECONDS,
+        )
+
+    if action == "unchanged":
+        print(f"Analyzer '{analyzer}' is up to date.")
     else:
-        print("Analyzer creation failed.")
-        print(result_response.json())
+        print(f"Analyzer '{analyzer}' {action} successfully.")
 
 
 
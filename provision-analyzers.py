@@ -0,0 +1,41 @@
+from dotenv import load_dotenv
+import os
+import sys
+import time
+
+from AnalyzerProvisioning import load_analyzer_definitions, provision_analyzers
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient
+
+
+def main():
+
+    # A directory of schema files, or a JSON manifest {analyzer id: schema file}
+    source = sys.argv[1] if len(sys.argv) > 1 else "."
+
+    # Get config settings
+    load_dotenv()
+    ai_svc_endpoint = os.getenv('ENDPOINT')
+    ai_svc_key = os.getenv('KEY')
+    api_version = os.getenv('API_VERSION')
+    force = os.getenv('FORCE_RECREATE', '').lower() in ('1', 'true', 'yes')
+    max_workers = int(os.getenv('MAX_WORKERS', '8'))
+
+    definitions = load_analyzer_definitions(source)
+    print(f"Provisioning {len(definitions)} analyzers from {source}")
+
+    start_time = time.time()
+    with AzureContentUnderstandingClient(
+        ai_svc_endpoint, api_version, subscription_key=ai_svc_key, pool_maxsize=max_workers
+    ) as client:
+        results = provision_analyzers(client, definitions, force=force, max_workers=max_workers)
+
+    for result in results:
+        print(result)
+    print(f"Done in {time.time() - start_time:.2f}s")
+
+    if any(result.status != "succeeded" for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,13 @@ import json
 from azure.storage.blob import BlobServiceClient
 from BlobStorageUtils import BlobStorageUtils
 from CommonUtils import CommonUtils
+from AnalysisResult import iter_fields
+from AzureContentUnderstandingClient import PollingStrategy, parse_retry_after, send_with_retry
+from RateLimiter import POLL, SUBMIT
+from UploadStream import UploadStream
+
+# Give up on an analysis that is still running after this long
+MAX_WAIT_SECONDS = 10 * 60
 
 def main():
 
@@ -29,6 +36,9 @@ def main():
         # Analyze the business card
         analyze_card (image_file, analyzer, ai_svc_endpoint, ai_svc_key)
 
+        # Record the replay analysis rows
+        write_replay_rows()
+
         print("\n")
 
     except Exception as ex:
@@ -36,7 +46,7 @@ def main():
 
 
 
-def analyze_card (image_file, analyzer, endpoint, key):
+def analyze_card (image_file, analyzer, endpoint, key, rate_limiter=None):
 
     # Use Content Understanding to analyze the image
     print (f"Analyzing {image_file}")
@@ -44,17 +54,16 @@ def analyze_card (image_file, analyzer, endpoint, key):
     # Set the API version
     CU_VERSION = "2025-05-01-preview"
 
-    # Read the image data
-    with open(image_file, "rb") as file:
-        image_data = file.read()
-
     ## Use a POST request to submit the image data to the analyzer
     print("Submitting request...")
     headers = {
         "Ocp-Apim-Subscription-Key": key,
         "Content-Type": "application/octet-stream"}
     url = f'{endpoint}/contentunderstanding/analyzers/{analyzer}:analyze?api-version={CU_VERSION}'
-    response = requests.post(url, headers=headers, data=image_data)
+    # The file is streamed from disk rather than read into memory, and rewound if the
+    # request is retried; throttled (429) and transiently failed requests are retried, honoring Retry-After
+    with UploadStream.from_file(image_file, progress=print_upload_progress) as image_data:
+        response = send_with_retry(requests, "POST", url, SUBMIT, rate_limiter=rate_limiter, headers=headers, data=image_data)
 
     # Get the response and extract the ID assigned to the analysis operation
     print(response.status_code)
@@ -63,47 +72,46 @@ def analyze_card (image_file, analyzer, endpoint, key):
 
     # Use a GET request to check the status of the analysis operation
     print ('Getting results...')
-    time.sleep(1)
+    polling = PollingStrategy()
+    deadline = time.time() + MAX_WAIT_SECONDS
+    time.sleep(polling.next_delay(0, parse_retry_after(response.headers)))
     result_url = f'{endpoint}/contentunderstanding/analyzerResults/{id_value}?api-version={CU_VERSION}'
-    result_response = requests.get(result_url, headers=headers)
+    result_response = send_with_retry(requests, "GET", result_url, POLL, rate_limiter=rate_limiter, headers=headers)
     print(result_response.status_code)
 
-    # Keep polling until the analysis is complete
+    # Keep polling until the analysis is complete, backing off between polls
     status = result_response.json().get("status")
+    attempt = 1
     while status == "Running":
-        time.sleep(1)
-        result_response = requests.get(result_url, headers=headers)
+        if time.time() > deadline:
+            raise TimeoutError(f"Analysis did not complete within {MAX_WAIT_SECONDS} seconds.")
+        time.sleep(polling.next_delay(attempt, parse_retry_after(result_response.headers)))
+        result_response = send_with_retry(requests, "GET", result_url, POLL, rate_limiter=rate_limiter, headers=headers)
         status = result_response.json().get("status")
+        attempt += 1
 
     # Process the analysis results
+    result_json = result_response.json()
     if status == "Succeeded":
         print("Analysis succeeded:\n")
-        result_json = result_response.json()
         output_file = "results.json"
         with open(output_file, "w") as json_file:
             json.dump(result_json, json_file, indent=4)
             print(f"Response saved in {output_file}\n")
 
-        # Iterate through the fields and extract the names and type-specific values
-        contents = result_json["result"]["contents"]
-        for content in contents:
-            if "fields" in content:
-                fields = content["fields"]
-                for field_name, field_data in fields.items():
-                    if field_data['type'] == "string":
-                        print(f"{field_name}: {field_data['valueString']}")
-                    elif field_data['type'] == "number":
-                        print(f"{field_name}: {field_data['valueNumber']}")
-                    elif field_data['type'] == "integer":
-                        print(f"{field_name}: {field_data['valueInteger']}")
-                    elif field_data['type'] == "date":
-                        print(f"{field_name}: {field_data['valueDate']}")
-                    elif field_data['type'] == "time":
-                        print(f"{field_name}: {field_data['valueTime']}")
-                    elif field_data['type'] == "array":
-                        print(f"{field_name}: {field_data['valueArray']}")
-
-############################################################################################################
+        # Print the name and value of every field, whatever its type
+        for field_name, value in iter_fields(result_json):
+            print(f"{field_name}: {value}")
+
+    return result_json
+
+
+def print_upload_progress(bytes_sent, total_bytes):
+    print(f"Uploaded {bytes_sent / 1024:.0f} of {total_bytes / 1024:.0f} KiB")
+
+
+def write_replay_rows():
+
     # 从环境变量读取参数
     container = os.getenv("BLOB_CONTAINER_NAME")
     blob_name = os.getenv("BLOB_NAME")
@@ -0,0 +1,115 @@
+import copy
+import threading
+
+import pytest
+
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient, PollingStrategy
+from MockContentUnderstandingServer import MockContentUnderstandingServer, MockServerConfig
+
+FAST_POLLING = PollingStrategy(initial_delay_seconds=0.01, interval_seconds=0.02, jitter=0)
+DEFINITION = {
+    "description": "Checkout steps",
+    "fieldSchema": {"fields": {"ShoppingCart": {"type": "string", "method": "generate"}}},
+}
+
+
+@pytest.fixture
+def server():
+    with MockContentUnderstandingServer(MockServerConfig(analyzer_creation_seconds=0.2)) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    with AzureContentUnderstandingClient(server.url, "2025-05-01-preview", subscription_key="mock") as client:
+        yield client
+
+
+def _changed_schema():
+    definition = copy.deepcopy(DEFINITION)
+    definition["fieldSchema"]["fields"]["PlaceOrderwith"] = {"type": "string", "method": "generate"}
+    return definition
+
+
+def _stale_first_get(monkeypatch, client, stale):
+    # The first lookup returns what this worker saw before another worker changed the analyzer
+    get_analyzer = client.get_analyzer
+    answers = [stale]
+    monkeypatch.setattr(
+        client, "get_analyzer", lambda analyzer_id: answers.pop() if answers else get_analyzer(analyzer_id)
+    )
+
+
+def _deploy_concurrently(server, definition, workers=4):
+    actions, errors = [], []
+
+    def deploy():
+        with AzureContentUnderstandingClient(server.url, "2025-05-01-preview", subscription_key="mock") as client:
+            try:
+                actions.append(client.deploy_analyzer("checkout", definition, polling_strategy=FAST_POLLING))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=deploy) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return actions, errors
+
+
+def test_concurrent_first_deploys_create_the_analyzer_once(server, client):
+    actions, errors = _deploy_concurrently(server, DEFINITION)
+
+    assert errors == []
+    assert sorted(actions) == ["created", "unchanged", "unchanged", "unchanged"]
+    assert client.get_analyzer("checkout")["status"] == "ready"
+
+
+def test_concurrent_schema_changes_leave_one_ready_analyzer(server, client):
+    client.deploy_analyzer("checkout", DEFINITION, polling_strategy=FAST_POLLING)
+
+    actions, errors = _deploy_concurrently(server, _changed_schema())
+
+    assert errors == []
+    # A worker that looked after the outdated analyzer was deleted creates it rather than recreates it
+    assert {"created", "recreated"} & set(actions)
+    current = client.get_analyzer("checkout")
+    assert current["status"] == "ready"
+    assert "PlaceOrderwith" in current["fieldSchema"]["fields"]
+
+
+def test_waits_for_an_analyzer_still_being_created(server, client):
+    client.begin_create_analyzer("checkout", DEFINITION)
+
+    action, response = client.begin_deploy_analyzer("checkout", DEFINITION)
+
+    assert action == "unchanged"
+    assert response is not None
+    client.poll_result(response, polling_strategy=FAST_POLLING)
+    assert client.get_analyzer("checkout")["status"] == "ready"
+
+
+def test_conflict_on_create_joins_the_other_workers_analyzer(server, client, monkeypatch):
+    client.deploy_analyzer("checkout", DEFINITION, polling_strategy=FAST_POLLING)
+    _stale_first_get(monkeypatch, client, None)
+
+    action, response = client.begin_deploy_analyzer("checkout", DEFINITION)
+
+    assert (action, response) == ("unchanged", None)
+    assert server.stats["analyzer_put"] == 2
+
+
+def test_does_not_delete_an_analyzer_another_worker_just_recreated(server, client, monkeypatch):
+    client.deploy_analyzer("checkout", DEFINITION, polling_strategy=FAST_POLLING)
+    outdated = client.get_analyzer("checkout")
+    client.delete_analyzer("checkout")
+    client.deploy_analyzer("checkout", _changed_schema(), polling_strategy=FAST_POLLING)
+    server.reset_stats()
+    _stale_first_get(monkeypatch, client, outdated)
+
+    action, response = client.begin_deploy_analyzer("checkout", _changed_schema())
+
+    assert (action, response) == ("unchanged", None)
+    assert server.stats["analyzer_delete"] == 0
+    assert server.stats["analyzer_put"] == 0
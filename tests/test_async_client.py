@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from AsyncContentUnderstandingClient import AsyncAzureContentUnderstandingClient
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient, PollingStrategy
+from MockContentUnderstandingServer import MockContentUnderstandingServer, MockServerConfig
+from ResultCache import LocalDiskCacheBackend, ResultCache
+
+API_VERSION = "2025-05-01-preview"
+FAST_POLLING = PollingStrategy(initial_delay_seconds=0.01, interval_seconds=0.02, jitter=0)
+SCHEMA = {"fieldSchema": {"fields": {"ShoppingCart": {"type": "string", "method": "generate"}}}}
+
+
+@pytest.fixture
+def server():
+    config = MockServerConfig(analysis_seconds=0.3, analyzer_creation_seconds=0.01, markdown_bytes_per_content=0)
+    with MockContentUnderstandingServer(config) as server:
+        with AzureContentUnderstandingClient(server.url, API_VERSION, subscription_key="mock") as client:
+            client.deploy_analyzer("checkout", SCHEMA, polling_strategy=FAST_POLLING)
+        server.reset_stats()
+        yield server
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_analyses_run_concurrently_on_one_loop(server):
+    async def analyze_all():
+        async with AsyncAzureContentUnderstandingClient(server.url, API_VERSION, subscription_key="mock") as client:
+            return await asyncio.gather(*(
+                client.analyze("checkout", f"video-{index}.mp4", b"v" * 1024, polling_strategy=FAST_POLLING)
+                for index in range(10)
+            ))
+
+    start = time.perf_counter()
+    results = _run(analyze_all())
+
+    # Ten analyses of 0.3s each, waited for together rather than one after another
+    assert time.perf_counter() - start < 2
+    assert [result["status"] for result in results] == ["Succeeded"] * 10
+    assert server.stats["analyze"] == 10
+
+
+def test_a_slow_token_does_not_block_the_loop(server):
+    def token_provider() -> str:
+        # A token fetched from the credential, e.g. on expiry
+        time.sleep(0.2)
+        return "token"
+
+    async def analyze_while_ticking():
+        longest_gap = 0.0
+        done = asyncio.Event()
+
+        async def tick():
+            nonlocal longest_gap
+            last = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                longest_gap, last = max(longest_gap, now - last), now
+
+        async with AsyncAzureContentUnderstandingClient(server.url, API_VERSION, token_provider=token_provider) as client:
+            response = await client.begin_analyze("checkout", "video.mp4", b"v" * 1024)
+            ticker = asyncio.create_task(tick())
+            result = await client.poll_result(response, polling_strategy=FAST_POLLING)
+            done.set()
+            await ticker
+        return result, longest_gap
+
+    result, longest_gap = _run(analyze_while_ticking())
+
+    assert result["status"] == "Succeeded"
+    # Each poll waits 0.2s for its token, off the loop
+    assert longest_gap < 0.1
+
+
+def test_a_cached_result_sends_no_request(server, tmp_path):
+    cache = ResultCache(LocalDiskCacheBackend(str(tmp_path)), analyzer_schemas={"checkout": SCHEMA})
+
+    async def analyze_twice():
+        async with AsyncAzureContentUnderstandingClient(
+            server.url, API_VERSION, subscription_key="mock", result_cache=cache
+        ) as client:
+            first = await client.analyze("checkout", "video.mp4", b"v" * 1024, polling_strategy=FAST_POLLING)
+            second = await client.analyze("checkout", "copy.mp4", b"v" * 1024, polling_strategy=FAST_POLLING)
+        return first, second
+
+    first, second = _run(analyze_twice())
+
+    assert second == first
+    assert server.stats["analyze"] == 1
@@ -0,0 +1,167 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+
+from BlobStorageBackends import APPEND_BLOCK_MAX_BYTES, AzureBlobBackend
+
+
+def _service_error(error_code: str) -> HttpResponseError:
+    error = HttpResponseError(message=error_code)
+    error.error_code = error_code
+    return error
+
+
+class FakeBlobClient:
+    """
+    The BlobClient calls AzureBlobBackend appends with, against a FakeContainerClient,
+    answering with the errors the service sends.
+    """
+
+    def __init__(self, container: "FakeContainerClient", blob_name: str):
+        self.container = container
+        self.blob_name = blob_name
+
+    def append_block(self, data: bytes, appendpos_condition=None) -> None:
+        blob = self.container.blobs.get(self.blob_name)
+        self.container.appended.append(len(data))
+        if blob is None:
+            raise ResourceNotFoundError("The specified blob does not exist.")
+        if blob["type"] != "AppendBlob":
+            raise _service_error("InvalidBlobType")
+        if appendpos_condition is not None and appendpos_condition != len(blob["data"]):
+            raise _service_error("AppendPositionConditionNotMet")
+        blob["data"] += data
+        blob["etag"] = next(self.container.etags)
+
+    def create_append_blob(self, etag=None, match_condition=None) -> None:
+        blob = self.container.blobs.get(self.blob_name)
+        if match_condition == MatchConditions.IfMissing and blob is not None:
+            raise ResourceExistsError("The specified blob already exists.")
+        if match_condition == MatchConditions.IfNotModified and (blob is None or blob["etag"] != etag):
+            raise ResourceModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+        self.container.blobs[self.blob_name] = {
+            "type": "AppendBlob", "data": bytearray(), "etag": next(self.container.etags)
+        }
+
+    def download_blob(self):
+        blob = self.container.blobs.get(self.blob_name)
+        if blob is None:
+            raise ResourceNotFoundError("The specified blob does not exist.")
+        self.container.downloads += 1
+        content = bytes(blob["data"])
+        etag = blob["etag"]
+        return SimpleNamespace(readall=lambda: content, properties=SimpleNamespace(etag=etag))
+
+
+class FakeContainerClient:
+    def __init__(self):
+        self.blobs = {}
+        self.etags = (f'"0x{index}"' for index in itertools.count(1))
+        # Sizes of the Append Block calls, and the number of downloads
+        self.appended = []
+        self.downloads = 0
+
+    def get_blob_client(self, blob_name: str) -> FakeBlobClient:
+        return FakeBlobClient(self, blob_name)
+
+    def put_block_blob(self, blob_name: str, data: bytes) -> None:
+        self.blobs[blob_name] = {"type": "BlockBlob", "data": bytearray(data), "etag": next(self.etags)}
+
+
+@pytest.fixture
+def container() -> FakeContainerClient:
+    return FakeContainerClient()
+
+
+@pytest.fixture
+def backend(container: FakeContainerClient) -> AzureBlobBackend:
+    backend = AzureBlobBackend("UseDevelopmentStorage=true", "reports")
+    backend.container_client = container
+    return backend
+
+
+def test_append_creates_missing_blob(backend, container):
+    backend.append("report.csv", b"header\n")
+    backend.append("report.csv", b"row\n")
+
+    assert container.blobs["report.csv"]["type"] == "AppendBlob"
+    assert bytes(container.blobs["report.csv"]["data"]) == b"header\nrow\n"
+
+
+def test_append_sends_only_new_bytes(backend, container):
+    row = b"x" * 255 + b"\n"
+    for _ in range(2000):
+        backend.append("report.csv", row)
+
+    # One failed attempt before the blob existed, then one block per row however large the blob is
+    assert container.appended == [len(row)] * 2001
+    assert container.downloads == 0
+    assert len(container.blobs["report.csv"]["data"]) == 2000 * len(row)
+
+
+def test_append_writes_one_full_block(backend, container):
+    container.blobs["big.bin"] = {"type": "AppendBlob", "data": bytearray(), "etag": '"0x0"'}
+    data = b"b" * APPEND_BLOCK_MAX_BYTES
+
+    backend.append("big.bin", data)
+
+    assert container.appended == [APPEND_BLOCK_MAX_BYTES]
+    assert bytes(container.blobs["big.bin"]["data"]) == data
+
+
+def test_append_rejects_data_over_one_block(backend, container):
+    container.blobs["big.bin"] = {"type": "AppendBlob", "data": bytearray(b"kept"), "etag": '"0x0"'}
+
+    with pytest.raises(ValueError, match="at most"):
+        backend.append("big.bin", b"b" * (APPEND_BLOCK_MAX_BYTES + 1))
+    with pytest.raises(ValueError, match="at most"):
+        backend.append_if_empty("new.bin", b"b" * (APPEND_BLOCK_MAX_BYTES + 1))
+
+    # Nothing was sent, so no part of the data can have been written
+    assert container.appended == []
+    assert bytes(container.blobs["big.bin"]["data"]) == b"kept"
+    assert "new.bin" not in container.blobs
+
+
+def test_append_to_block_blob_keeps_its_content(backend, container):
+    container.put_block_blob("report.csv", b"header\nold row\n")
+
+    with pytest.raises(ValueError, match="block blob"):
+        backend.append("report.csv", b"new row\n")
+
+    assert container.blobs["report.csv"]["type"] == "BlockBlob"
+    assert bytes(container.blobs["report.csv"]["data"]) == b"header\nold row\n"
+    assert container.downloads == 0
+
+
+def test_append_propagates_other_errors(backend, container, monkeypatch):
+    def fail(self, data, appendpos_condition=None):
+        raise _service_error("AuthorizationFailure")
+
+    monkeypatch.setattr(FakeBlobClient, "append_block", fail)
+    with pytest.raises(HttpResponseError):
+        backend.append("report.csv", b"row\n")
+
+
+def test_append_if_empty_writes_once(backend, container):
+    assert backend.append_if_empty("report.csv", b"header\n") is True
+    assert backend.append_if_empty("report.csv", b"header\n") is False
+
+    assert bytes(container.blobs["report.csv"]["data"]) == b"header\n"
+
+
+def test_append_if_empty_on_block_blob_writes_nothing(backend, container):
+    container.put_block_blob("report.csv", b"header\nrow\n")
+
+    assert backend.append_if_empty("report.csv", b"header\n") is False
+
+    assert container.blobs["report.csv"]["type"] == "BlockBlob"
+    assert bytes(container.blobs["report.csv"]["data"]) == b"header\nrow\n"
@@ -0,0 +1,111 @@
+import io
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+
+from BlobStorageBackends import CountingBackend, InMemoryBackend
+from BlobStorageUtils import BlobStorageUtils
+from CommonUtils import CommonUtils
+
+HEADER = "File Name,Cart Number,Payment Method"
+
+
+@pytest.fixture
+def backend():
+    return CountingBackend(InMemoryBackend())
+
+
+def _cache_properties(blob_utils: BlobStorageUtils) -> None:
+    # Listing caches the properties of the blobs it returns
+    list(blob_utils.list_blobs())
+
+
+def test_opening_a_cached_blob_sends_no_request(backend):
+    blob_utils = BlobStorageUtils(backend=backend)
+    blob_utils.write("videos/a.mp4", io.BytesIO(b"0123456789"))
+    _cache_properties(blob_utils)
+    backend.reset_stats()
+
+    with blob_utils.read_stream("videos/a.mp4", chunk_size=4) as stream:
+        assert backend.stats["total"] == 0
+        assert stream.read() == b"0123456789"
+    assert backend.stats["get_properties"] == 0
+
+
+def test_a_blob_changed_since_it_was_cached_is_read_again(backend):
+    reader = BlobStorageUtils(backend=backend)
+    writer = BlobStorageUtils(backend=backend)
+    writer.write("videos/a.mp4", io.BytesIO(b"old"))
+    _cache_properties(reader)
+    writer.write("videos/a.mp4", io.BytesIO(b"the new content"))
+    backend.reset_stats()
+
+    with reader.read_stream("videos/a.mp4", chunk_size=4, max_concurrency=2) as stream:
+        assert stream.read() == b"the new content"
+        assert len(stream) == len(b"the new content")
+    assert backend.stats["get_properties"] == 1
+
+    # The fresh properties are cached again
+    backend.reset_stats()
+    with reader.read_stream("videos/a.mp4") as stream:
+        assert stream.read() == b"the new content"
+    assert backend.stats["get_properties"] == 0
+
+
+def test_a_blob_deleted_since_it_was_cached_fails_on_the_first_read(backend):
+    reader = BlobStorageUtils(backend=backend)
+    writer = BlobStorageUtils(backend=backend)
+    writer.write("videos/a.mp4", io.BytesIO(b"content"))
+    _cache_properties(reader)
+    writer.remove("videos/a.mp4")
+
+    with reader.read_stream("videos/a.mp4") as stream:
+        with pytest.raises(ResourceNotFoundError):
+            stream.read()
+    assert not reader.exists("videos/a.mp4")
+
+
+def test_refreshed_properties_see_a_change_the_cache_missed(backend):
+    reader = BlobStorageUtils(backend=backend)
+    writer = BlobStorageUtils(backend=backend)
+    writer.write("videos/a.mp4", io.BytesIO(b"old"))
+    _cache_properties(reader)
+    listed = reader.get_properties("videos/a.mp4")
+    writer.write("videos/a.mp4", io.BytesIO(b"the new content"))
+
+    assert reader.get_properties("videos/a.mp4").etag == listed.etag
+    refreshed = reader.get_properties("videos/a.mp4", refresh=True)
+    assert refreshed.etag != listed.etag
+    assert refreshed.size == len(b"the new content")
+    # The refreshed properties replace the cached ones
+    backend.reset_stats()
+    assert reader.get_properties("videos/a.mp4").etag == refreshed.etag
+    assert backend.stats["total"] == 0
+
+
+def test_a_csv_row_costs_one_storage_call(backend):
+    blob_utils = BlobStorageUtils(backend=backend)
+
+    CommonUtils.write_csv_to_blob(blob_utils, "calls/", "report", HEADER, "a.mp4,1,card")
+    assert backend.stats["total"] == 1
+
+    # Appending to the existing file costs no more
+    backend.reset_stats()
+    CommonUtils.write_csv_to_blob(blob_utils, "calls/", "report", HEADER, "b.mp4,2,card")
+    assert backend.stats["total"] == 1
+
+    (path,) = blob_utils.list_names("calls/")
+    assert blob_utils.read(path).decode("utf-8") == f"{HEADER}\na.mp4,1,card\nb.mp4,2,card\n"
+
+
+def test_reading_a_video_costs_one_storage_call(backend):
+    blob_utils = BlobStorageUtils(backend=backend)
+    blob_utils.write("videos/video-1.mp4", io.BytesIO(b"v" * 1024))
+    backend.reset_stats()
+
+    assert CommonUtils.read_video_to_bytes(blob_utils, "videos/", "video-1.mp4") == b"v" * 1024
+    assert backend.stats["total"] == 1
+
+    backend.reset_stats()
+    assert CommonUtils.read_video_to_bytes(blob_utils, "videos/", "missing.mp4") is None
+    assert backend.stats["total"] == 1
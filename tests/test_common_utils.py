@@ -0,0 +1,36 @@
+from BlobStorageBackends import APPEND_BLOCK_MAX_BYTES, InMemoryBackend
+from BlobStorageUtils import BlobStorageUtils
+from CommonUtils import CsvBlobWriter
+
+
+class RecordingBackend(InMemoryBackend):
+    """
+    Records the size of every append, conditional or not.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.appends = []
+
+    def append(self, path: str, data: bytes) -> None:
+        self.appends.append(len(data))
+        super().append(path, data)
+
+    def append_if_empty(self, path: str, data: bytes) -> bool:
+        self.appends.append(len(data))
+        return super().append_if_empty(path, data)
+
+
+def test_a_batch_larger_than_an_append_block_is_split_between_rows():
+    backend = RecordingBackend()
+    blob_utils = BlobStorageUtils(backend=backend)
+    rows = [f"{index:06d}," + "x" * 1000 for index in range(6000)]
+
+    with CsvBlobWriter(blob_utils, "reports/", "replays", "id,payload", max_rows=len(rows), flush_interval_seconds=None) as writer:
+        for row in rows:
+            writer.write_row(row)
+
+    (path,) = blob_utils.list_names("reports/")
+    assert blob_utils.read(path).decode("utf-8") == "id,payload\n" + "".join(f"{row}\n" for row in rows)
+    assert len(backend.appends) == 2
+    assert all(size <= APPEND_BLOCK_MAX_BYTES for size in backend.appends)
@@ -0,0 +1,99 @@
+import pytest
+import requests
+
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient, PollingStrategy
+from JobJournal import EXPIRED, PENDING, SUCCEEDED, JobJournal
+from MockContentUnderstandingServer import MockContentUnderstandingServer, MockServerConfig
+
+API_VERSION = "2025-05-01-preview"
+FAST_POLLING = PollingStrategy(initial_delay_seconds=0.01, interval_seconds=0.02, jitter=0)
+
+
+@pytest.fixture
+def server():
+    config = MockServerConfig(analysis_seconds=0.1, markdown_bytes_per_content=0)
+    with MockContentUnderstandingServer(config) as server:
+        yield server
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "jobs.jsonl")
+
+
+def _client(server, job_journal):
+    return AzureContentUnderstandingClient(server.url, API_VERSION, subscription_key="mock", job_journal=job_journal)
+
+
+def test_a_restarted_worker_resumes_the_running_analysis(server, journal_path):
+    # The first worker submits the video and dies before the result is ready
+    with JobJournal(journal_path) as journal, _client(server, journal) as client:
+        submitted = client.begin_analyze("checkout", "videos/a.mp4", b"v" * 1024)
+
+    with JobJournal(journal_path) as journal, _client(server, journal) as client:
+        assert [record["job_key"] for record in journal.list_pending()] == ["videos/a.mp4"]
+        resumed = client.begin_analyze("checkout", "videos/a.mp4", b"v" * 1024)
+        assert resumed.headers["operation-location"] == submitted.headers["operation-location"]
+        assert server.stats["analyze"] == 1
+
+        result = client.poll_result(resumed, polling_strategy=FAST_POLLING)
+        assert result["status"] == "Succeeded"
+        assert journal.list_pending() == []
+
+    # The finished job is not resumed again, and the same file with another analyzer is another job
+    with JobJournal(journal_path) as journal, _client(server, journal) as client:
+        assert journal.get_pending("videos/a.mp4", "checkout") is None
+        client.begin_analyze("checkout", "videos/a.mp4", b"v" * 1024)
+        client.begin_analyze("other", "videos/a.mp4", b"v" * 1024)
+        assert server.stats["analyze"] == 3
+
+
+def test_an_operation_the_service_forgot_is_submitted_again(server, journal_path):
+    with JobJournal(journal_path) as journal:
+        journal.record_submitted(
+            "videos/a.mp4", "checkout", f"{server.url}/contentunderstanding/analyzerResults/gone?api-version=mock"
+        )
+
+    with JobJournal(journal_path) as journal, _client(server, journal) as client:
+        resumed = client.begin_analyze("checkout", "videos/a.mp4", b"v" * 1024)
+        with pytest.raises(requests.HTTPError):
+            client.poll_result(resumed, polling_strategy=FAST_POLLING)
+        assert journal.get_pending("videos/a.mp4", "checkout") is None
+
+    with JobJournal(journal_path) as journal, _client(server, journal) as client:
+        (record,) = journal._jobs.values()
+        assert record["status"] == EXPIRED
+        response = client.begin_analyze("checkout", "videos/a.mp4", b"v" * 1024)
+        assert server.stats["analyze"] == 1
+        assert client.poll_result(response, polling_strategy=FAST_POLLING)["status"] == "Succeeded"
+
+
+def test_a_line_cut_short_by_a_crash_is_dropped(journal_path):
+    with JobJournal(journal_path) as journal:
+        journal.record_submitted("videos/a.mp4", "checkout", "https://example/analyzerResults/1")
+        journal.record_submitted("videos/b.mp4", "checkout", "https://example/analyzerResults/2")
+    with open(journal_path, "rb+") as file:
+        content = file.read()
+        file.truncate(len(content) - 10)
+
+    with JobJournal(journal_path) as journal:
+        assert [record["job_key"] for record in journal.list_pending()] == ["videos/a.mp4"]
+        journal.record_status("https://example/analyzerResults/1", SUCCEEDED)
+
+    with JobJournal(journal_path) as journal:
+        assert journal.list_pending() == []
+
+
+def test_compact_keeps_the_latest_record_of_each_job(journal_path):
+    with JobJournal(journal_path) as journal:
+        for index in range(3):
+            journal.record_submitted("videos/a.mp4", "checkout", f"https://example/analyzerResults/{index}")
+        journal.record_status("https://example/analyzerResults/2", SUCCEEDED)
+        journal.record_submitted("videos/b.mp4", "checkout", "https://example/analyzerResults/3")
+        journal.compact()
+
+    with open(journal_path, "r", encoding="utf-8") as file:
+        assert len(file.readlines()) == 2
+    with JobJournal(journal_path) as journal:
+        assert journal._jobs[("videos/a.mp4", "checkout")]["status"] == SUCCEEDED
+        assert journal._jobs[("videos/b.mp4", "checkout")]["status"] == PENDING
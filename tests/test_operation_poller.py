@@ -0,0 +1,79 @@
+from concurrent.futures import CancelledError
+
+import pytest
+
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient, OperationFailedError, PollingStrategy
+from MockContentUnderstandingServer import MockContentUnderstandingServer, MockServerConfig
+from OperationPoller import OperationPoller
+
+API_VERSION = "2025-05-01-preview"
+FAST_POLLING = PollingStrategy(initial_delay_seconds=0.01, interval_seconds=0.02, jitter=0)
+
+
+def _mock_client(**config):
+    config = MockServerConfig(**dict({"analysis_seconds": 0.2, "markdown_bytes_per_content": 0}, **config))
+    server = MockContentUnderstandingServer(config)
+    return server, AzureContentUnderstandingClient(server.url, API_VERSION, subscription_key="mock")
+
+
+@pytest.fixture
+def mock_client():
+    server, client = _mock_client()
+    with server, client:
+        yield server, client
+
+
+def test_many_operations_are_polled_by_a_few_workers(mock_client):
+    server, client = mock_client
+
+    with OperationPoller(client, polling_strategy=FAST_POLLING, max_workers=2) as poller:
+        futures = [poller.submit(client.begin_analyze("checkout", f"video-{index}.mp4", b"v")) for index in range(20)]
+        results = [future.result(timeout=5) for future in futures]
+
+    assert [result["status"] for result in results] == ["Succeeded"] * 20
+    assert server.stats["analyze"] == 20
+    assert poller.pending == 0
+
+
+def test_an_analyzer_operation_is_polled_like_an_analysis(mock_client):
+    server, client = mock_client
+    schema = {"fieldSchema": {"fields": {"ShoppingCart": {"type": "string"}}}}
+
+    with OperationPoller(client, polling_strategy=FAST_POLLING) as poller:
+        action, response = client.begin_deploy_analyzer("checkout", schema)
+        poller.submit(response).result(timeout=5)
+
+    assert action == "created"
+    assert client.get_analyzer("checkout")["status"] == "ready"
+
+
+def test_a_failed_operation_fails_its_future():
+    server, client = _mock_client(failure_rate=1.0)
+    with server, client, OperationPoller(client, polling_strategy=FAST_POLLING) as poller:
+        future = poller.submit(client.begin_analyze("checkout", "video.mp4", b"v"))
+
+        with pytest.raises(OperationFailedError):
+            future.result(timeout=5)
+
+
+def test_an_operation_that_runs_too_long_times_out():
+    server, client = _mock_client(analysis_seconds=10)
+    with server, client, OperationPoller(client, polling_strategy=FAST_POLLING) as poller:
+        future = poller.submit(client.begin_analyze("checkout", "video.mp4", b"v"), timeout_seconds=0.2)
+
+        with pytest.raises(TimeoutError):
+            future.result(timeout=5)
+
+
+def test_closing_cancels_pending_operations():
+    server, client = _mock_client(analysis_seconds=10)
+    with server, client:
+        poller = OperationPoller(client, polling_strategy=FAST_POLLING)
+        future = poller.submit(client.begin_analyze("checkout", "video.mp4", b"v"))
+
+        poller.close()
+
+        with pytest.raises(CancelledError):
+            future.result(timeout=5)
+        # Operations submitted after closing are cancelled at once
+        assert poller.submit(client.begin_analyze("checkout", "video.mp4", b"v")).cancelled()
@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+
+from Pipeline import Pipeline, Stage
+
+
+def _run(pipeline, items, timeout_seconds=5):
+    # A pipeline that does not shut down leaves this thread running
+    reports = []
+    thread = threading.Thread(target=lambda: reports.append(pipeline.run(items)), daemon=True)
+    thread.start()
+    thread.join(timeout_seconds)
+    assert not thread.is_alive(), "the pipeline did not finish"
+    return reports[0]
+
+
+def _fail_odd(value):
+    if value % 2:
+        raise ValueError(f"odd: {value}")
+    return value
+
+
+def test_items_pass_through_every_stage():
+    results = []
+    pipeline = Pipeline([
+        Stage("double", lambda value: value * 2, workers=2),
+        Stage("collect", results.append),
+    ])
+
+    report = _run(pipeline, range(10))
+
+    assert sorted(results) == [value * 2 for value in range(10)]
+    assert sorted(report.succeeded) == list(range(10))
+    assert [stage.processed for stage in report.stages] == [10, 10]
+
+
+def test_a_failed_item_goes_no_further():
+    results = []
+    pipeline = Pipeline([Stage("check", _fail_odd, workers=2), Stage("collect", results.append)])
+
+    report = _run(pipeline, range(6))
+
+    assert sorted(results) == [0, 2, 4]
+    assert sorted(item for item, _, _ in report.failed) == [1, 3, 5]
+    assert {stage for _, stage, _ in report.failed} == {"check"}
+    assert report.stages[0].failed == 3
+
+
+def test_futures_are_passed_on_when_they_resolve():
+    futures = []
+    results = []
+
+    def submit(value):
+        future = Future()
+        futures.append((value, future))
+        return future
+
+    def resolve_later():
+        # Resolved on another thread, as an OperationPoller would, some of them failed or cancelled
+        while len(futures) < 6:
+            time.sleep(0.01)
+        for value, future in futures:
+            if value == 1:
+                future.set_exception(ValueError("failed"))
+            elif value == 2:
+                future.cancel()
+            else:
+                future.set_result(value * 10)
+
+    threading.Thread(target=resolve_later, daemon=True).start()
+    pipeline = Pipeline([
+        Stage("submit", submit, max_pending=6),
+        Stage("collect", results.append),
+    ])
+
+    report = _run(pipeline, range(6))
+
+    assert sorted(results) == [0, 30, 40, 50]
+    failed = {item: type(error) for item, _, error in report.failed}
+    assert failed == {1: ValueError, 2: CancelledError}
+    assert report.stages[0].processed == 4
+
+
+def test_futures_resolved_while_the_next_stage_is_full_do_not_block_their_resolver():
+    futures = []
+    handled = []
+    handled_when_resolved = []
+
+    def submit(value):
+        future = Future()
+        futures.append(future)
+        return future
+
+    def resolve_all():
+        while len(futures) < 8:
+            time.sleep(0.01)
+        for index, future in enumerate(futures):
+            future.set_result(index)
+        handled_when_resolved.append(len(handled))
+
+    def slow(value):
+        time.sleep(0.02)
+        handled.append(value)
+
+    threading.Thread(target=resolve_all, daemon=True).start()
+    pipeline = Pipeline([
+        Stage("submit", submit, max_pending=8),
+        Stage("slow", slow, queue_size=1),
+    ])
+
+    report = _run(pipeline, range(8))
+
+    # The resolver was done long before the slow stage was
+    assert handled_when_resolved[0] < 4
+    assert sorted(report.succeeded) == list(range(8))
@@ -0,0 +1,73 @@
+import os
+import time
+
+from BlobStorageBackends import CountingBackend, InMemoryBackend
+from BlobStorageUtils import BlobStorageUtils
+from ResultCache import BlobCacheBackend, LocalDiskCacheBackend, ResultCache
+
+SCHEMA = {"fieldSchema": {"fields": {"ShoppingCart": {"type": "string"}}}}
+RESULT = {"status": "Succeeded", "result": {"contents": [{"markdown": "x" * 100}]}}
+
+
+def _cache(backend, ttl_seconds=None):
+    return ResultCache(backend, ttl_seconds=ttl_seconds, analyzer_schemas={"checkout": SCHEMA})
+
+
+def test_a_stored_result_is_found_under_the_same_content(tmp_path):
+    cache = _cache(LocalDiskCacheBackend(str(tmp_path)))
+    key = cache.make_key("checkout", "2025-05-01-preview", "sha256:abc")
+    cache.put(key, RESULT)
+
+    assert cache.get(key) == RESULT
+    assert cache.get(cache.make_key("checkout", "2025-05-01-preview", "sha256:def")) is None
+
+
+def test_a_changed_schema_misses(tmp_path):
+    cache = _cache(LocalDiskCacheBackend(str(tmp_path)))
+    key = cache.make_key("checkout", "2025-05-01-preview", "sha256:abc")
+    cache.put(key, RESULT)
+
+    cache.register_schema("checkout", {"fieldSchema": {"fields": {}}})
+
+    assert cache.get(cache.make_key("checkout", "2025-05-01-preview", "sha256:abc")) is None
+    assert cache.make_key("other", "2025-05-01-preview", "sha256:abc") is None
+
+
+def test_an_expired_result_is_removed(tmp_path):
+    backend = LocalDiskCacheBackend(str(tmp_path))
+    cache = _cache(backend, ttl_seconds=0.05)
+    key = cache.make_key("checkout", "2025-05-01-preview", "sha256:abc")
+    cache.put(key, RESULT)
+    time.sleep(0.1)
+
+    assert cache.get(key) is None
+    assert backend.get(key) is None
+
+
+def test_local_disk_evicts_the_least_recently_used_every_few_puts(tmp_path):
+    backend = LocalDiskCacheBackend(str(tmp_path), max_bytes=3 * 100, evict_every_puts=5)
+    entry = b"x" * 100
+    for index in range(4):
+        backend.put(f"key-{index}", entry)
+        # Distinct modification times, oldest first
+        os.utime(tmp_path / f"key-{index}.json", (index, index))
+    # Reading key-0 makes it the most recently used
+    assert backend.get("key-0") == entry
+    assert len(list(tmp_path.glob("*.json"))) == 4
+
+    backend.put("key-4", entry)
+
+    assert sorted(path.stem for path in tmp_path.glob("*.json")) == ["key-0", "key-3", "key-4"]
+
+
+def test_blob_cache_lists_the_cache_every_few_puts():
+    storage = CountingBackend(InMemoryBackend())
+    backend = BlobCacheBackend(BlobStorageUtils(backend=storage), max_bytes=3 * 100, evict_every_puts=5)
+    for index in range(4):
+        backend.put(f"key-{index}", b"x" * 100)
+    assert storage.stats["list_blob_pages"] == 0
+
+    backend.put("key-4", b"x" * 100)
+
+    assert storage.stats["list_blob_pages"] == 1
+    assert len(BlobStorageUtils(backend=storage).list_names("result-cache/")) == 3
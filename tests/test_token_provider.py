@@ -0,0 +1,60 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from TokenProvider import CachedTokenProvider
+
+
+class SlowCredential:
+    """
+    Hands out numbered tokens valid for `lifetime_seconds`; every call after the first takes `delay_seconds`.
+    """
+
+    def __init__(self, lifetime_seconds: float, delay_seconds: float):
+        self.lifetime_seconds = lifetime_seconds
+        self.delay_seconds = delay_seconds
+        self.calls = 0
+        self.release = threading.Event()
+
+    def get_token(self, scope: str):
+        self.calls += 1
+        if self.calls > 1:
+            self.release.wait(self.delay_seconds)
+        return SimpleNamespace(token=f"token-{self.calls}", expires_on=time.time() + self.lifetime_seconds)
+
+
+def test_callers_keep_the_current_token_while_it_is_refreshed():
+    credential = SlowCredential(lifetime_seconds=600, delay_seconds=5)
+    # Due for refresh almost at once, while still valid for minutes
+    provider = CachedTokenProvider(credential, refresh_margin_seconds=599.9)
+    assert provider() == "token-1"
+    time.sleep(0.2)
+
+    slowest = 0.0
+    for _ in range(20):
+        start = time.perf_counter()
+        assert provider() == "token-1"
+        slowest = max(slowest, time.perf_counter() - start)
+    assert slowest < 0.5
+    # One background refresh, however many callers saw the token due
+    assert credential.calls == 2
+
+    credential.release.set()
+    deadline = time.time() + 5
+    while provider._cached[0] != "token-2" and time.time() < deadline:
+        time.sleep(0.01)
+    assert provider() in ("token-2", "token-3")
+
+
+def test_token_is_fetched_once_for_concurrent_callers():
+    credential = SlowCredential(lifetime_seconds=600, delay_seconds=0)
+    provider = CachedTokenProvider(credential)
+
+    threads = [threading.Thread(target=provider) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert credential.calls == 1
+    assert provider() == "token-1"
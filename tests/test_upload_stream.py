@@ -0,0 +1,111 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient
+from MockContentUnderstandingServer import MockContentUnderstandingServer, MockServerConfig
+from UploadStream import UploadStream
+
+BUFFER_BYTES = 64 * 1024
+
+
+class Pipe(io.RawIOBase):
+    """A stream that can only be read forward, like a network download."""
+
+    def __init__(self, content: bytes):
+        self._content = io.BytesIO(content)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        return self._content.readinto(buffer)
+
+
+@pytest.fixture
+def content():
+    # Not a multiple of the buffer, so the last read is short
+    return os.urandom(5 * BUFFER_BYTES + 123)
+
+
+@pytest.fixture
+def video_path(tmp_path, content):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(content)
+    return str(path)
+
+
+def _read_all(stream: UploadStream) -> bytes:
+    chunks = []
+    for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+        assert len(chunk) <= stream.buffer_size
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def test_a_file_is_read_one_buffer_at_a_time(video_path, content):
+    progress = []
+    with UploadStream.from_file(video_path, BUFFER_BYTES, lambda sent, total: progress.append((sent, total))) as stream:
+        assert len(stream) == len(content)
+        assert _read_all(stream) == content
+
+    assert progress[-1] == (len(content), len(content))
+    assert len(progress) == 6
+
+
+def test_a_rewound_stream_is_sent_again_in_full(video_path, content):
+    with UploadStream.from_file(video_path, BUFFER_BYTES) as stream:
+        stream.read(BUFFER_BYTES)
+        stream.seek(0)
+        assert _read_all(stream) == content
+        stream.seek(-100, io.SEEK_END)
+        assert stream.read() == content[-100:]
+
+
+def test_hashing_keeps_the_position_and_reports_no_progress(video_path, content):
+    progress = []
+    with UploadStream.from_file(video_path, BUFFER_BYTES, lambda sent, total: progress.append(sent)) as stream:
+        stream.read(100)
+        progress.clear()
+
+        assert stream.sha256() == hashlib.sha256(content).hexdigest()
+        assert stream.tell() == 100
+        assert progress == []
+        assert stream.read(100) == content[100:200]
+
+
+def test_a_stream_that_cannot_be_rewound_is_spooled(tmp_path, content):
+    with UploadStream.spool(Pipe(content), BUFFER_BYTES, directory=str(tmp_path)) as stream:
+        assert len(stream) == len(content)
+        assert stream.sha256() == hashlib.sha256(content).hexdigest()
+        assert _read_all(stream) == content
+        stream.seek(0)
+        assert _read_all(stream) == content
+
+
+def test_a_small_spooled_stream_stays_in_memory(tmp_path):
+    with UploadStream.spool(Pipe(b"small"), BUFFER_BYTES, directory=str(tmp_path)) as stream:
+        assert stream.read() == b"small"
+        assert os.listdir(tmp_path) == []
+
+
+def test_an_empty_file(tmp_path):
+    path = tmp_path / "empty.mp4"
+    path.write_bytes(b"")
+
+    with UploadStream.from_file(str(path)) as stream:
+        assert len(stream) == 0
+        assert stream.read() == b""
+        assert stream.sha256() == hashlib.sha256(b"").hexdigest()
+
+
+def test_a_local_file_is_uploaded_whole(video_path, content):
+    config = MockServerConfig(analysis_seconds=0, markdown_bytes_per_content=0)
+    with MockContentUnderstandingServer(config) as server, AzureContentUnderstandingClient(
+        server.url, "2025-05-01-preview", subscription_key="mock", upload_buffer_bytes=BUFFER_BYTES
+    ) as client:
+        client.begin_analyze("checkout", video_path)
+
+    assert server.bytes_received == len(content)
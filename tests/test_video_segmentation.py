@@ -0,0 +1,201 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from AzureContentUnderstandingClient import AzureContentUnderstandingClient, PollingStrategy
+from MockContentUnderstandingServer import MockContentUnderstandingServer, MockServerConfig
+from VideoSegmentation import (
+    CONCAT,
+    FIRST,
+    LAST,
+    MAX_CONFIDENCE,
+    MERGE,
+    SegmentedVideoAnalyzer,
+    VideoSegment,
+    merge_segment_fields,
+)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "qm_video_schema_2.0.json")
+FAST_POLLING = PollingStrategy(initial_delay_seconds=0.01, interval_seconds=0.01, jitter=0)
+
+
+@pytest.fixture
+def analyzer():
+    with open(SCHEMA_PATH, "r") as file:
+        return json.load(file)
+
+
+@pytest.fixture
+def order_analyzer(analyzer):
+    # The checkout fields, also as an order object and a list of carts, to merge and concatenate
+    fields = analyzer["fieldSchema"]["fields"]
+    analyzer = json.loads(json.dumps(analyzer))
+    analyzer["fieldSchema"]["fields"]["Order"] = {"type": "object", "properties": dict(fields)}
+    analyzer["fieldSchema"]["fields"]["Carts"] = {"type": "array", "items": dict(fields["ShoppingCart"])}
+    return analyzer
+
+
+def _string(value, confidence=0.9):
+    return {"type": "string", "valueString": value, "confidence": confidence}
+
+
+def _checkout(cart="", button="", cart_confidence=0.9):
+    return {"ShoppingCart": _string(cart, cart_confidence), "PlaceOrderwith": _string(button)}
+
+
+def test_last_non_empty_value_by_default(analyzer):
+    segment_fields = [
+        _checkout(cart="#1234567890"),
+        _checkout(),
+        _checkout(button="Place Order with Affirm"),
+    ]
+
+    merged = merge_segment_fields(analyzer, segment_fields)
+
+    assert merged["ShoppingCart"]["valueString"] == "#1234567890"
+    assert merged["PlaceOrderwith"]["valueString"] == "Place Order with Affirm"
+
+
+def test_later_segments_win_with_last(analyzer):
+    segment_fields = [
+        _checkout(cart="#1111111111", button="Place Order with PayPal"),
+        _checkout(cart="#2222222222", button="Place Order with Affirm"),
+    ]
+
+    merged = merge_segment_fields(analyzer, segment_fields, {"ShoppingCart": LAST})
+
+    assert merged["ShoppingCart"]["valueString"] == "#2222222222"
+    assert merged["PlaceOrderwith"]["valueString"] == "Place Order with Affirm"
+
+
+def test_reductions_override_the_default(analyzer):
+    segment_fields = [
+        _checkout(cart="#1111111111", button="Place Order with PayPal", cart_confidence=0.4),
+        _checkout(cart="#2222222222", button="Place Order with Affirm", cart_confidence=0.8),
+        _checkout(cart="#3333333333", cart_confidence=0.6),
+    ]
+
+    merged = merge_segment_fields(
+        analyzer, segment_fields, {"ShoppingCart": MAX_CONFIDENCE, "PlaceOrderwith": FIRST}
+    )
+
+    assert merged["ShoppingCart"]["valueString"] == "#2222222222"
+    assert merged["PlaceOrderwith"]["valueString"] == "Place Order with PayPal"
+
+
+def test_fields_missing_from_every_segment_stay_empty(analyzer):
+    merged = merge_segment_fields(analyzer, [_checkout(), {"ShoppingCart": _string("")}])
+
+    assert merged["ShoppingCart"]["valueString"] == ""
+    assert merged["PlaceOrderwith"]["valueString"] == ""
+
+
+def test_objects_are_merged_property_by_property(order_analyzer):
+    segment_fields = [
+        {"Order": {"type": "object", "valueObject": _checkout(cart="#1234567890")}},
+        {"Order": {"type": "object", "valueObject": _checkout(button="Place Order with Affirm")}},
+        {"Order": {"type": "object", "valueObject": {}}},
+    ]
+
+    merged = merge_segment_fields(order_analyzer, segment_fields)
+
+    order = merged["Order"]["valueObject"]
+    assert order["ShoppingCart"]["valueString"] == "#1234567890"
+    assert order["PlaceOrderwith"]["valueString"] == "Place Order with Affirm"
+
+
+def test_explicit_merge_of_an_object(order_analyzer):
+    segment_fields = [
+        {"Order": {"type": "object", "valueObject": _checkout(cart="#1111111111", button="Place Order with PayPal")}},
+        {"Order": {"type": "object", "valueObject": _checkout(cart="#2222222222")}},
+    ]
+
+    merged = merge_segment_fields(order_analyzer, segment_fields, {"Order": MERGE})
+
+    order = merged["Order"]["valueObject"]
+    assert order["ShoppingCart"]["valueString"] == "#2222222222"
+    assert order["PlaceOrderwith"]["valueString"] == "Place Order with PayPal"
+
+
+def test_arrays_are_concatenated_in_segment_order(order_analyzer):
+    segment_fields = [
+        {"Carts": {"type": "array", "valueArray": [_string("#1111111111")]}},
+        {"Carts": {"type": "array", "valueArray": []}},
+        {"Carts": {"type": "array", "valueArray": [_string("#2222222222"), _string("#3333333333")]}},
+    ]
+
+    merged = merge_segment_fields(order_analyzer, segment_fields, {"Carts": CONCAT})
+
+    assert [item["valueString"] for item in merged["Carts"]["valueArray"]] == [
+        "#1111111111", "#2222222222", "#3333333333"
+    ]
+
+
+def test_fields_outside_the_schema_are_kept(analyzer):
+    merged = merge_segment_fields(analyzer, [_checkout(cart="#1234567890"), {"Extra": _string("kept")}])
+
+    assert merged["Extra"]["valueString"] == "kept"
+
+
+def test_unknown_reduction(analyzer):
+    with pytest.raises(ValueError, match="Unknown reduction"):
+        merge_segment_fields(analyzer, [_checkout(cart="#1234567890")], {"ShoppingCart": "sum"})
+
+
+@pytest.fixture
+def mock_client(analyzer):
+    config = MockServerConfig(analysis_seconds=0.05, analyzer_creation_seconds=0.01, markdown_bytes_per_content=0)
+    with MockContentUnderstandingServer(config) as server:
+        with AzureContentUnderstandingClient(server.url, "2025-05-01-preview", subscription_key="mock") as client:
+            response = client.begin_create_analyzer("checkout", analyzer)
+            client.poll_result(response, polling_strategy=FAST_POLLING)
+            server.reset_stats()
+            yield server, client
+
+
+def test_analyze_pre_split_segments(mock_client, analyzer, tmp_path):
+    server, client = mock_client
+    segments = []
+    for index in range(3):
+        path = tmp_path / f"segment-{index:04d}.mp4"
+        path.write_bytes(os.urandom(1024))
+        segments.append(VideoSegment(str(path), index * 60.0, (index + 1) * 60.0))
+    segmenter = SegmentedVideoAnalyzer(client, "checkout", analyzer, segment_seconds=60, polling_strategy=FAST_POLLING)
+
+    result = segmenter.analyze_segments(segments)
+
+    assert server.stats["analyze"] == 3
+    assert server.bytes_received == 3 * 1024
+    (content,) = result["result"]["contents"]
+    assert (content["startTimeMs"], content["endTimeMs"]) == (0, 180000)
+    assert set(content["fields"]) == {"ShoppingCart", "PlaceOrderwith"}
+    assert content["fields"]["PlaceOrderwith"]["valueString"] == "Place Order with Affirm"
+    assert len(result["result"]["segmentContents"]) == 3
+
+
+@pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, reason="needs ffmpeg and ffprobe"
+)
+def test_analyze_splits_a_long_video(mock_client, analyzer, tmp_path):
+    server, client = mock_client
+    video_path = str(tmp_path / "video.mp4")
+    # Keyframes every second, so the video can be cut into segments of one second
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "testsrc=duration=3:size=160x120:rate=10",
+            "-g", "10", video_path,
+        ],
+        check=True,
+    )
+    segmenter = SegmentedVideoAnalyzer(client, "checkout", analyzer, segment_seconds=1, polling_strategy=FAST_POLLING)
+
+    result = segmenter.analyze(video_path)
+
+    assert server.stats["analyze"] >= 2
+    assert len(result["result"]["segmentContents"]) == server.stats["analyze"]
+    (content,) = result["result"]["contents"]
+    assert content["fields"]["ShoppingCart"]["valueString"]